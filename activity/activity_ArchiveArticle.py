@@ -101,16 +101,12 @@ class activity_ArchiveArticle(Activity):
         self.logger.info("ArchiveArticle listing files from %s", orig_resource)
         files_in_bucket = storage.list_resources(orig_resource)
         self.logger.info("files_in_bucket: %s", files_in_bucket)
+        resources = [orig_resource + '/' + key_name.split('/')[-1] for key_name in files_in_bucket]
         try:
-            for key_name in files_in_bucket:
-                file_name = key_name.split('/')[-1]
-                file_path = os.path.join(zip_dir_path, file_name)
-                storage_resource_origin = orig_resource + '/' + file_name
-                with open(file_path, 'wb') as open_file:
-                    self.logger.info("Downloading %s to %s", (storage_resource_origin, file_path))
-                    storage.get_resource_to_file(storage_resource_origin, open_file)
+            self.logger.info("Downloading %s files to %s", len(resources), zip_dir_path)
+            storage.get_resources_to_dir(resources, zip_dir_path)
         except IOError:
-            self.logger.exception("Failed to download file %s.", key_name)
+            self.logger.exception("Failed to download files from %s.", orig_resource)
             return None
         return True
 
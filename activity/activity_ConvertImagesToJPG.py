@@ -1,4 +1,5 @@
 import os
+import threading
 from activity.objects import Activity
 import json
 from provider.execution_context import get_session
@@ -60,18 +61,23 @@ class activity_ConvertImagesToJPG(Activity):
                             "download": "yes"
                         }}
 
-            for file_name in figures:
-                figure_resource = orig_resource + "/" + file_name
-                file_path = self.get_tmp_dir() + os.sep + file_name
-                file_pointer = storage.get_resource_to_file_pointer(figure_resource, file_path)
+            cdn_bucket_name = self.settings.publishing_buckets_prefix + self.settings.ppp_cdn_bucket
+            cdn_resource_path = storage_provider + cdn_bucket_name + "/" + article_id + "/"
 
-                cdn_bucket_name = self.settings.publishing_buckets_prefix + self.settings.ppp_cdn_bucket
-                cdn_resource_path = storage_provider + cdn_bucket_name + "/" + article_id + "/"
+            publish_locations = [cdn_resource_path]
+            tmp_dir = self.get_tmp_dir()
 
-                publish_locations = [cdn_resource_path]
+            if getattr(self.settings, 'image_conversion_processes', None):
+                self.convert_in_pipeline(formats, figures, orig_resource, publish_locations,
+                                         tmp_dir)
+            else:
+                for file_name in figures:
+                    figure_resource = orig_resource + "/" + file_name
+                    file_path = tmp_dir + os.sep + file_name
+                    file_pointer = storage.get_resource_to_file_pointer(figure_resource, file_path)
 
-                image_conversion.generate_images(self.settings, formats, file_pointer, article_structure.ArticleInfo(file_name),
-                                                 publish_locations, self.logger)
+                    image_conversion.generate_images(self.settings, formats, file_pointer, article_structure.ArticleInfo(file_name),
+                                                     publish_locations, self.logger)
 
             self.emit_monitor_event(self.settings, article_id, version, run, self.pretty_name, "end",
                                     "Finished converting images for " + article_id + ": " +
@@ -86,3 +92,19 @@ class activity_ConvertImagesToJPG(Activity):
                                     "Error converting images to JPG for article" + article_id +
                                     " message:" + str(e))
             return Activity.ACTIVITY_PERMANENT_FAILURE
+
+    def convert_in_pipeline(self, formats, figures, orig_resource, publish_locations, tmp_dir):
+        "overlap downloading, converting in worker processes and uploading the figures"
+        local = threading.local()
+
+        def download(file_name):
+            # storage contexts are not thread safe, one per download thread
+            if not hasattr(local, 'storage'):
+                local.storage = storage_context(self.settings)
+            file_path = tmp_dir + os.sep + file_name
+            with open(file_path, 'wb') as open_file:
+                local.storage.get_resource_to_file(orig_resource + "/" + file_name, open_file)
+            return file_path, article_structure.ArticleInfo(file_name)
+
+        pipeline = image_conversion.ConversionPipeline(self.settings, self.logger)
+        return pipeline.run(formats, figures, download, publish_locations)
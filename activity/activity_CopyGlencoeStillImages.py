@@ -1,5 +1,7 @@
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 import requests
 from activity.objects import Activity
 from provider.execution_context import get_session
@@ -12,6 +14,12 @@ import provider.glencoe_check as glencoe_check
 activity_CopyGlencoeStillImages.py activity
 """
 
+# default number of stills copied at a time, can be overridden in settings
+COPY_THREADS = 4
+
+# CDN still metadata key of the Glencoe ETag it was stored from
+SOURCE_ETAG_METADATA = 'glencoe-etag'
+
 
 class ValidationException(RuntimeError):
     pass
@@ -181,43 +189,64 @@ class activity_CopyGlencoeStillImages(Activity):
             return end_event, self.ACTIVITY_PERMANENT_FAILURE
 
     def store_jpgs(self, glencoe_jpgs, article_id):
-        cdn_still_jpgs = []
-        for jpg in glencoe_jpgs:
-            jpg_filename = self.store_file(jpg, article_id)
-            cdn_still_jpgs.append(jpg_filename)
-        return cdn_still_jpgs
+        """
+        copy the stills to the CDN a few at a time over one HTTP session and storage
+        context, return the CDN file names in the order of glencoe_jpgs
+        """
+        storage = storage_context(self.settings)
+        cdn_resources = {
+            resource.name: resource
+            for resource in storage.iter_resources(self.cdn_folder(article_id))}
+        threads = max(1, min(
+            getattr(self.settings, 'glencoe_copy_threads', COPY_THREADS), len(glencoe_jpgs)))
+        with pooled_session(threads) as http:
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                return list(executor.map(
+                    lambda jpg: self.store_file(jpg, article_id, storage, http, cdn_resources),
+                    glencoe_jpgs))
+
+    def cdn_folder(self, article_id):
+        return (self.settings.storage_provider + "://" +
+                self.settings.publishing_buckets_prefix + self.settings.ppp_cdn_bucket + "/" +
+                article_id)
 
     def s3_resources(self, path, article_id):
         filename = os.path.split(path)[1]
         filename = glencoe_check.force_article_id(filename, article_id)
-        cdn = (self.settings.storage_provider + "://" +
-               self.settings.publishing_buckets_prefix + self.settings.ppp_cdn_bucket + "/" +
-               article_id + "/" + filename)
-        return cdn
-
-    def store_file(self, path, article_id):
-        storage = storage_context(self.settings)
-        request = requests.get(path)
-        if request.status_code == 200:
-            resource = self.s3_resources(path, article_id)
+        return self.cdn_folder(article_id) + "/" + filename
+
+    def store_file(self, path, article_id, storage=None, http=None, cdn_resources=None):
+        """
+        stream the still from Glencoe into the CDN bucket, unless the CDN copy already
+        matches it, return the CDN file name
+        """
+        storage = storage or storage_context(self.settings)
+        http = http or requests
+        resource = self.s3_resources(path, article_id)
+        jpg_filename = os.path.split(resource)[-1]
+        with closing(http.get(path, stream=True)) as request:
+            if request.status_code != 200:
+                raise RuntimeError("Glencoe returned a %s status code for %s" %
+                                   (request.status_code, path))
+            etag = source_etag(request.headers)
+            # only a still already on the CDN has metadata to compare
+            if etag and (cdn_resources is None or jpg_filename in cdn_resources):
+                if cdn_copy_matches(etag, storage.resource_metadata(resource)):
+                    self.logger.info("S3 resource already matches: " + resource)
+                    return jpg_filename
             self.logger.info("S3 resource: " + resource)
-            jpg_filename = os.path.split(resource)[-1]
-            storage.set_resource_from_string(
+            request.raw.decode_content = True
+            storage.set_resource_from_stream(
                 resource,
-                request.content,
-                content_type=request.headers['content-type']
+                request.raw,
+                content_type=request.headers['content-type'],
+                metadata={SOURCE_ETAG_METADATA: etag} if etag else None
             )
-            return jpg_filename
-        else:
-            raise RuntimeError("Glencoe returned a %s status code for %s" %
-                               (request.status_code, path))
+        return jpg_filename
 
     def list_files_from_cdn(self, article_id):
         storage = storage_context(self.settings)
-        article_path_in_cdn = (
-            self.settings.storage_provider + "://" + self.settings.publishing_buckets_prefix +
-            self.settings.ppp_cdn_bucket + "/" + article_id)
-        return storage.list_resources(article_path_in_cdn)
+        return storage.list_resources(self.cdn_folder(article_id))
 
     def validate_jpgs_against_cdn(self, cdn_all_files, cdn_still_jpgs):
         """checks that for each element of cdn_still_jpgs there are two files in the CDN.
@@ -237,5 +266,31 @@ class activity_CopyGlencoeStillImages(Activity):
         return cdn_still_jpgs_without_video
 
 
+def pooled_session(threads):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=threads)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def source_etag(headers):
+    "the strong ETag of the Glencoe response without quotes, None if it has none"
+    etag = headers.get('etag', '')
+    if not etag or etag.startswith('W/'):
+        return None
+    return etag.strip('"')
+
+
+def cdn_copy_matches(etag, metadata):
+    """
+    whether the CDN copy was stored from the Glencoe response with this ETag, by the source
+    ETag recorded in its metadata, the S3 ETag of the copy is not comparable to Glencoe's
+    """
+    if not etag or metadata is None:
+        return False
+    return metadata.get(SOURCE_ETAG_METADATA) == etag
+
+
 def remove_extension(filenames):
     return list([os.path.splitext(filename)[0] for filename in filenames])
@@ -60,14 +60,12 @@ class activity_DepositAssets(Activity):
 
             no_download_extensions = self.get_no_download_extensions(self.settings.no_download_extensions)
 
-            for file_name in other_assets:
-                orig_resource = storage_provider + expanded_folder_bucket + "/" + expanded_folder_name + "/"
-                dest_resource = storage_provider + cdn_bucket_name + "/" + article_id + "/"
-
-                storage.copy_resource(orig_resource + file_name, dest_resource + file_name)
+            orig_resource = storage_provider + expanded_folder_bucket + "/" + expanded_folder_name + "/"
+            dest_resource = storage_provider + cdn_bucket_name + "/" + article_id + "/"
 
-                if self.logger:
-                    self.logger.info("Uploaded file %s to %s" % (file_name, cdn_bucket_name))
+            resource_pairs = []
+            for file_name in other_assets:
+                resource_pairs.append((orig_resource + file_name, dest_resource + file_name))
 
                 file_name_no_extension, extension = file_name.rsplit('.', 1)
                 if extension not in no_download_extensions:
@@ -78,9 +76,15 @@ class activity_DepositAssets(Activity):
                     file_download = file_name_no_extension + "-download." + extension
 
                     # file is copied with additional metadata
-                    storage.copy_resource(orig_resource + file_name,
-                                                  dest_resource + file_download,
-                                                  additional_dict_metadata=dict_metadata)
+                    resource_pairs.append((orig_resource + file_name,
+                                           dest_resource + file_download,
+                                           dict_metadata))
+
+            storage.copy_resources(resource_pairs)
+
+            if self.logger:
+                for file_name in other_assets:
+                    self.logger.info("Uploaded file %s to %s" % (file_name, cdn_bucket_name))
 
             self.emit_monitor_event(self.settings, article_id, version, run,
                                     self.pretty_name, "end",
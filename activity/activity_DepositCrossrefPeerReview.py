@@ -77,7 +77,8 @@ class activity_DepositCrossrefPeerReview(Activity):
         self.statuses["generate"] = crossref.generate_crossref_xml_to_disk(
             generate_article_object_map, crossref_config, self.good_xml_files,
             self.bad_xml_files, submission_type="peer_review",
-            pretty=True, indent="    ")
+            pretty=True, indent="    ",
+            processes=getattr(self.settings, 'crossref_processes', crossref.PROCESSES))
 
         # Approve files for publishing
         self.statuses["approve"] = self.approve_for_publishing()
@@ -133,7 +134,8 @@ class activity_DepositCrossrefPeerReview(Activity):
         """turn XML into article objects and populate their data"""
         # parse XML files into the basic article object map to start with
         article_object_map = crossref.article_xml_list_parse(
-            article_xml_files, self.bad_xml_files, self.directories.get("TMP_DIR"))
+            article_xml_files, self.bad_xml_files, self.directories.get("TMP_DIR"),
+            getattr(self.settings, 'crossref_processes', crossref.PROCESSES))
         # continue with setting more article data
         for article in list(article_object_map.values()):
             # populate Manuscript object
@@ -215,7 +217,9 @@ class activity_DepositCrossrefPeerReview(Activity):
         payload = crossref.crossref_data_payload(
             self.settings.crossref_login_id, self.settings.crossref_login_passwd)
         return crossref.upload_files_to_endpoint(
-            self.settings.crossref_url, payload, xml_files)
+            self.settings.crossref_url, payload, xml_files,
+            getattr(self.settings, 'crossref_upload_threads', crossref.UPLOAD_THREADS),
+            self.logger)
 
     def send_admin_email(self, outbox_s3_key_names, http_detail_list):
         """
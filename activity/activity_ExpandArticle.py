@@ -41,7 +41,8 @@ class activity_ExpandArticle(Activity):
 
         run = data['run']
         session = get_session(self.settings, data, run)
-        article_id = session.get_value('article_id')
+        session_values = session.get_values(['article_id', 'filename_last_element', 'version'])
+        article_id = session_values['article_id']
 
         if self.logger:
             self.logger.info('data: %s' % json.dumps(data, sort_keys=True, indent=4))
@@ -49,9 +50,7 @@ class activity_ExpandArticle(Activity):
 
         storage = storage_context(self.settings)
 
-        session = get_session(self.settings, data, run)
-
-        filename_last_element = session.get_value('filename_last_element')
+        filename_last_element = session_values['filename_last_element']
 
         article_structure = ArticleInfo(filename_last_element)
         session.store_value('file_name', info.file_name)
@@ -59,7 +58,7 @@ class activity_ExpandArticle(Activity):
         if self.logger:
             self.logger.info("Expanding file %s" % info.file_name)
 
-        version = session.get_value('version')
+        version = session_values['version']
 
         status = article_structure.status
         if status is None or (status != 'vor' and status != 'poa'):
@@ -68,43 +67,28 @@ class activity_ExpandArticle(Activity):
             return self.ACTIVITY_PERMANENT_FAILURE  # status could not be determined, exit workflow.
 
         article_version_id = article_id + '.' + version
-        session.store_value('article_version_id', article_version_id)
-        session.store_value('run', run)
-        session.store_value('status', status)
+        session.store_values({
+            'article_version_id': article_version_id,
+            'run': run,
+            'status': status
+        })
         self.emit_monitor_event(self.settings, article_id, version, run, "Expand Article", "start",
                                 "Starting expansion of article " + article_id)
 
 
         try:
-            # download zip to temp folder
-            tmp = self.get_tmp_dir()
-            local_zip_file = self.open_file_from_tmp_dir(filename_last_element, mode='wb')
             storage_resource_origin = self.settings.storage_provider + "://" + info.bucket_name + "/" + info.file_name
-            storage.get_resource_to_file(storage_resource_origin, local_zip_file)
-            local_zip_file.close()
-
-            # extract zip contents
-            folder_name = path.join(article_version_id, run)
-            content_folder = path.join(tmp, folder_name)
-            makedirs(content_folder)
-            with ZipFile(path.join(tmp, filename_last_element)) as zf:
-                zf.extractall(content_folder)
-
-            upload_filenames = []
-            for f in listdir(content_folder):
-                if isfile(join(content_folder, f)) and f[0] != '.' and not f[0] == '_':
-                    upload_filenames.append(f)
-            self.check_filenames(upload_filenames)
-
             bucket_folder_name = article_version_id + '/' + run
-            for filename in upload_filenames:
-                source_path = path.join(content_folder, filename)
-                dest_path = bucket_folder_name + '/' + filename
-                storage_resource_dest = self.settings.storage_provider + "://" + self.settings.publishing_buckets_prefix + \
-                                        self.settings.expanded_bucket + "/" + dest_path
-                storage.set_resource_from_filename(storage_resource_dest, source_path)
+            storage_resource_folder = self.settings.storage_provider + "://" + self.settings.publishing_buckets_prefix + \
+                                      self.settings.expanded_bucket + "/" + bucket_folder_name
 
-            self.clean_tmp_dir()
+            if getattr(self.settings, 'expand_article_stream_zip', None):
+                # stream zip members straight to the bucket without a local copy
+                storage.set_resources_from_zip(storage_resource_origin, storage_resource_folder,
+                                               self.upload_filename, self.check_filenames)
+            else:
+                self.expand_in_tmp_dir(storage, storage_resource_origin, storage_resource_folder,
+                                       filename_last_element, article_version_id, run)
 
             session.store_value('expanded_folder', bucket_folder_name)
             self.emit_monitor_event(self.settings, article_id, version, run, "Expand Article",
@@ -120,6 +104,36 @@ class activity_ExpandArticle(Activity):
 
         return True
 
+    def expand_in_tmp_dir(self, storage, storage_resource_origin, storage_resource_folder,
+                          filename_last_element, article_version_id, run):
+        "download and extract the zip in the tmp dir then upload the files"
+        # download zip to temp folder
+        tmp = self.get_tmp_dir()
+        local_zip_file = self.open_file_from_tmp_dir(filename_last_element, mode='wb')
+        storage.get_resource_to_file(storage_resource_origin, local_zip_file)
+        local_zip_file.close()
+
+        # extract zip contents
+        folder_name = path.join(article_version_id, run)
+        content_folder = path.join(tmp, folder_name)
+        makedirs(content_folder)
+        with ZipFile(path.join(tmp, filename_last_element)) as zf:
+            zf.extractall(content_folder)
+
+        upload_filenames = []
+        for f in listdir(content_folder):
+            if isfile(join(content_folder, f)) and self.upload_filename(f):
+                upload_filenames.append(f)
+        self.check_filenames(upload_filenames)
+
+        storage.set_resources_from_dir(content_folder, storage_resource_folder, upload_filenames)
+
+        self.clean_tmp_dir()
+
+    def upload_filename(self, filename):
+        "only top level files in the zip are uploaded, not hidden or _ prefixed files"
+        return '/' not in filename and filename[0] != '.' and not filename[0] == '_'
+
     def get_next_version(self, article_id):
         version = lax_provider.article_highest_version(article_id, self.settings)
         if isinstance(version, int) and version >= 1:
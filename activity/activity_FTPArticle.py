@@ -1,6 +1,5 @@
 import os
 import json
-import zipfile
 import glob
 import shutil
 from ftplib import FTP
@@ -47,8 +46,6 @@ class activity_FTPArticle(Activity):
             "INPUT_DIR": os.path.join(self.get_tmp_dir(), "input_dir"),
             "ZIP_DIR": os.path.join(self.get_tmp_dir(), "zip_dir"),
             "FTP_TO_SOMEWHERE_DIR": os.path.join(self.get_tmp_dir(), "ftp_outbox"),
-            "RENAME_DIR": os.path.join(self.get_tmp_dir(), "renamed_files"),
-            "JUNK_DIR": os.path.join(self.get_tmp_dir(), "junk_dir"),
         }
 
         # Outgoing FTP settings are set later
@@ -266,38 +263,32 @@ class activity_FTPArticle(Activity):
 
     def repackage_archive_zip_to_pmc_zip(self, doi_id):
         "repackage the zip file in the TMP_DIR to a PMC zip format"
-        # unzip contents
         zip_input_dir = self.directories.get("TMP_DIR")
-        zip_extracted_dir = self.directories.get("JUNK_DIR")
-        zip_renamed_files_dir = self.directories.get("RENAME_DIR")
         pmc_zip_output_dir = self.directories.get("INPUT_DIR")
         archive_zip_name = glob.glob(zip_input_dir + "/*.zip")[0]
-        with zipfile.ZipFile(archive_zip_name, 'r') as myzip:
-            myzip.extractall(zip_extracted_dir)
         # rename the files and profile the files
-        file_name_map = article_processing.rename_files_remove_version_number(
-            files_dir=zip_extracted_dir,
-            output_dir=zip_renamed_files_dir
-        )
+        file_name_map = article_processing.stripped_file_name_map(
+            article_processing.zip_file_names(archive_zip_name), self.logger)
         if self.logger:
             self.logger.info("FTPArticle running %s workflow for article %s, file_name_map"
                              % (self.workflow, self.doi_id))
             self.logger.info(file_name_map)
         # convert the XML
-        article_xml_file = glob.glob(zip_renamed_files_dir + "/*.xml")[0]
-        article_processing.convert_xml(
-            xml_file=article_xml_file,
-            file_name_map=file_name_map)
-        # rezip the files into PMC zip format
-        soup = parser.parse_document(article_xml_file)
+        article_xml_name = [
+            old_name for old_name, new_name in file_name_map.items()
+            if new_name.endswith('.xml')][0]
+        article_xml = article_processing.convert_xml_string(
+            article_processing.read_zip_member(archive_zip_name, article_xml_name),
+            file_name_map)
+        # copy the files into PMC zip format
+        soup = parser.parse_xml(article_xml)
         volume = parser.volume(soup)
         pmc_zip_file_name = article_processing.new_pmc_zip_filename(self.journal, volume, doi_id)
-        with zipfile.ZipFile(os.path.join(pmc_zip_output_dir, pmc_zip_file_name), 'w',
-                             zipfile.ZIP_DEFLATED, allowZip64=True) as new_zipfile:
-            dirfiles = article_processing.file_list(zip_renamed_files_dir)
-            for dir_file in dirfiles:
-                filename = dir_file.split(os.sep)[-1]
-                new_zipfile.write(dir_file, filename)
+        article_processing.repackage_zip(
+            [archive_zip_name], os.path.join(pmc_zip_output_dir, pmc_zip_file_name),
+            member_filter=lambda name: name in file_name_map,
+            file_name_map=file_name_map,
+            rewrite_members={article_xml_name: lambda data: article_xml})
         return True
 
     def download_pmc_zip_from_s3(self, doi_id, workflow):
@@ -362,31 +353,14 @@ class activity_FTPArticle(Activity):
     def repackage_pmc_zip(self, doi_id, keep_file_types):
         """repackage the zip file to include only certain file types then move it to folder"""
 
-        ignore_name_fragments = ["-supp", "-data", "-code"]
-
-        # Extract the zip and build a new zip
+        # Copy the files of those types from the zip into a new zip
         zipfiles = glob.glob(self.directories.get("INPUT_DIR") + "/*.zip")
-        to_dir = self.directories.get("TMP_DIR")
-        for filename in zipfiles:
-            with zipfile.ZipFile(filename, 'r') as open_zip_file:
-                open_zip_file.extractall(to_dir)
-
-        # Create the new zip
         zip_file_path = os.path.join(
             self.directories.get("ZIP_DIR"),
             new_zip_file_name(doi_id, ZIP_FILE_PREFIX, zip_file_suffix(keep_file_types)))
-        with zipfile.ZipFile(zip_file_path, 'w', zipfile.ZIP_DEFLATED,
-                             allowZip64=True) as new_zipfile:
-            # Add files
-            for file_type in file_type_matches(keep_file_types):
-                files = glob.glob(to_dir + file_type)
-                for to_dir_file in files:
-                    # Ignore some files that are PDF we do not want to include
-                    for ignore in ignore_name_fragments:
-                        if ignore in to_dir_file:
-                            continue
-                    filename = to_dir_file.split(os.sep)[-1]
-                    new_zipfile.write(to_dir_file, filename)
+        article_processing.repackage_zip(
+            zipfiles, zip_file_path,
+            member_filter=lambda name: file_type_match(name, keep_file_types))
 
         # Move the zip
         shutil.move(
@@ -470,3 +444,10 @@ def new_zip_file_name(doi_id, prefix, suffix):
 def file_type_matches(file_types):
     """wildcard file name matches for the file types to include"""
     return ['/*.%s' % file_type for file_type in file_types]
+
+
+def file_type_match(name, file_types):
+    """whether a zip member name matches one of the file_type_matches wildcards"""
+    return bool(
+        '/' not in name and not name.startswith('.') and
+        [file_type for file_type in file_types if name.endswith('.%s' % file_type)])
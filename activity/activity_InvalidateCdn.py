@@ -34,13 +34,17 @@ class activity_InvalidateCdn(Activity):
         try:
             self.emit_monitor_event(self.settings, article_id, version, run, 
                                     self.pretty_name, "start", "Starting Fastly purge API calls.") 
-            fastly_responses = fastly_provider.purge(article_id, version, self.settings)
-            self.logger.info(
-                "Fastly responses: %s",
-                [(r.status_code, r.content) for r in fastly_responses]
-            )
-
-            dashboard_message = "Fastly purge API calls performed for article %s." % str(article_id)
+            if getattr(self.settings, 'fastly_purge_queue', None):
+                # coalesced with the purges of other articles by the worker process
+                fastly_provider.purge_queue(self.settings).add(article_id, version, run)
+                dashboard_message = "Fastly purge queued for article %s." % str(article_id)
+            else:
+                fastly_responses = fastly_provider.purge(article_id, version, self.settings)
+                self.logger.info(
+                    "Fastly responses: %s",
+                    [(r.status_code, r.content) for r in fastly_responses]
+                )
+                dashboard_message = "Fastly purge API calls performed for article %s." % str(article_id)
             self.emit_monitor_event(self.settings, article_id, version, run,
                                     self.pretty_name, "end", dashboard_message)
             return self.ACTIVITY_SUCCESS
@@ -1,6 +1,5 @@
 import os
 import json
-import zipfile
 import re
 import glob
 from elifetools import parseJATS as parser
@@ -29,10 +28,8 @@ class activity_PMCDeposit(Activity):
 
         # Local directory settings
         self.directories = {
-            "TMP_DIR": self.get_tmp_dir() + os.sep + "tmp_dir",
             "INPUT_DIR": self.get_tmp_dir() + os.sep + "input_dir",
-            "ZIP_DIR": self.get_tmp_dir() + os.sep + "zip_dir",
-            "OUTPUT_DIR": self.get_tmp_dir() + os.sep + "output_dir"
+            "ZIP_DIR": self.get_tmp_dir() + os.sep + "zip_dir"
         }
 
         # Bucket settings
@@ -76,21 +73,17 @@ class activity_PMCDeposit(Activity):
             # Retry activity again
             return self.ACTIVITY_TEMPORARY_FAILURE
 
-        # Unzip the input zip file contents
+        # Profile the article from the XML in the input zip
         input_zip_file_name = os.path.join(self.directories.get("INPUT_DIR"), self.document)
-        unzip_article_files(input_zip_file_name, self.directories.get("TMP_DIR"), self.logger)
-
-        # Profile the article
+        zip_file_names = article_processing.zip_file_names(input_zip_file_name)
+        article_xml_name = article_xml_member(zip_file_names)
+        article_xml = article_processing.read_zip_member(input_zip_file_name, article_xml_name)
         journal = get_journal(self.document)
-        xml_search_folders = [
-            self.directories.get("TMP_DIR"),
-            self.directories.get("OUTPUT_DIR")]
 
-        fid, volume = profile_article(article_xml_file(xml_search_folders))
+        fid, volume = profile_article_xml(article_xml)
 
         # Rename the files
-        file_name_map = article_processing.rename_files_remove_version_number(
-            self.directories.get("TMP_DIR"), self.directories.get("OUTPUT_DIR"), self.logger)
+        file_name_map = article_processing.stripped_file_name_map(zip_file_names, self.logger)
 
         (verified, renamed_list, not_renamed_list) = article_processing.verify_rename_files(
             file_name_map)
@@ -103,7 +96,7 @@ class activity_PMCDeposit(Activity):
             self.logger.info("not renamed: %s" % not_renamed_list)
 
         # Convert the XML
-        article_processing.convert_xml(article_xml_file(xml_search_folders), file_name_map)
+        article_xml = article_processing.convert_xml_string(article_xml, file_name_map)
 
         # Get the new zip file name
         # take into account the r1 r2 revision numbers when replacing an article
@@ -111,7 +104,8 @@ class activity_PMCDeposit(Activity):
         self.zip_file_name = new_zip_filename(journal, volume, fid, revision)
         self.logger.info("new PMC zip file name: " + str(self.zip_file_name))
         zip_file_path = self.directories.get("ZIP_DIR") + os.sep + self.zip_file_name
-        create_new_zip(zip_file_path, self.directories.get("OUTPUT_DIR"), self.logger)
+        create_new_zip(zip_file_path, input_zip_file_name, file_name_map,
+                       article_xml_name, article_xml, self.logger)
 
         # FTP the zip
         ftp_status = None
@@ -243,24 +237,17 @@ def next_revision_number(fid, s3_key_names):
     return revision
 
 
-def unzip_article_files(zip_file_name, to_dir, logger):
-    """ If file extension is zip, then unzip contents """
-    if article_processing.file_extension(zip_file_name) == 'zip':
-        # Unzip
-        logger.info("going to unzip " + zip_file_name + " to " + to_dir)
-        with zipfile.ZipFile(zip_file_name, 'r') as open_file:
-            open_file.extractall(to_dir)
-
-
-def create_new_zip(zip_file_name, files_dir, logger):
+def create_new_zip(zip_file_name, input_zip_file_name, file_name_map, article_xml_name,
+                   article_xml, logger):
+    """copy the renamed files from the input zip, with the converted article XML"""
 
     logger.info("creating new PMC zip file named " + zip_file_name)
 
-    with zipfile.ZipFile(zip_file_name, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as new_zipfile:
-        dirfiles = article_processing.file_list(files_dir)
-        for article_file_name in dirfiles:
-            filename = article_file_name.split(os.sep)[-1]
-            new_zipfile.write(article_file_name, filename)
+    article_processing.repackage_zip(
+        [input_zip_file_name], zip_file_name,
+        member_filter=lambda name: name in file_name_map,
+        file_name_map=file_name_map,
+        rewrite_members={article_xml_name: lambda data: article_xml})
 
 
 def get_journal(document):
@@ -276,10 +263,18 @@ def article_xml_file(folders):
     Directories the XML file might be in depending on the step
     """
     for folder_name in folders:
-        for file_name in article_processing.file_list(folder_name):
-            info = ArticleInfo(article_processing.file_name_from_name(file_name))
-            if info.file_type == 'ArticleXML':
-                return file_name
+        file_name = article_xml_member(article_processing.file_list(folder_name))
+        if file_name:
+            return file_name
+    return None
+
+
+def article_xml_member(file_names):
+    "name of the article XML file from a list of file names"
+    for file_name in file_names:
+        info = ArticleInfo(article_processing.file_name_from_name(file_name))
+        if info.file_type == 'ArticleXML':
+            return file_name
     return None
 
 
@@ -299,7 +294,13 @@ def profile_article(document):
     Temporary, profile the article by folder names in test data set
     In real code we still want this to return the same values
     """
-    soup = parser.parse_document(document)
+    with open(document, 'rb') as open_file:
+        return profile_article_xml(open_file.read())
+
+
+def profile_article_xml(xml_string):
+    "article id and volume from the article XML"
+    soup = parser.parse_xml(xml_string)
 
     # elife id / doi id / manuscript id
     fid = parser.doi(soup).split('.')[-1]
@@ -9,6 +9,7 @@ from boto.s3.connection import S3Connection
 
 import provider.article as articlelib
 from provider import email_provider, lax_provider, s3lib, utils
+from provider.published_index import PublishedIndex
 
 import dateutil.parser
 from activity.objects import Activity
@@ -50,6 +51,10 @@ class activity_PubRouterDeposit(Activity):
         # Bucket settings for source files of PMCDeposit workflows
         self.archive_bucket = self.settings.publishing_buckets_prefix + self.settings.archive_bucket
 
+        # PMC zip and archive bucket listings, listed once per run for all the articles
+        self.latest_pmc_zips = None
+        self.archive_s3_keys = None
+
         # Track the success of some steps
         self.activity_status = None
         self.ftp_status = None
@@ -83,6 +88,8 @@ class activity_PubRouterDeposit(Activity):
 
         self.workflow = data["data"]["workflow"]
         self.outbox_folder = self.get_outbox_folder(self.workflow)
+        self.latest_pmc_zips = None
+        self.archive_s3_keys = None
         self.published_folder = self.get_published_folder(self.workflow)
 
         if self.outbox_folder is None or self.published_folder is None:
@@ -237,20 +244,23 @@ class activity_PubRouterDeposit(Activity):
         """
         Get the file name of the most recent archive zip from the archive bucket
         """
-        bucket_name = self.archive_bucket
+        if self.archive_s3_keys is None:
+            bucket_name = self.archive_bucket
 
-        # Connect to S3 and bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
-        bucket = s3_conn.lookup(bucket_name)
+            # Connect to S3 and bucket
+            s3_conn = S3Connection(self.settings.aws_access_key_id,
+                                   self.settings.aws_secret_access_key)
+            bucket = s3_conn.lookup(bucket_name)
 
-        s3_keys_in_bucket = s3lib.get_s3_keys_from_bucket(bucket=bucket)
+            s3_keys_in_bucket = s3lib.get_s3_keys_from_bucket(bucket=bucket)
 
-        s3_keys = []
-        for key in s3_keys_in_bucket:
-            s3_keys.append({"name": key.name, "last_modified": key.last_modified})
+            # listed once for all the articles
+            self.archive_s3_keys = []
+            for key in s3_keys_in_bucket:
+                self.archive_s3_keys.append({"name": key.name, "last_modified": key.last_modified})
 
-        return self.latest_archive_zip_revision(article.doi_id, s3_keys, self.journal, status)
+        return self.latest_archive_zip_revision(
+            article.doi_id, self.archive_s3_keys, self.journal, status)
 
     def latest_archive_zip_revision(self, doi_id, s3_keys, journal, status):
         """
@@ -425,14 +435,18 @@ class activity_PubRouterDeposit(Activity):
         blank_article = self.create_article()
         # Remove based on published status
 
+        # Lax versions of all the articles, requested concurrently
+        lax_versions = lax_provider.articles_versions(
+            [article.doi_id for article in articles], self.settings)
+
         for article in articles:
+            status_code, data = lax_versions.get(article.doi_id)
             # Check whether the DOI was ever POA
-            article.was_ever_poa = lax_provider.was_ever_poa(article.doi_id, self.settings)
+            article.was_ever_poa = lax_provider.versions_was_ever_poa(status_code, data)
 
             # Now can check if published
-            is_published = lax_provider.published_considering_poa_status(
-                article_id=article.doi_id,
-                settings=self.settings,
+            is_published = lax_provider.versions_published_considering_poa_status(
+                status_code, data,
                 is_poa=article.is_poa,
                 was_ever_poa=article.was_ever_poa)
             if is_published is not True:
@@ -528,6 +542,7 @@ class activity_PubRouterDeposit(Activity):
             s3_key_name = self.outbox_folder + filename
             s3_key_names.append(s3_key_name)
 
+        published_key_names = []
         for name in s3_key_names:
             # Download objects from S3 and save to disk
 
@@ -547,31 +562,45 @@ class activity_PubRouterDeposit(Activity):
                 if isinstance(new_s3_key, boto.s3.key.Key):
                     old_s3_key = bucket.get_key(name)
                     old_s3_key.delete()
+                    published_key_names.append(new_s3_key_name)
+
+        self.update_published_index(published_key_names)
+
+    def update_published_index(self, published_key_names):
+        "add the articles of the XML files moved to the published folder to its index"
+        if not getattr(self.settings, 'published_doi_index', True):
+            return
+        xml_key_names = [name for name in published_key_names if name.endswith(".xml")]
+        if not xml_key_names:
+            return
+        doi_ids = self.create_article().doi_ids_from_s3_key_names(xml_key_names)
+        index = PublishedIndex(self.settings, self.publish_bucket, self.published_folder)
+        index.add(doi_ids)
 
     def does_source_zip_exist_from_s3(self, doi_id):
         """
-
+        Check the PMC zip folder, listed once for all the articles, has a zip for the article
         """
-        bucket_name = self.pmc_zip_bucket
-        prefix = self.pmc_zip_folder
+        if self.latest_pmc_zips is None:
+            bucket_name = self.pmc_zip_bucket
+            prefix = self.pmc_zip_folder
 
-        # Connect to S3 and bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
-        bucket = s3_conn.lookup(bucket_name)
+            # Connect to S3 and bucket
+            s3_conn = S3Connection(self.settings.aws_access_key_id,
+                                   self.settings.aws_secret_access_key)
+            bucket = s3_conn.lookup(bucket_name)
 
-        s3_key_names = s3lib.get_s3_key_names_from_bucket(
-            bucket=bucket,
-            prefix=prefix)
+            s3_key_names = s3lib.get_s3_key_names_from_bucket(
+                bucket=bucket,
+                prefix=prefix)
 
-        s3_key_name = s3lib.latest_pmc_zip_revision(doi_id, s3_key_names)
+            self.latest_pmc_zips = s3lib.latest_pmc_zip_revisions(s3_key_names)
 
-        if s3_key_name:
+        if self.latest_pmc_zips.get(int(doi_id)):
             return True
         else:
             return False
 
-
     def send_admin_email(self):
         """
         After do_activity is finished, send emails to recipients
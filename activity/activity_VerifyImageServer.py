@@ -79,5 +79,8 @@ class activity_VerifyImageServer(Activity):
             return self.ACTIVITY_PERMANENT_FAILURE
 
     def retrieve_endpoints_check(self, original_figures, iiif_path_for_article):
-        return list([iiif.try_endpoint(iiif.endpoint(
-            self.settings, iiif_path_for_article, fig), self.logger) for fig in original_figures])
+        endpoints = [iiif.endpoint(self.settings, iiif_path_for_article, fig)
+                     for fig in original_figures]
+        results = iiif.EndpointVerifier(self.settings, self.logger).verify(endpoints)
+        self.logger.info('IIIF verification: %s', json.dumps(iiif.report(results)))
+        return results
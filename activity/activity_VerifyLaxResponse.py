@@ -1,6 +1,6 @@
 import json
 from provider.execution_context import get_session
-from provider.lax_provider import message_from_lax
+from provider.lax_provider import invalidate_article, message_from_lax
 from uuid import UUID
 from activity.objects import Activity
 
@@ -39,6 +39,8 @@ class activity_VerifyLaxResponse(Activity):
         version = data['version']
         force = data['force']
         session = get_session(self.settings, data, run)
+        # Lax has changed the article, cached versions are out of date
+        invalidate_article(article_id, self.settings)
 
         self.emit_monitor_event(self.settings, article_id, version, run, self.pretty_name, "start",
                                 "Starting verification of Lax response " + article_id)
@@ -2,20 +2,32 @@ import calendar
 import time
 import datetime
 import importlib
+from argparse import ArgumentParser
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from pytz import timezone
+import yaml
 
 import log
 import provider.swfmeta as swfmetalib
-from provider import utils
+from provider import process, utils
+from starter import starter_helper as helper
 import newrelic.agent
 
 """
 SWF cron
 """
 
-TIMEZONE = timezone("Europe/London")
+SCHEDULE_FILE = 'cron.yaml'
+SCHEDULE = None
+
+# minute, hour, day of month, month and day of week
+CRON_FIELD_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+DAEMON_THREADS = 4
+DAEMON_SLEEP_SECONDS = 1
+EXECUTION_CACHE_FILE = 'swf-closed-executions.json'
 
 
 IDENTITY = log.identity('cron')
@@ -27,20 +39,91 @@ def run_cron(settings):
     current_datetime = get_current_datetime()
     LOGGER.info("current_datetime: %s" % current_datetime)
 
-    for conditional_start in conditional_starts(current_datetime):
-        do_start = workflow_conditional_start(
+    execution_cache = get_execution_cache(settings)
+    schedule = read_schedule(schedule_file(settings))
+
+    for conditional_start in due_starts(settings, current_datetime, execution_cache, schedule):
+        LOGGER.info("starting %s, workflow_id %s" % (
+            conditional_start.get("starter_name"), conditional_start.get("workflow_id")))
+        start_workflow(
             settings=settings,
-            workflow_id=conditional_start.get("workflow_id"),
-            start_seconds=conditional_start.get("start_seconds")
+            starter_name=conditional_start.get("starter_name"),
+            workflow_id=conditional_start.get("workflow_id")
         )
-        if do_start:
-            LOGGER.info("starting %s, workflow_id %s" % (
-                conditional_start.get("starter_name"), conditional_start.get("workflow_id")))
-            start_workflow(
-                settings=settings,
-                starter_name=conditional_start.get("starter_name"),
-                workflow_id=conditional_start.get("workflow_id")
-            )
+
+
+def run_daemon(settings, flag, schedule=None, threads=None, application=None):
+    """
+    Run cron in one long running process, checking the schedule at the start of each minute
+    until the flag is stopped. The schedule, the cache of completed executions and a SWF
+    connection for each thread are kept between minutes, due workflows start concurrently
+    """
+    if schedule is None:
+        schedule = read_schedule(schedule_file(settings))
+    if threads is None:
+        threads = getattr(settings, 'cron_daemon_threads', DAEMON_THREADS)
+    cache_file = getattr(settings, 'swf_execution_cache_file', None) or EXECUTION_CACHE_FILE
+    execution_cache = swfmetalib.ClosedExecutionCache(settings, cache_file)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        last_minute = None
+        while flag.green():
+            current_datetime = get_current_datetime().replace(second=0, microsecond=0)
+            if current_datetime != last_minute:
+                last_minute = current_datetime
+                try:
+                    if application:
+                        with newrelic.agent.BackgroundTask(
+                                application, name='run_cron', group='cron.py'):
+                            run_tick(settings, current_datetime, schedule, execution_cache,
+                                     executor)
+                    else:
+                        run_tick(settings, current_datetime, schedule, execution_cache,
+                                 executor)
+                except Exception:
+                    LOGGER.exception("cron failed at %s" % current_datetime)
+            time.sleep(DAEMON_SLEEP_SECONDS)
+
+    LOGGER.info("graceful shutdown")
+
+
+def run_tick(settings, current_datetime, schedule, execution_cache, executor):
+    """start the workflows due at the current time on the executor and wait for them"""
+    LOGGER.info("current_datetime: %s" % current_datetime)
+    execution_cache.refresh()
+    futures = {}
+    for conditional_start in due_starts(settings, current_datetime, execution_cache, schedule):
+        LOGGER.info("starting %s, workflow_id %s" % (
+            conditional_start.get("starter_name"), conditional_start.get("workflow_id")))
+        future = executor.submit(
+            start_pooled_workflow, settings, conditional_start.get("starter_name"),
+            conditional_start.get("workflow_id"))
+        futures[future] = conditional_start
+    for future in as_completed(futures):
+        try:
+            future.result()
+        except Exception:
+            LOGGER.exception("failed to start %s, workflow_id %s" % (
+                futures[future].get("starter_name"), futures[future].get("workflow_id")))
+
+
+def console_daemon_mode():
+    """capture the daemon option from arguments when running standalone"""
+    parser = ArgumentParser()
+    parser.add_argument("-d", "--daemon", default=False, action="store_true", dest="daemon",
+                        help="keep running and start workflows each minute")
+    args, unknown = parser.parse_known_args()
+    return args.daemon
+
+
+def get_execution_cache(settings):
+    """refreshed cache of completed executions, if a cache file is set in settings"""
+    cache_file = getattr(settings, 'swf_execution_cache_file', None)
+    if not cache_file:
+        return None
+    execution_cache = swfmetalib.ClosedExecutionCache(settings, cache_file)
+    execution_cache.refresh()
+    return execution_cache
 
 
 def get_current_datetime():
@@ -60,176 +143,118 @@ def get_local_datetime(current_datetime, timezone):
     return new_current_datetime
 
 
-def conditional_starts(current_datetime):
+def parse_cron_field(field, minimum, maximum):
+    """set of the values matched by a cron field, e.g. *, 5, 0-14, 10,12 or */15"""
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            start, end = minimum, maximum
+        elif '-' in part:
+            start, end = [int(value) for value in part.split('-')]
+        else:
+            start = int(part)
+            end = maximum if step > 1 else start
+        if start < minimum or end > maximum or start > end or step < 1:
+            raise ValueError("invalid cron field %s" % field)
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+def parse_cron(expression):
+    """
+    parse a cron expression of minute, hour, day of month, month and day of week (0 is Sunday)
+    into a tuple of the matched values of each field
+    """
+    fields = expression.split()
+    if len(fields) != len(CRON_FIELD_RANGES):
+        raise ValueError("invalid cron expression %s" % expression)
+    return tuple(parse_cron_field(field, minimum, maximum)
+                 for field, (minimum, maximum) in zip(fields, CRON_FIELD_RANGES))
+
+
+def cron_matches(cron_fields, local_datetime):
+    """whether the datetime matches every field of the parsed cron expression"""
+    minutes, hours, days, months, weekdays = cron_fields
+    return (local_datetime.minute in minutes
+            and local_datetime.hour in hours
+            and local_datetime.day in days
+            and local_datetime.month in months
+            and (local_datetime.weekday() + 1) % 7 in weekdays)
+
+
+def read_schedule(schedule_file=SCHEDULE_FILE):
+    """read the schedule from the YAML file and parse the cron expressions"""
+    with open(schedule_file, 'r') as open_file:
+        entries = yaml.safe_load(open_file.read())
+    schedule = []
+    for entry in entries:
+        schedule.append({
+            "starter_name": entry.get("starter_name"),
+            "workflow_id": entry.get("workflow_id"),
+            "start_seconds": int(entry.get("start_seconds")),
+            "cron": parse_cron(entry.get("schedule")),
+            "timezone": timezone(entry.get("timezone", "UTC")),
+        })
+    return schedule
+
+
+def schedule_file(settings):
+    """the schedule file from settings, otherwise SCHEDULE_FILE"""
+    return getattr(settings, 'cron_schedule_file', None) or SCHEDULE_FILE
+
+
+def default_schedule():
+    """the schedule from SCHEDULE_FILE, read once"""
+    global SCHEDULE
+    if SCHEDULE is None:
+        SCHEDULE = read_schedule(SCHEDULE_FILE)
+    return SCHEDULE
+
+
+def conditional_starts(current_datetime, schedule=None):
     """given the current time in UTC, return a list of workflows for conditional start"""
+    if schedule is None:
+        schedule = default_schedule()
     conditional_start_list = []
 
-    current_time = current_datetime.utctimetuple()
-
-    # localised time
-    local_current_datetime = get_local_datetime(current_datetime, TIMEZONE)
-    local_current_time = local_current_datetime.utctimetuple()
-
-    # Based on the minutes of the current time, run certain starters
-    if current_time.tm_min >= 0 and current_time.tm_min <= 59:
-        # Jobs to start at any time during the hour
-
-        conditional_start_list.append(OrderedDict([
-            ("starter_name", "cron_FiveMinute"),
-            ("workflow_id", "cron_FiveMinute"),
-            ("start_seconds", 60 * 3)
-        ]))
-
-    # Based on the minutes of the current time, run certain starters
-    if current_time.tm_min >= 0 and current_time.tm_min <= 14:
-        # Jobs to start at the top of the hour
-        LOGGER.info("Top of the hour")
-
-        conditional_start_list.append(OrderedDict([
-            ("starter_name", "starter_DepositCrossref"),
-            ("workflow_id", "DepositCrossref"),
-            ("start_seconds", 60 * 31)
-        ]))
-
-        # POA Publish at specific hours of the day UK time
-        if (local_current_time.tm_hour == 10
-                or local_current_time.tm_hour == 12
-                or local_current_time.tm_hour == 14
-                or local_current_time.tm_hour == 16):
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PublishPOA"),
-                ("workflow_id", "PublishPOA"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-        # CLOCKSS deposits once per day 22:00 UTC
-        if current_time.tm_hour == 22:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_CLOCKSS"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-        # CNKI deposits once per day 23:00 UTC
-        if current_time.tm_hour == 23:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_CNKI"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-    elif current_time.tm_min >= 15 and current_time.tm_min <= 19:
-        # Jobs to start at quarter past the hour
-        LOGGER.info("Quarter past the hour")
-
-    elif current_time.tm_min >= 20 and current_time.tm_min <= 29:
-        # Jobs to start at 20 minutes past the hour
-        LOGGER.info("Twenty minutes past the hour")
-
-        # POA Packaging at UK local time, hourly between 6:20 and 15:20
-        if (local_current_time.tm_hour >= 6
-                and local_current_time.tm_hour <= 15):
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "cron_NewS3POA"),
-                ("workflow_id", "cron_NewS3POA"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-    elif current_time.tm_min >= 30 and current_time.tm_min <= 44:
-        # Jobs to start at the half past to quarter to the hour
-        LOGGER.info("half past to quarter to the hour")
-
-        conditional_start_list.append(OrderedDict([
-            ("starter_name", "starter_DepositCrossrefPeerReview"),
-            ("workflow_id", "DepositCrossrefPeerReview"),
-            ("start_seconds", 60 * 31)
-        ]))
-
-        # PMC deposits once per day 20:30 UTC
-        if current_time.tm_hour == 20:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_PMC"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-        # Web of Science deposits once per day 21:30 UTC
-        if current_time.tm_hour == 21:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_WoS"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-        # Scopus deposits once per day 22:30 UTC
-        if current_time.tm_hour == 22:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_Scopus"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-        # CNPIEC deposits once per day 23:30 UTC
-        if current_time.tm_hour == 23:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_CNPIEC"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-    elif current_time.tm_min >= 45 and current_time.tm_min <= 59:
-        # Bottom quarter of the hour
-
-        # Author emails once per day 17:45 local time
-        # (used to be set to 16:45 UTC during British Summer Time for 17:45 local UK time)
-        if local_current_time.tm_hour == 17:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PublicationEmail"),
-                ("workflow_id", "PublicationEmail"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-        # Pub router deposits once per day 23:45 UTC
-        if current_time.tm_hour == 23:
+    # localised time of each timezone in the schedule
+    local_datetimes = {}
+    for entry in schedule:
+        if entry.get("timezone") not in local_datetimes:
+            local_datetimes[entry.get("timezone")] = get_local_datetime(
+                current_datetime, entry.get("timezone"))
+        if cron_matches(entry.get("cron"), local_datetimes[entry.get("timezone")]):
             conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_HEFCE"),
-                ("start_seconds", 60 * 31)
+                ("starter_name", entry.get("starter_name")),
+                ("workflow_id", entry.get("workflow_id")),
+                ("start_seconds", entry.get("start_seconds"))
             ]))
 
-        # Cengage deposits once per day 22:45 UTC
-        if current_time.tm_hour == 22:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_Cengage"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-        # GoOA / CAS deposits once per day 21:45 UTC
-        if current_time.tm_hour == 21:
-            conditional_start_list.append(OrderedDict([
-                ("starter_name", "starter_PubRouterDeposit"),
-                ("workflow_id", "PubRouterDeposit_GoOA"),
-                ("start_seconds", 60 * 31)
-            ]))
-
-        conditional_start_list.append(OrderedDict([
-            ("starter_name", "starter_PubmedArticleDeposit"),
-            ("workflow_id", "PubmedArticleDeposit"),
-            ("start_seconds", 60 * 31)
-        ]))
+    return conditional_start_list
 
-        conditional_start_list.append(OrderedDict([
-            ("starter_name", "starter_AdminEmail"),
-            ("workflow_id", "AdminEmail"),
-            ("start_seconds", (60*60*4)-(14*60))
-        ]))
 
-    return conditional_start_list
+def due_starts(settings, current_datetime, execution_cache=None, schedule=None):
+    """the conditional starts at the current time which are due to start"""
+    due_start_list = []
+    for conditional_start in conditional_starts(current_datetime, schedule):
+        do_start = workflow_conditional_start(
+            settings=settings,
+            workflow_id=conditional_start.get("workflow_id"),
+            start_seconds=conditional_start.get("start_seconds"),
+            execution_cache=execution_cache
+        )
+        if do_start:
+            due_start_list.append(conditional_start)
+    return due_start_list
 
 
 def workflow_conditional_start(settings, start_seconds,
-                               workflow_id=None, workflow_name=None, workflow_version=None):
+                               workflow_id=None, workflow_name=None, workflow_version=None,
+                               execution_cache=None):
     """
     Given workflow criteria, check the workflow completion history for the last time run
     If it last run more than start_seconds ago, start a new workflow
@@ -238,13 +263,19 @@ def workflow_conditional_start(settings, start_seconds,
     diff_seconds = None
     last_startTimestamp = None
 
-    swfmeta = swfmetalib.SWFMeta(settings)
-    swfmeta.connect()
+    if execution_cache:
+        last_startTimestamp = execution_cache.last_completed_start(
+            workflow_id=workflow_id,
+            workflow_name=workflow_name,
+            workflow_version=workflow_version)
+    else:
+        swfmeta = swfmetalib.SWFMeta(settings)
+        swfmeta.connect()
 
-    last_startTimestamp = swfmeta.get_last_completed_workflow_execution_startTimestamp(
-        workflow_id=workflow_id,
-        workflow_name=workflow_name,
-        workflow_version=workflow_version)
+        last_startTimestamp = swfmeta.get_last_completed_workflow_execution_startTimestamp(
+            workflow_id=workflow_id,
+            workflow_name=workflow_name,
+            workflow_version=workflow_version)
 
     current_timestamp = calendar.timegm(time.gmtime())
 
@@ -258,6 +289,12 @@ def workflow_conditional_start(settings, start_seconds,
             workflow_name, workflow_id, last_startTimestamp, diff_seconds))
 
 
+def start_pooled_workflow(settings, starter_name, workflow_id=None):
+    """start_workflow in an executor thread, over the SWF connection of the thread"""
+    helper.thread_swf_connection(settings)
+    start_workflow(settings, starter_name, workflow_id)
+
+
 def start_workflow(settings, starter_name, workflow_id=None):
     """start the workflow using the starter"""
     # Start a new workflow
@@ -291,5 +328,9 @@ if __name__ == "__main__":
     ENV = utils.console_start_env()
     SETTINGS = utils.get_settings(ENV)
     application = newrelic.agent.register_application(timeout=10.0)
-    with newrelic.agent.BackgroundTask(application, name='run_cron', group='cron.py'):
-        run_cron(settings=SETTINGS)
+    if console_daemon_mode():
+        process.monitor_interrupt(
+            lambda flag: run_daemon(SETTINGS, flag, application=application))
+    else:
+        with newrelic.agent.BackgroundTask(application, name='run_cron', group='cron.py'):
+            run_cron(settings=SETTINGS)
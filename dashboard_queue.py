@@ -1,20 +1,153 @@
+import atexit
+import os
+import queue
+import threading
+import time
 import boto.sqs
 import boto.sns
 from boto.sqs.message import Message
 import json
 import uuid
 from provider.utils import unicode_encode
+import log
+
+
+# emitter defaults, can be overridden in settings
+EMITTER_QUEUE_SIZE = 1000
+EMITTER_FLUSH_SIZE = 10
+EMITTER_FLUSH_SECONDS = 1
+# how long to wait at shutdown for the buffered messages to be published
+EMITTER_CLOSE_SECONDS = 10
+
+# put in the queue to stop the emitter after the messages before it
+CLOSE = object()
+
+IDENTITY = "process_%s" % os.getpid()
+LOGGER = log.logger("dashboard_queue.log", 'INFO', IDENTITY, loggerName=__name__)
 
 
 def send_message(message, settings):
 
-    conn = boto.sns.connect_to_region(settings.sqs_region,
+    if getattr(settings, 'dashboard_emitter', None):
+        emitter(settings).emit(message)
+        return
+    conn = connect(settings)
+    publish(conn, message, settings)
+
+
+def connect(settings):
+    return boto.sns.connect_to_region(settings.sqs_region,
                                       aws_access_key_id=settings.aws_access_key_id,
                                       aws_secret_access_key=settings.aws_secret_access_key)
+
+
+def publish(conn, message, settings):
     payload = unicode_encode(json.dumps(message))
     conn.publish(topic=settings.event_monitor_topic, message=payload)
 
 
+class DashboardEmitter:
+    """
+    Publish dashboard messages from a background thread over one SNS connection. Messages
+    are buffered in a bounded queue and published once flush_size are waiting, flush_seconds
+    after the first of them, or on close. emit never waits, if the queue is full or the
+    emitter is closed the message is dropped and logged
+    """
+
+    def __init__(self, settings, queue_size=None, flush_size=None, flush_seconds=None,
+                 logger=None):
+        self.settings = settings
+        self.flush_size = flush_size or getattr(
+            settings, 'dashboard_emitter_flush_size', EMITTER_FLUSH_SIZE)
+        self.flush_seconds = flush_seconds or getattr(
+            settings, 'dashboard_emitter_flush_seconds', EMITTER_FLUSH_SECONDS)
+        self.messages = queue.Queue(queue_size or getattr(
+            settings, 'dashboard_emitter_queue_size', EMITTER_QUEUE_SIZE))
+        self.logger = logger or LOGGER
+        self.conn = None
+        self.pid = os.getpid()
+        self.closing = False
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='dashboard-emitter', daemon=True)
+        self.thread.start()
+
+    def emit(self, message):
+        if self.closing:
+            self.logger.error("Dashboard emitter is closed, dropped message %s",
+                              message.get('message_id'))
+            return
+        try:
+            self.messages.put_nowait(message)
+        except queue.Full:
+            self.logger.error("Dashboard emitter queue is full, dropped message %s",
+                              message.get('message_id'))
+
+    def run(self):
+        while not self.closed.is_set():
+            batch = self.next_batch()
+            if batch:
+                self.publish(batch)
+
+    def next_batch(self):
+        "messages waiting, until flush_size of them, flush_seconds after the first or close"
+        batch = []
+        deadline = None
+        while len(batch) < self.flush_size:
+            timeout = None if deadline is None else deadline - time.time()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                message = self.messages.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if message is CLOSE:
+                self.closed.set()
+                break
+            batch.append(message)
+            if deadline is None:
+                deadline = time.time() + self.flush_seconds
+        return batch
+
+    def publish(self, batch):
+        for message in batch:
+            try:
+                if self.conn is None:
+                    self.conn = connect(self.settings)
+                publish(self.conn, message, self.settings)
+            except Exception:
+                self.logger.exception("Error publishing dashboard message %s",
+                                      message.get('message_id'))
+                # connect again for the next message
+                self.conn = None
+
+    def close(self, timeout=EMITTER_CLOSE_SECONDS):
+        "publish the buffered messages and stop"
+        self.closing = True
+        if not self.thread.is_alive():
+            return
+        try:
+            self.messages.put(CLOSE, timeout=timeout)
+        except queue.Full:
+            self.logger.error("Dashboard emitter did not publish its buffered messages")
+            return
+        self.thread.join(timeout)
+
+
+EMITTER = None
+EMITTER_LOCK = threading.Lock()
+
+
+def emitter(settings):
+    "the DashboardEmitter of this process, closed at exit"
+    global EMITTER
+    with EMITTER_LOCK:
+        # a forked process does not have the parent's thread
+        if EMITTER is None or EMITTER.pid != os.getpid():
+            EMITTER = DashboardEmitter(settings)
+            atexit.register(EMITTER.close)
+        return EMITTER
+
+
 def build_event_message(item_identifier, version, run, event_type, timestamp, status, message):
     message = {
         'message_type': 'event',
@@ -7,11 +7,21 @@ import newrelic.agent
 from provider import process, utils
 import log
 import workflow
+from workflow.objects import HistoryIndex, HISTORY_INDEX_KEY
+
+
+# SWF default and maximum number of history events per decision task page
+DEFAULT_MAXIMUM_PAGE_SIZE = 100
+SWF_MAXIMUM_PAGE_SIZE = 1000
+
+# history event attributes removed when decider_compact_events is True
+COMPACT_EVENT_OMIT_ATTRIBUTES = ["input", "result", "details", "control"]
 
 
 def decide(settings, flag, debug=False):
     # Decider event history length requested
-    maximum_page_size = 100
+    maximum_page_size = get_maximum_page_size(settings)
+    event_filter = compact_event if getattr(settings, 'decider_compact_events', False) else None
 
     # Log
     identity = "decider_%s" % os.getpid()
@@ -33,10 +43,16 @@ def decide(settings, flag, debug=False):
                                                    settings.default_task_list,
                                                    identity, maximum_page_size)
 
-            # Check for a nextPageToken and keep polling until all events are pulled
-            decision = get_all_paged_events(decision, conn, settings.domain,
-                                            settings.default_task_list,
-                                            identity, maximum_page_size)
+            # Check for a nextPageToken and keep polling until all events are pulled,
+            # unless debug logs them all the events are indexed page by page instead
+            if debug:
+                decision = get_all_paged_events(decision, conn, settings.domain,
+                                                settings.default_task_list,
+                                                identity, maximum_page_size, event_filter)
+            else:
+                decision = get_indexed_decision(decision, conn, settings.domain,
+                                                settings.default_task_list,
+                                                identity, maximum_page_size, event_filter)
 
             token = get_task_token(decision)
             logger.info('got token: %s', token)
@@ -103,49 +119,102 @@ def invoke_do_workflow(workflow_name, workflow_object, logger):
 def trimmed_decision(decision, debug=False):
     """trim data from a copy of decision prior to logging if not debug"""
     decision_trimmed = copy.copy(decision)
+    decision_trimmed.pop(HISTORY_INDEX_KEY, None)
     if not debug:
         # removed to limit verbosity
         decision_trimmed['events'] = []
     return decision_trimmed
 
 
-def get_all_paged_events(decision, conn, domain, task_list, identity, maximum_page_size):
+def get_all_paged_events(decision, conn, domain, task_list, identity, maximum_page_size,
+                         event_filter=None):
     """
     Given a poll_for_decision_task response, check if there is a nextPageToken
-    and if so, recursively poll for all workflow events, and assemble a final
-    decision response to return
+    and if so, poll for all workflow events, and assemble a final
+    decision response to return, optionally passing each event through event_filter
     """
-
-    # First check if there is no nextPageToken, if there is none
-    #  return the decision, nothing to page
-    next_page_token = None
-    try:
-        next_page_token = decision["nextPageToken"]
-    except KeyError:
-        next_page_token = None
-    if next_page_token is None:
+    if decision.get("nextPageToken") is None and event_filter is None:
         return decision
 
-    # Continue, we have a nextPageToken. Assemble a full array of events by continually polling
-    all_events = decision["events"]
-    while next_page_token is not None:
-        try:
-            next_page_token = decision["nextPageToken"]
-            if next_page_token is not None:
-                decision = conn.poll_for_decision_task(domain, task_list,
-                                                       identity, maximum_page_size,
-                                                       next_page_token)
-                for event in decision["events"]:
-                    all_events.append(event)
-        except KeyError:
-            next_page_token = None
-
-    # Finally, reset the original decision response with the full set of events
-    decision["events"] = all_events
+    last_page = {}
+    events = []
+    for event in iter_paged_events(decision, conn, domain, task_list, identity,
+                                   maximum_page_size, last_page):
+        events.append(event_filter(event) if event_filter else event)
+
+    # Finally, reset the last decision response with the full set of events
+    decision = last_page.get("decision", decision)
+    decision["events"] = events
 
     return decision
 
 
+def get_indexed_decision(decision, conn, domain, task_list, identity, maximum_page_size,
+                         event_filter=None):
+    """
+    Given a poll_for_decision_task response, build the HistoryIndex from the events of
+    it and each following page as they are polled, without holding the whole history.
+    Returns the last page response with only the first event, which has the workflow
+    input, and the index attached under HISTORY_INDEX_KEY
+    """
+    last_page = {}
+    events = iter_paged_events(decision, conn, domain, task_list, identity,
+                               maximum_page_size, last_page)
+    if event_filter:
+        events = (event_filter(event) for event in events)
+    index = HistoryIndex(decision, events)
+
+    decision = last_page.get("decision", decision)
+    decision["events"] = [index.first_event] if index.event_count else []
+    decision[HISTORY_INDEX_KEY] = index
+    index.decision = decision
+    return decision
+
+
+def iter_paged_events(decision, conn, domain, task_list, identity, maximum_page_size,
+                      last_page=None):
+    """
+    Given a poll_for_decision_task response, yield its events and then the events of
+    each following page, polling SWF for a page only once the previous page is consumed.
+    If a last_page dict is supplied its "decision" is set to the latest page response
+    """
+    page = decision
+    while True:
+        if last_page is not None:
+            last_page["decision"] = page
+        for event in page.get("events", []):
+            yield event
+        next_page_token = page.get("nextPageToken")
+        if next_page_token is None:
+            return
+        page = conn.poll_for_decision_task(domain, task_list,
+                                           identity, maximum_page_size,
+                                           next_page_token)
+
+
+def get_maximum_page_size(settings):
+    "decision event history page size from settings, at most the SWF limit"
+    maximum_page_size = getattr(settings, 'decider_maximum_page_size', DEFAULT_MAXIMUM_PAGE_SIZE)
+    return min(int(maximum_page_size), SWF_MAXIMUM_PAGE_SIZE)
+
+
+def compact_event(event):
+    """
+    Drop the activity input, result and details from a history event, they
+    can be large and are not read when deciding, keep the workflow input
+    """
+    if not isinstance(event, dict):
+        return event
+    compacted = {}
+    for key, value in event.items():
+        if (key.endswith("EventAttributes") and isinstance(value, dict)
+                and key != "workflowExecutionStartedEventAttributes"):
+            value = {attr_key: attr_value for attr_key, attr_value in value.items()
+                     if attr_key not in COMPACT_EVENT_OMIT_ATTRIBUTES}
+        compacted[key] = value
+    return compacted
+
+
 def get_input(decision):
     """
     From the decision response, which is JSON data form SWF, get the
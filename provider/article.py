@@ -11,6 +11,7 @@ from boto.s3.connection import S3Connection
 import provider.s3lib as s3lib
 from elifetools import parseJATS as parser
 from provider.article_structure import ArticleInfo
+from provider.published_index import PublishedIndex
 from provider.storage_provider import storage_context
 from provider.utils import pad_msid, get_doi_url
 
@@ -60,6 +61,10 @@ class article(object):
         # Store the list of DOI id that was ever published
         self.doi_ids = None
 
+        # S3 connection and buckets for listing the published folders
+        self.s3_conn = None
+        self.buckets = {}
+
     def parse_article_file(self, filename):
         """
         Given a filename to an article XML
@@ -236,8 +241,10 @@ class article(object):
 
     def was_published_doi_ids(self, workflow, force=False, folder_names=None, s3_key_names=None):
         """
-        Connect to the S3 bucket, and from the files in the published folder,
-        get a list of .xml files, and then parse out the article id
+        Get the list of article ids in the published folder of the workflow, read from the
+        published index, or if there is no index yet (or force) connect to the S3 bucket and
+        from the files in the published folder, get a list of .xml files, and then parse out
+        the article id, saving them as the index
           folder_names and s3_key_names is only supplied for when running automated tests
         """
         # Return from cached values if not force
@@ -246,38 +253,56 @@ class article(object):
 
         doi_ids = []
 
-        if workflow == "HEFCE":
-            published_folder = "pub_router/published/"
-        if workflow == "Cengage":
-            published_folder = "cengage/published/"
-        if workflow == "GoOA":
-            published_folder = "gooa/published/"
-        if workflow == "WoS":
-            published_folder = "wos/published/"
-        if workflow == "Scopus":
-            published_folder = "scopus/published/"
-        if workflow == "CNPIEC":
-            published_folder = "cnpiec/published/"
-        if workflow == "CNKI":
-            published_folder = "cnki/published/"
-        if workflow == "CLOCKSS":
-            published_folder = "clockss/published/"
+        published_folder = self.get_published_folder(workflow)
+        if published_folder is None:
+            return doi_ids
 
         file_extensions = []
         file_extensions.append(".xml")
 
         bucket_name = self.settings.poa_packaging_bucket
 
+        index = None
+        if (folder_names is None and s3_key_names is None
+                and getattr(self.settings, 'published_doi_index', True)):
+            index = PublishedIndex(self.settings, bucket_name, published_folder)
+            if force is False and index.load() is not None:
+                self.doi_ids = sorted(index.doi_ids)
+                return self.doi_ids
+
         doi_ids = self.doi_ids_from_published_folder(bucket_name, published_folder,
                                                      file_extensions, folder_names,
                                                      s3_key_names)
 
+        if index:
+            index.rebuild(doi_ids)
+
         # Cache it
         self.doi_ids = doi_ids
 
         # Return it
         return doi_ids
 
+    def get_published_folder(self, workflow):
+        "S3 published folder of the workflow in the poa_packaging_bucket"
+        if workflow == "HEFCE":
+            return "pub_router/published/"
+        if workflow == "Cengage":
+            return "cengage/published/"
+        if workflow == "GoOA":
+            return "gooa/published/"
+        if workflow == "WoS":
+            return "wos/published/"
+        if workflow == "Scopus":
+            return "scopus/published/"
+        if workflow == "CNPIEC":
+            return "cnpiec/published/"
+        if workflow == "CNKI":
+            return "cnki/published/"
+        if workflow == "CLOCKSS":
+            return "clockss/published/"
+        return None
+
     def doi_ids_from_published_folder(self, bucket_name, published_folder, file_extensions,
                                       folder_names=None, s3_key_names=None):
         """
@@ -285,9 +310,6 @@ class article(object):
         get a list of files by file extensions, and then parse out the article id
           folder_names and s3_key_names is only supplied for when running automated tests
         """
-        ids = []
-
-
         if folder_names is None:
             # Get the folder names from live s3 bucket if no test data supplied
             folder_names = self.get_folder_names_from_bucket(
@@ -308,6 +330,12 @@ class article(object):
                 for key_name in key_names:
                     s3_key_names.append(key_name)
 
+        return self.doi_ids_from_s3_key_names(s3_key_names)
+
+    def doi_ids_from_s3_key_names(self, s3_key_names):
+        "sorted unique article ids parsed from POA or VOR XML file key names"
+        ids = []
+
         # Extract just the doi_id portion
         for s3_key_name in s3_key_names:
             doi_id = self.get_doi_id_from_poa_s3_key_name(s3_key_name)
@@ -324,6 +352,15 @@ class article(object):
 
         return ids
 
+    def get_bucket(self, bucket_name):
+        "connect to S3 once and look up each bucket once for this article object"
+        if bucket_name not in self.buckets:
+            if self.s3_conn is None:
+                self.s3_conn = S3Connection(self.settings.aws_access_key_id,
+                                            self.settings.aws_secret_access_key)
+            self.buckets[bucket_name] = self.s3_conn.lookup(bucket_name)
+        return self.buckets[bucket_name]
+
     def get_folder_names_from_bucket(self, bucket_name, prefix):
         """
         Use live s3 bucket connection to get the folder names
@@ -331,10 +368,7 @@ class article(object):
         can use test data when running automated tests
         """
         folder_names = None
-        # Connect to S3 and bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
-        bucket = s3_conn.lookup(bucket_name)
+        bucket = self.get_bucket(bucket_name)
 
         # Step one, get all the subfolder names
         folder_names = s3lib.get_s3_key_names_from_bucket(
@@ -351,10 +385,7 @@ class article(object):
         can use test data when running automated tests
         """
         s3_key_names = None
-        # Connect to S3 and bucket
-        s3_conn = S3Connection(self.settings.aws_access_key_id,
-                               self.settings.aws_secret_access_key)
-        bucket = s3_conn.lookup(bucket_name)
+        bucket = self.get_bucket(bucket_name)
 
         s3_key_names = s3lib.get_s3_key_names_from_bucket(
             bucket=bucket,
@@ -1,5 +1,8 @@
 import os
 import shutil
+import struct
+import zipfile
+from io import BytesIO
 import dateutil.parser
 from collections import OrderedDict
 from elifetools import xmlio
@@ -12,6 +15,10 @@ Functions for processing article zip and XML for reuse by different activities
 Originally refactoring them from the PMCDeposit activity for reuse into FTPArticle
 """
 
+# general purpose bit flag set when the sizes and CRC follow the member data
+DATA_DESCRIPTOR_FLAG = 0x08
+ZIP_COPY_CHUNK_SIZE = 1024 * 1024
+
 def list_dir(dir_name):
     dir_list = os.listdir(dir_name)
     dir_list = [dir_name + os.sep + item for item in dir_list]
@@ -75,11 +82,22 @@ def rename_files_remove_version_number(files_dir, output_dir, logger=None):
 
 def convert_xml(xml_file, file_name_map):
 
+    with open(xml_file, 'rb') as open_file:
+        reparsed_string = convert_xml_string(open_file.read(), file_name_map)
+
+    f = open(xml_file, 'wb')
+    f.write(reparsed_string)
+    f.close()
+
+
+def convert_xml_string(xml_string, file_name_map):
+    "XML bytes with the xlink href values renamed according to the file_name_map"
+
     # Register namespaces
     xmlio.register_xmlns()
 
     root, doctype_dict, processing_instructions = xmlio.parse(
-        xml_file,
+        BytesIO(xml_string),
         return_doctype_dict=True,
         return_processing_instructions=True)
 
@@ -88,16 +106,12 @@ def convert_xml(xml_file, file_name_map):
     # TODO - compare whether all file names were converted
 
     # Start the file output
-    reparsed_string = xmlio.output(
+    return xmlio.output(
         root,
         type=None,
         doctype_dict=doctype_dict,
         processing_instructions=processing_instructions)
 
-    f = open(xml_file, 'wb')
-    f.write(reparsed_string)
-    f.close()
-
 
 def verify_rename_files(file_name_map):
     """
@@ -118,6 +132,96 @@ def verify_rename_files(file_name_map):
     return (verified, renamed_list, not_renamed_list)
 
 
+def zip_file_names(zip_file_name):
+    "names of the files in the zip which are not inside a folder, as extracting it would list"
+    with zipfile.ZipFile(zip_file_name, 'r') as open_zip:
+        return [name for name in open_zip.namelist() if '/' not in name]
+
+
+def read_zip_member(zip_file_name, member_name):
+    with zipfile.ZipFile(zip_file_name, 'r') as open_zip:
+        return open_zip.read(member_name)
+
+
+def copy_zip_member_raw(source_zip, info, dest_zip, new_name=None):
+    """
+    copy a member of an open zip into a zip open for writing as its compressed bytes,
+    without decompressing and compressing it again, optionally with a new name
+    """
+    source_zip.fp.seek(info.header_offset)
+    file_header = struct.unpack(
+        zipfile.structFileHeader, source_zip.fp.read(zipfile.sizeFileHeader))
+    if file_header[0] != zipfile.stringFileHeader:
+        raise zipfile.BadZipFile("Bad magic number for file header of %s" % info.filename)
+    # skip the file name and extra field of the local header
+    source_zip.fp.seek(file_header[10] + file_header[11], os.SEEK_CUR)
+
+    new_info = zipfile.ZipInfo(new_name or info.filename, info.date_time)
+    new_info.compress_type = info.compress_type
+    new_info.CRC = info.CRC
+    new_info.compress_size = info.compress_size
+    new_info.file_size = info.file_size
+    new_info.create_system = info.create_system
+    new_info.external_attr = info.external_attr
+    # the sizes and CRC are known and go in the local header, not after the data
+    new_info.flag_bits = info.flag_bits & ~DATA_DESCRIPTOR_FLAG
+
+    dest_zip.fp.seek(dest_zip.start_dir)
+    new_info.header_offset = dest_zip.fp.tell()
+    zip64 = max(info.file_size, info.compress_size) > zipfile.ZIP64_LIMIT
+    dest_zip.fp.write(new_info.FileHeader(zip64))
+    remaining = info.compress_size
+    while remaining > 0:
+        chunk = source_zip.fp.read(min(ZIP_COPY_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile("Truncated data of %s" % info.filename)
+        dest_zip.fp.write(chunk)
+        remaining -= len(chunk)
+    dest_zip.start_dir = dest_zip.fp.tell()
+    dest_zip.filelist.append(new_info)
+    dest_zip.NameToInfo[new_info.filename] = new_info
+    return new_info
+
+
+def repackage_zip(zip_file_names, new_zip_file_name, member_filter=None, file_name_map=None,
+                  rewrite_members=None, logger=None):
+    """
+    build a new zip from members of the zip files without extracting them, members are
+    copied compressed as they are. member_filter selects members by name, file_name_map
+    renames them, and rewrite_members maps a member name to a function of its data
+    returning new data to compress, e.g. for the article XML. If more than one zip has a
+    member of the same new name the one from the later zip is used
+    """
+    file_name_map = file_name_map or {}
+    rewrite_members = rewrite_members or {}
+    if logger:
+        logger.info("repackaging %s into %s" % (zip_file_names, new_zip_file_name))
+    source_zips = [zipfile.ZipFile(zip_file_name, 'r') for zip_file_name in zip_file_names]
+    try:
+        members = OrderedDict()
+        for source_zip in source_zips:
+            for info in source_zip.infolist():
+                if (info.filename.endswith('/') or
+                        (member_filter and not member_filter(info.filename))):
+                    continue
+                members[file_name_map.get(info.filename) or info.filename] = (source_zip, info)
+        with zipfile.ZipFile(new_zip_file_name, 'w', zipfile.ZIP_DEFLATED,
+                             allowZip64=True) as new_zip:
+            for new_name, (source_zip, info) in members.items():
+                if info.filename in rewrite_members:
+                    new_info = zipfile.ZipInfo(new_name, info.date_time)
+                    new_info.external_attr = info.external_attr
+                    new_zip.writestr(
+                        new_info, rewrite_members[info.filename](source_zip.read(info)),
+                        zipfile.ZIP_DEFLATED)
+                else:
+                    copy_zip_member_raw(source_zip, info, new_zip, new_name)
+    finally:
+        for source_zip in source_zips:
+            source_zip.close()
+    return list(members.keys())
+
+
 def new_pmc_zip_filename(journal, volume, fid, revision=None):
     filename = journal
     filename = filename + '-' + utils.pad_volume(volume)
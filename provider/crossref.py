@@ -1,14 +1,23 @@
 import os
 import time
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import requests
+from requests.adapters import HTTPAdapter
 from elifearticle.article import ArticleDate
 from elifecrossref import generate
 from elifecrossref.conf import raw_config, parse_raw_config
 from provider import article_processing, lax_provider, utils
+from provider.process import RecyclingProcessPool
 from provider.storage_provider import storage_context
 
 
+# defaults, can be overridden in settings
+PROCESSES = 1
+UPLOAD_THREADS = 4
+
+
 def override_tmp_dir(tmp_dir):
     """explicit override of TMP_DIR in the generate module"""
     if tmp_dir:
@@ -39,14 +48,41 @@ def parse_article_xml(article_xml_files, tmp_dir=None):
     return articles
 
 
-def article_xml_list_parse(article_xml_files, bad_xml_files, tmp_dir=None):
+def map_in_processes(function, items, processes=PROCESSES, failed=None):
+    """
+    list of function(item) for each item in order, in a pool of spawned processes if more
+    than one. An item whose worker process dies, or whose call raises, gets the failed value
+    """
+    if processes and processes > 1 and len(items) > 1:
+        # spawned rather than forked from the activity worker with its threads and connections
+        with RecyclingProcessPool(function, processes) as pool:
+            futures = [pool.submit(item) for item in items]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except RuntimeError:
+                    results.append(failed)
+            return results
+    return [function(item) for item in items]
+
+
+def parse_article_xml_file(xml_file, tmp_dir=None):
+    """parse one article XML file, returns None if it does not parse"""
+    articles = parse_article_xml([xml_file], tmp_dir)
+    return articles[0] if articles else None
+
+
+def article_xml_list_parse(article_xml_files, bad_xml_files, tmp_dir=None,
+                           processes=PROCESSES):
     """given a list of article XML file names parse to an article object map"""
     article_object_map = OrderedDict()
-    # parse one at a time to check which parse and which are bad
-    for xml_file in article_xml_files:
-        articles = parse_article_xml([xml_file], tmp_dir)
-        if articles:
-            article_object_map[xml_file] = articles[0]
+    # parse one file per task to check which parse and which are bad
+    articles = map_in_processes(
+        partial(parse_article_xml_file, tmp_dir=tmp_dir), article_xml_files, processes)
+    for xml_file, article in zip(article_xml_files, articles):
+        if article:
+            article_object_map[xml_file] = article
         else:
             bad_xml_files.append(xml_file)
     return article_object_map
@@ -127,18 +163,42 @@ def crossref_data_payload(crossref_login_id, crossref_login_passwd, operation='d
     }
 
 
-def upload_files_to_endpoint(url, payload, xml_files):
-    """Using an HTTP POST, deposit the file to the Crossref endpoint"""
+def upload_session(threads=UPLOAD_THREADS):
+    """requests session keeping up to threads connections open to the endpoint"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, threads))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def upload_file_to_endpoint(session, url, payload, xml_file):
+    """POST one file, returns the response and how many seconds it took"""
+    start = time.time()
+    with open(xml_file, 'rb') as open_file:
+        response = session.post(url, data=payload, files={'file': open_file})
+    return response, time.time() - start
+
+
+def upload_files_to_endpoint(url, payload, xml_files, threads=UPLOAD_THREADS, logger=None):
+    """
+    Using an HTTP POST, deposit the files to the Crossref endpoint,
+    at most threads files at a time over one session
+    """
 
     # Default return status
     status = True
     http_detail_list = []
 
-    for xml_file in xml_files:
-        files = {'file': open(xml_file, 'rb')}
-
-        response = requests.post(url, data=payload, files=files)
+    with upload_session(threads) as session:
+        with ThreadPoolExecutor(max_workers=max(1, threads)) as executor:
+            results = list(executor.map(
+                partial(upload_file_to_endpoint, session, url, payload), xml_files))
 
+    for xml_file, (response, seconds) in zip(xml_files, results):
+        if logger:
+            logger.info("Crossref upload of %s status %s took %.2f seconds" %
+                        (xml_file, response.status_code, seconds))
         # Check for good HTTP status code
         if response.status_code != 200:
             status = False
@@ -150,19 +210,35 @@ def upload_files_to_endpoint(url, payload, xml_files):
     return status, http_detail_list
 
 
+def generate_crossref_xml_file(article, crossref_config, submission_type="journal",
+                               pretty=False, indent="", tmp_dir=None):
+    """write the deposit XML of one article to tmp_dir, returns True if it was generated"""
+    override_tmp_dir(tmp_dir)
+    try:
+        generate.crossref_xml_to_disk(
+            [article], crossref_config, submission_type=submission_type,
+            pretty=pretty, indent=indent)
+    except:
+        return False
+    return True
+
+
 def generate_crossref_xml_to_disk(article_object_map, crossref_config, good_xml_files,
                                   bad_xml_files, submission_type="journal",
-                                  pretty=False, indent=""):
+                                  pretty=False, indent="", processes=PROCESSES):
     """from the article object generate crossref deposit XML"""
-    for xml_file, article in list(article_object_map.items()):
-        try:
-            # Will write the XML to the TMP_DIR
-            generate.crossref_xml_to_disk(
-                [article], crossref_config, submission_type=submission_type,
-                pretty=pretty, indent=indent)
+    xml_files = list(article_object_map.keys())
+    # pass the TMP_DIR on for when the XML is written by another process
+    generated = map_in_processes(
+        partial(generate_crossref_xml_file, crossref_config=crossref_config,
+                submission_type=submission_type, pretty=pretty, indent=indent,
+                tmp_dir=generate.TMP_DIR),
+        list(article_object_map.values()), processes)
+    for xml_file, success in zip(xml_files, generated):
+        if success:
             # Add filename to the list of good files
             good_xml_files.append(xml_file)
-        except:
+        else:
             # Add the file to the list of bad files
             bad_xml_files.append(xml_file)
     # Any files generated is a sucess, even if one failed
@@ -6,6 +6,7 @@ import re
 import os
 import sys
 import io
+import threading
 
 from ejpcsvparser.utils import entity_to_unicode
 import boto.s3
@@ -17,6 +18,55 @@ EJP data provider
 Connects to S3, discovers, downloads, and parses files exported by EJP
 """
 
+# parsed author and editor files of this process by file_type, with the S3 key name
+# and ETag they were parsed from
+DATA_STORES = {}
+DATA_STORES_LOCK = threading.Lock()
+
+# EJP bucket file lists of this process by bucket name, with the time they expire, so one
+# listing finds the latest file of each file type. Can be overridden in settings
+BUCKET_FILE_LIST_TTL = 60
+BUCKET_FILE_LISTS = {}
+
+
+class EJPDataStore(object):
+    """
+    Rows of an EJP author or editor file indexed by doi_id, for author files
+    with the corresponding author flag of each row worked out once
+    """
+
+    def __init__(self, column_headings, rows, corresponding=None, convert=None):
+        self.column_headings = column_headings
+        self.rows = []
+        self.doi_id_rows = {}
+        for fields in rows:
+            is_corr = corresponding(fields) if corresponding else None
+            if convert:
+                fields = [convert(field) for field in fields]
+            row = (fields, is_corr)
+            self.rows.append(row)
+            try:
+                doi_id = int(fields[0])
+            except (IndexError, ValueError):
+                continue
+            self.doi_id_rows.setdefault(doi_id, []).append(row)
+
+    def get(self, doi_id=None, corresponding=None):
+        """
+        Rows for the doi_id, or all rows if doi_id is None, only corresponding author
+        rows if corresponding is True. None if there are no rows
+        """
+        if doi_id is None:
+            rows = self.rows
+        else:
+            rows = self.doi_id_rows.get(int(doi_id), [])
+        selected = [list(fields) for fields, is_corr in rows
+                    if not corresponding or is_corr is True]
+        if len(selected) <= 0:
+            return None
+        return selected
+
+
 class EJP(object):
 
     def __init__(self, settings=None, tmp_dir=None):
@@ -140,54 +190,8 @@ class EJP(object):
             None, return all authors
           If document is None, find the most recent authors file
         """
-        authors = []
-        # Check for the document
-        if local_document is None:
-            # No document? Find it on S3, save the content to
-            #  the tmp_dir
-            s3_key_name = self.find_latest_s3_file_name(file_type="author")
-            s3_key = self.get_s3key(s3_key_name)
-            contents = s3_key.get_contents_as_string()
-            document = self.write_content_to_file(self.author_default_filename, contents)
-        else:
-            # copy the document to the tmp_dir if provided
-            with open(local_document, 'rb') as fp:
-                document = self.write_content_to_file(self.author_default_filename, fp.read())
-
-        # Parse the author file
-        (column_headings, author_rows) = self.parse_author_file(document)
-
-        if author_rows:
-            for fields in author_rows:
-                add = True
-                # Check doi_id column value
-                if doi_id is not None:
-                    if int(doi_id) != int(fields[0]):
-                        add = False
-                # Check corresponding column value
-                if corresponding and add is True:
-
-                    author_type_cde = fields[4]
-                    dual_corr_author_ind = fields[5]
-                    is_corr = self.is_corresponding_author(author_type_cde, dual_corr_author_ind)
-
-                    if corresponding is True:
-                        # If not a corresponding author, drop it
-                        if is_corr is not True:
-                            add = False
-                    elif corresponding is False:
-                        # If is a corresponding author, drop it
-                        if is_corr is True:
-                            add = False
-                fields = [entity_to_unicode(field) for field in fields]
-                # Finish up, add the author if we should
-                if add is True:
-                    authors.append(fields)
-
-        if len(authors) <= 0:
-            authors = None
-
-        return (column_headings, authors)
+        store = self.data_store("author", local_document)
+        return (store.column_headings, store.get(doi_id, corresponding))
 
     def is_corresponding_author(self, author_type_cde, dual_corr_author_ind):
         """
@@ -246,37 +250,60 @@ class EJP(object):
           If doi_id is None, return all editors
           If document is None, find the most recent editors file
         """
-        editors = []
-        # Check for the document
-        if local_document is None:
-            s3_key_name = self.find_latest_s3_file_name(file_type="editor")
-            s3_key = self.get_s3key(s3_key_name)
-            contents = s3_key.get_contents_as_string()
-            document = self.write_content_to_file(self.editor_default_filename, contents)
+        store = self.data_store("editor", local_document)
+        return (store.column_headings, store.get(doi_id))
+
+    def data_store(self, file_type, local_document=None):
+        """
+        EJPDataStore of the author or editor file. The latest file on S3 is parsed once
+        per worker process and reused until its ETag changes, a local_document provided
+        when running tests is parsed each time
+          file_type options: author, editor
+        """
+        if file_type == "author":
+            filename = self.author_default_filename
         else:
+            filename = self.editor_default_filename
+
+        if local_document is not None:
             # copy the document to the tmp_dir if provided
             with open(local_document, 'rb') as fp:
-                document = self.write_content_to_file(self.editor_default_filename, fp.read())
-
-        # Parse the file
+                document = self.write_content_to_file(filename, fp.read())
+            return self.parse_data_store(file_type, document)
+
+        s3_key_name = self.find_latest_s3_file_name(file_type=file_type)
+        s3_key = self.get_s3key(s3_key_name)
+        version = (s3_key_name, getattr(s3_key, 'etag', None))
+        with DATA_STORES_LOCK:
+            cached = DATA_STORES.get(file_type)
+        if cached and version[1] and cached[0] == version:
+            return cached[1]
+
+        # No document? Find it on S3, save the content to the tmp_dir
+        contents = s3_key.get_contents_as_string()
+        document = self.write_content_to_file(filename, contents)
+        store = self.parse_data_store(file_type, document)
+        if version[1]:
+            with DATA_STORES_LOCK:
+                DATA_STORES[file_type] = (version, store)
+        return store
+
+    def parse_data_store(self, file_type, document):
+        "parse the author or editor file into an EJPDataStore"
+        if file_type == "author":
+            (column_headings, author_rows) = self.parse_author_file(document)
+            return EJPDataStore(column_headings, author_rows,
+                                corresponding=self.is_corresponding_row,
+                                convert=entity_to_unicode)
         (column_headings, editor_rows) = self.parse_editor_file(document)
+        return EJPDataStore(column_headings, editor_rows)
 
-        if editor_rows:
-            for a in editor_rows:
-                add = True
-                # Check doi_id column value
-                if doi_id is not None:
-                    if int(doi_id) != int(a[0]):
-                        add = False
-
-                # Finish up, add the author if we should
-                if add is True:
-                    editors.append(a)
-
-        if len(editors) <= 0:
-            editors = None
-
-        return (column_headings, editors)
+    def is_corresponding_row(self, fields):
+        "whether an author file row is for a corresponding author"
+        try:
+            return self.is_corresponding_author(fields[4], fields[5])
+        except IndexError:
+            return False
 
     def find_latest_s3_file_name(self, file_type, file_list=None):
         """
@@ -308,7 +335,7 @@ class EJP(object):
         fn_fragment["poa_ethics"] = "ejp_query_tool_query_id_POA_Ethics"
 
         if file_list is None:
-            file_list = self.ejp_bucket_file_list()
+            file_list = self.cached_bucket_file_list()
 
         if file_list:
             good_file_list = []
@@ -326,6 +353,23 @@ class EJP(object):
 
         return s3_key_name
 
+    def cached_bucket_file_list(self):
+        """
+        The ejp_bucket_file_list, listed again once it is older than the
+        ejp_bucket_file_list_ttl seconds from the settings
+        """
+        bucket_name = self.settings.ejp_bucket
+        with DATA_STORES_LOCK:
+            cached = BUCKET_FILE_LISTS.get(bucket_name)
+        if cached and cached[0] > time.time():
+            return cached[1]
+        file_list = self.ejp_bucket_file_list()
+        ttl = getattr(self.settings, 'ejp_bucket_file_list_ttl', BUCKET_FILE_LIST_TTL)
+        if file_list and ttl > 0:
+            with DATA_STORES_LOCK:
+                BUCKET_FILE_LISTS[bucket_name] = (time.time() + ttl, file_list)
+        return file_list
+
     def ejp_bucket_file_list(self):
         """
         Connect to the EJP bucket, as specified in the settings,
@@ -348,20 +392,17 @@ class EJP(object):
 
             for attr_name in attr_list:
 
-                raw_value = eval("key." + attr_name)
+                raw_value = getattr(key, attr_name, None)
                 if raw_value:
                     string_value = str(raw_value)
                     item_attrs[attr_name] = string_value
 
-                try:
-                    if item_attrs['last_modified']:
-                        # Parse last_modified into a timestamp for easy computations
-                        date_format = utils.DATE_TIME_FORMAT
-                        date_str = time.strptime(item_attrs['last_modified'], date_format)
-                        timestamp = calendar.timegm(date_str)
-                        item_attrs['last_modified_timestamp'] = timestamp
-                except KeyError:
-                    pass
+            if item_attrs.get('last_modified'):
+                # Parse last_modified into a timestamp for easy computations
+                date_format = utils.DATE_TIME_FORMAT
+                date_str = time.strptime(item_attrs['last_modified'], date_format)
+                timestamp = calendar.timegm(date_str)
+                item_attrs['last_modified_timestamp'] = timestamp
 
             # Finally, add to the file list
             if len(item_attrs) > 0:
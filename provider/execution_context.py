@@ -1,3 +1,4 @@
+import threading
 import redis
 from boto.s3.connection import S3Connection
 from boto.s3.key import Key
@@ -43,11 +44,34 @@ class FileSession(object):
                 value = self.input_data[key]
         return value
 
+    def store_values(self, mapping):
+
+        for key, value in mapping.items():
+            self.store_value(key, value)
+
+    def get_values(self, keys):
+
+        return {key: self.get_value(key) for key in keys}
+
     def get_full_key(self, key):
 
         return self.session_key + '__' + key
 
 
+REDIS_POOLS = {}
+REDIS_POOLS_LOCK = threading.Lock()
+
+
+def redis_connection_pool(settings):
+    "connection pool shared by the sessions in this process for the Redis server"
+    pool_key = (settings.redis_host, settings.redis_port, settings.redis_db)
+    with REDIS_POOLS_LOCK:
+        if pool_key not in REDIS_POOLS:
+            REDIS_POOLS[pool_key] = redis.ConnectionPool(
+                host=settings.redis_host, port=settings.redis_port, db=settings.redis_db)
+        return REDIS_POOLS[pool_key]
+
+
 class RedisSession(object):
 
     def __init__(self, settings, input_data, session_key):
@@ -55,23 +79,49 @@ class RedisSession(object):
         self.input_data = input_data
         self.expire_key = settings.redis_expire_key
         self.session_key = session_key
-        self.r = redis.StrictRedis(host=settings.redis_host, port=settings.redis_port, db=settings.redis_db)
+        self.r = redis.StrictRedis(connection_pool=redis_connection_pool(settings))
+        # read the whole session once and then locally, if enabled
+        self.snapshot_enabled = getattr(settings, 'redis_session_snapshot', False)
+        self.snapshot = None
 
     def store_value(self, key, value):
 
-        value = json.dumps(value)
-        self.r.hset(self.session_key, key, value)
-        self.r.expire(self.session_key, self.expire_key)
+        self.store_values({key: value})
+
+    def store_values(self, mapping):
+        "set the values and the expiry in a single round trip"
+        pipe = self.r.pipeline(transaction=False)
+        for key, value in mapping.items():
+            pipe.hset(self.session_key, key, json.dumps(value))
+        pipe.expire(self.session_key, self.expire_key)
+        pipe.execute()
+        if self.snapshot is not None:
+            self.snapshot.update({key: json.dumps(value) for key, value in mapping.items()})
 
     def get_value(self, key):
 
-        value = self.r.hget(self.session_key, key)
-        if value is None:
-            if key in self.input_data:
-                value = self.input_data[key]
+        return self.get_values([key])[key]
+
+    def get_values(self, keys):
+        "dict of the values of keys, falling back to input_data for keys not in the session"
+        keys = list(keys)
+        if self.snapshot_enabled:
+            if self.snapshot is None:
+                self.snapshot = {
+                    unicode_encode(key): value
+                    for key, value in self.r.hgetall(self.session_key).items()}
+            stored_values = [self.snapshot.get(key) for key in keys]
         else:
-            value = json.loads(value)
-        return value
+            stored_values = self.r.hmget(self.session_key, keys) if keys else []
+        values = {}
+        for key, value in zip(keys, stored_values):
+            if value is None:
+                if key in self.input_data:
+                    value = self.input_data[key]
+            else:
+                value = json.loads(value)
+            values[key] = value
+        return values
 
 
 class S3Session(object):
@@ -103,5 +153,14 @@ class S3Session(object):
                 value = self.input_data[key]
         return value
 
+    def store_values(self, mapping):
+
+        for key, value in mapping.items():
+            self.store_value(key, value)
+
+    def get_values(self, keys):
+
+        return {key: self.get_value(key) for key in keys}
+
     def get_full_key(self, key):
         return self.session_key + '/' + key
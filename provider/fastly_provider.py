@@ -1,32 +1,248 @@
+import atexit
+import datetime
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import requests
+import dashboard_queue
+import log
+
+# purge defaults, can be overridden in settings
+PURGE_THREADS = 4
+PURGE_TIMEOUT = 30
+PURGE_RETRIES = 3
+PURGE_BACKOFF = 1
+# most surrogate keys Fastly accepts in one bulk purge request
+BULK_PURGE_MAX_KEYS = 256
+# purge queue defaults
+QUEUE_SIZE = 10000
+QUEUE_FLUSH_SIZE = BULK_PURGE_MAX_KEYS
+QUEUE_FLUSH_SECONDS = 5
+QUEUE_CLOSE_SECONDS = 60
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# put in the queue to stop the purge queue after the keys before it
+CLOSE = object()
+# dashboard event type of purges run by the purge queue
+QUEUE_EVENT_TYPE = "Fastly Invalidate Cdn"
+
+IDENTITY = "process_%s" % os.getpid()
+LOGGER = log.logger("fastly_provider.log", 'INFO', IDENTITY, loggerName=__name__)
+
 
 class FastlyApi:
-    def __init__(self, fastly_api_key):
+    """
+    Soft purge surrogate keys over a pooled HTTP session, a request answered with 429 or a
+    server error, or failing to connect or timing out, is retried a bounded number of times with exponential backoff
+    """
+
+    def __init__(self, fastly_api_key, threads=PURGE_THREADS, timeout=PURGE_TIMEOUT,
+                 retries=PURGE_RETRIES, backoff=PURGE_BACKOFF, session=None):
         self._fastly_api_key = fastly_api_key
+        self.threads = threads
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.session = session or self.pooled_session()
 
-    def purge(self, surrogate_key, service_id):
-        url = "https://api.fastly.com/service/%s/purge/%s" % (service_id, surrogate_key)
+    def pooled_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.threads)
+        session.mount('https://', adapter)
+        return session
 
-        response = requests.post(url, headers={
+    def headers(self):
+        return {
             'Accept': 'application/json',
             'Fastly-Key': self._fastly_api_key,
             'Fastly-Soft-Purge': '1',
-        })
+        }
+
+    def post(self, url, **kwargs):
+        "POST, retrying on 429, server errors, connection errors and timeouts"
+        for attempt in range(1, self.retries + 2):
+            if attempt > 1:
+                time.sleep(self.backoff * 2 ** (attempt - 2))
+            try:
+                response = self.session.post(
+                    url, headers=self.headers(), timeout=self.timeout, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt > self.retries:
+                    raise
+                continue
+            if response.status_code not in RETRY_STATUS_CODES:
+                break
         response.raise_for_status()
         return response
 
+    def purge(self, surrogate_key, service_id):
+        url = "https://api.fastly.com/service/%s/purge/%s" % (service_id, surrogate_key)
+        return self.post(url)
+
+    def purge_keys(self, surrogate_keys, service_id):
+        "bulk purge of the surrogate keys, one request per BULK_PURGE_MAX_KEYS keys"
+        url = "https://api.fastly.com/service/%s/purge" % service_id
+        return [
+            self.post(url, json={'surrogate_keys': surrogate_keys[i:i + BULK_PURGE_MAX_KEYS]})
+            for i in range(0, len(surrogate_keys), BULK_PURGE_MAX_KEYS)]
+
+    def purge_services(self, surrogate_keys, service_ids):
+        "bulk purge of the surrogate keys from each service, services are purged concurrently"
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            service_responses = list(executor.map(
+                lambda service_id: self.purge_keys(surrogate_keys, service_id), service_ids))
+        return [response for responses in service_responses for response in responses]
+
+
+def api(settings):
+    return FastlyApi(
+        settings.fastly_api_key,
+        threads=getattr(settings, 'fastly_purge_threads', PURGE_THREADS),
+        timeout=getattr(settings, 'fastly_purge_timeout', PURGE_TIMEOUT),
+        retries=getattr(settings, 'fastly_purge_retries', PURGE_RETRIES),
+        backoff=getattr(settings, 'fastly_purge_backoff', PURGE_BACKOFF))
+
+
 KEYS = [
     'article/{article_id}v{version}',
     'article/{article_id}/videos',
     'digest/{article_id}',
     ]
 
+def surrogate_keys(article_id, version):
+    return [key.format(article_id=article_id.zfill(5), version=version) for key in KEYS]
+
 def purge(article_id, version, settings):
-    responses = []
-    api = FastlyApi(settings.fastly_api_key)
-    for service_id in settings.fastly_service_ids:
-        for key in KEYS:
-            surrogate_key = key.format(article_id=article_id.zfill(5), version=version)
-            responses.append(api.purge(surrogate_key, service_id))
-
-    return responses
+    return api(settings).purge_services(
+        surrogate_keys(article_id, version), settings.fastly_service_ids)
+
+
+class PurgeQueue:
+    """
+    Coalesce the purges of many articles, surrogate keys are buffered in a bounded queue and
+    purged from a background thread once flush_size distinct keys are waiting, flush_seconds
+    after the first of them, or on close. add never waits, if the queue is closed or does not
+    have room for all the keys of the article it is purged right away instead. A failed purge
+    is reported as an error event on the dashboard for each article in it
+    """
+
+    def __init__(self, settings, queue_size=None, flush_size=None, flush_seconds=None,
+                 fastly_api=None, logger=None):
+        self.settings = settings
+        self.flush_size = flush_size or getattr(
+            settings, 'fastly_purge_queue_flush_size', QUEUE_FLUSH_SIZE)
+        self.flush_seconds = flush_seconds or getattr(
+            settings, 'fastly_purge_queue_flush_seconds', QUEUE_FLUSH_SECONDS)
+        self.keys = queue.Queue(queue_size or getattr(
+            settings, 'fastly_purge_queue_size', QUEUE_SIZE))
+        self.api = fastly_api or api(settings)
+        self.logger = logger or LOGGER
+        # add checks for room and puts the keys of an article together
+        self.add_lock = threading.Lock()
+        self.closing = False
+        self.pid = os.getpid()
+        self.closed = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='fastly-purge-queue', daemon=True)
+        self.thread.start()
+
+    def add(self, article_id, version, run=None):
+        keys = surrogate_keys(article_id, version)
+        article = (article_id, version, run)
+        with self.add_lock:
+            closing = self.closing
+            # only the queue thread takes keys out, so the room checked can only grow
+            queued = not closing and (
+                not self.keys.maxsize or self.keys.maxsize - self.keys.qsize() >= len(keys))
+            if queued:
+                for key in keys:
+                    self.keys.put_nowait((key, article))
+        if not queued:
+            self.logger.warning("Fastly purge queue is %s, purging article %s now",
+                                "closed" if closing else "full", article_id)
+            self.purge(keys, [article])
+
+    def run(self):
+        while not self.closed.is_set():
+            batch, articles = self.next_batch()
+            if batch:
+                self.purge(batch, articles)
+
+    def next_batch(self):
+        """
+        distinct keys waiting, until flush_size of them, flush_seconds after the first or close,
+        and the (article_id, version, run) of the articles they were added for
+        """
+        batch = []
+        articles = []
+        deadline = None
+        while len(batch) < self.flush_size:
+            timeout = None if deadline is None else deadline - time.time()
+            if timeout is not None and timeout <= 0:
+                break
+            try:
+                item = self.keys.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is CLOSE:
+                self.closed.set()
+                break
+            key, article = item
+            if key not in batch:
+                batch.append(key)
+            if article not in articles:
+                articles.append(article)
+            if deadline is None:
+                deadline = time.time() + self.flush_seconds
+        return batch, articles
+
+    def purge(self, keys, articles):
+        try:
+            responses = self.api.purge_services(keys, self.settings.fastly_service_ids)
+            self.logger.info("Fastly purged %s keys, responses: %s", len(keys),
+                             [response.status_code for response in responses])
+        except Exception as exception:
+            self.logger.exception("Error purging Fastly keys %s", keys)
+            for article_id, version, run in articles:
+                self.emit_error(article_id, version, run, exception)
+
+    def emit_error(self, article_id, version, run, exception):
+        "the activity already reported the purge as queued, report its failure to the dashboard"
+        try:
+            message = dashboard_queue.build_event_message(
+                article_id, version, run, QUEUE_EVENT_TYPE, datetime.datetime.now(), "error",
+                "Queued Fastly purge failed for article %s: %s" % (article_id, exception))
+            dashboard_queue.send_message(message, self.settings)
+        except Exception:
+            self.logger.exception("Error reporting the failed Fastly purge of article %s",
+                                  article_id)
+
+    def close(self, timeout=QUEUE_CLOSE_SECONDS):
+        "purge the buffered keys and stop"
+        with self.add_lock:
+            self.closing = True
+        if not self.thread.is_alive():
+            return
+        try:
+            self.keys.put(CLOSE, timeout=timeout)
+        except queue.Full:
+            self.logger.error("Fastly purge queue did not purge its buffered keys")
+            return
+        self.thread.join(timeout)
+
+
+PURGE_QUEUE = None
+PURGE_QUEUE_LOCK = threading.Lock()
+
+
+def purge_queue(settings):
+    "the PurgeQueue of this process, closed at exit"
+    global PURGE_QUEUE
+    with PURGE_QUEUE_LOCK:
+        # a forked process does not have the parent's thread
+        if PURGE_QUEUE is None or PURGE_QUEUE.pid != os.getpid():
+            PURGE_QUEUE = PurgeQueue(settings)
+            atexit.register(PURGE_QUEUE.close)
+        return PURGE_QUEUE
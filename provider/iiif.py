@@ -1,3 +1,6 @@
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import requests
 
 class ShortRetryException(RuntimeError):
@@ -24,3 +27,101 @@ def try_endpoint(endpoint, logger):
     except Exception as e:
         logger.exception(str(e))
         return False, endpoint
+
+
+# verification defaults, can be overridden in settings
+VERIFY_THREADS = 8
+VERIFY_TIMEOUT = 30
+VERIFY_RETRIES = 3
+VERIFY_BACKOFF = 1
+
+# the image server may not answer HEAD requests, verify with GET instead
+HEAD_NOT_SUPPORTED = (405, 501)
+
+# Loris exposes 404 on unretrievable images even if the original error is a 500
+RETRY_STATUS_CODES = (404, 504)
+
+
+EndpointResult = namedtuple('EndpointResult', ['success', 'endpoint', 'status_code', 'seconds', 'attempts'])
+
+
+class EndpointVerifier:
+    """
+    Verify IIIF endpoints concurrently over a pooled HTTP session, each endpoint is retried
+    a bounded number of times with exponential backoff
+    """
+
+    def __init__(self, settings, logger, threads=None, timeout=None, retries=None, backoff=None,
+                 session=None):
+        self.logger = logger
+        self.threads = threads or getattr(settings, 'iiif_verify_threads', VERIFY_THREADS)
+        self.timeout = timeout or getattr(settings, 'iiif_verify_timeout', VERIFY_TIMEOUT)
+        self.retries = retries if retries is not None else getattr(
+            settings, 'iiif_verify_retries', VERIFY_RETRIES)
+        self.backoff = backoff if backoff is not None else getattr(
+            settings, 'iiif_verify_backoff', VERIFY_BACKOFF)
+        self.session = session or self.pooled_session()
+        self.head_supported = True
+
+    def pooled_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.threads)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def request(self, endpoint):
+        "status code of the endpoint, from HEAD while the server supports it"
+        if self.head_supported:
+            response = self.session.head(endpoint, timeout=self.timeout)
+            if response.status_code not in HEAD_NOT_SUPPORTED:
+                return response
+            self.head_supported = False
+        response = self.session.get(endpoint, timeout=self.timeout, stream=True)
+        response.close()
+        return response
+
+    def try_endpoint(self, endpoint):
+        start = time.time()
+        status_code = None
+        for attempt in range(1, self.retries + 2):
+            if attempt > 1:
+                time.sleep(self.backoff * 2 ** (attempt - 2))
+            try:
+                response = self.request(endpoint)
+            except requests.exceptions.RequestException as exception:
+                self.logger.info('short retry of %s because %s', endpoint, exception)
+                status_code = None
+                continue
+            status_code = response.status_code
+            if status_code in RETRY_STATUS_CODES:
+                self.logger.info('short retry of %s because response code was %s',
+                                 endpoint, status_code)
+                continue
+            if status_code != 200:
+                self.logger.error("Error status code != 200. Status code: %s for URL %s",
+                                  status_code, endpoint)
+            return EndpointResult(status_code == 200, endpoint, status_code,
+                                  time.time() - start, attempt)
+        return EndpointResult(False, endpoint, status_code, time.time() - start, attempt)
+
+    def verify(self, endpoints):
+        "list of EndpointResult in the order of endpoints"
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            return list(executor.map(self.try_endpoint, endpoints))
+
+
+def report(results):
+    "aggregated status and latency of the verified endpoints"
+    seconds = [result.seconds for result in results]
+    return {
+        'endpoints': len(results),
+        'failed': [result.endpoint for result in results if not result.success],
+        'retried': len([result for result in results if result.attempts > 1]),
+        'max_seconds': round(max(seconds), 3) if seconds else 0,
+        'total_seconds': round(sum(seconds), 3),
+        'results': [
+            {'endpoint': result.endpoint, 'status_code': result.status_code,
+             'seconds': round(result.seconds, 3), 'attempts': result.attempts}
+            for result in results]
+    }
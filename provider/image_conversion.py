@@ -1,28 +1,87 @@
+import collections
+import hashlib
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 import provider.imageresize as resizer
 from provider.storage_provider import storage_context
+from provider.process import RecyclingProcessPool
 from provider import memory
 from mimetypes import guess_type
 
-def generate_images(settings, formats, fp, info, publish_locations, logger):
+
+# conversion pipeline defaults, can be overridden in settings
+CONVERSION_PROCESSES = 0
+CONVERSION_IO_THREADS = 4
+CONVERSION_WORKER_MAX_IMAGES = 20
+CONVERSION_WORKER_MAX_RSS = 1024 * 1024 * 1024
+
+# derivative cache defaults, can be overridden in settings
+DERIVATIVE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+DERIVATIVE_CACHE_MAX_ENTRIES = 10000
+
+
+def generate_images(settings, formats, fp, info, publish_locations, logger, cache=None):
+        if cache is None:
+            cache = derivative_cache(settings)
         try:
-            for format_spec_name in formats:
-                format_spec = formats[format_spec_name]
-                # if sources not present or includes file extension for this image
-                if 'sources' not in format_spec or info.extension in [
-                        x.strip() for x in format_spec['sources'].split(',')]:
-                    download = 'download' in format_spec and format_spec['download']
-                    fp.seek(0)  # rewind the tape
-                    logger.info("Attempting new conversion/resize (current RSS memory: %s)", memory.current())
-                    filename, image = resizer.resize(format_spec, fp, info, logger)
-                    if filename is not None and image is not None:
-                        store_in_publish_locations(settings, filename, image, publish_locations, download)
-                        logger.info("Stored image %s as %s" % (filename, str(publish_locations)))
-                    else:
-                        raise RuntimeError("filename or image is None. resizer.resize problem.")
+            source_hash = file_hash(fp) if cache else None
+            for format_spec, download in format_specs(formats, info):
+                if cache and publish_cached(cache, logger, source_hash, format_spec, info,
+                                            publish_locations, download):
+                    logger.info("Reused cached image %s for %s" % (info.filename, str(publish_locations)))
+                    continue
+                filename, image = convert_image(format_spec, fp, info, logger)
+                image_bytes = image.getvalue() if cache else None
+                store_in_publish_locations(settings, filename, image, publish_locations, download)
+                logger.info("Stored image %s as %s" % (filename, str(publish_locations)))
+                if cache:
+                    add_cached(cache, logger, source_hash, format_spec, filename, image_bytes,
+                               publish_locations)
         finally:
             fp.close()
 
 
+def publish_cached(cache, logger, source_hash, format_spec, info, publish_locations, download):
+    "publish the derivative from the cache, False to convert it instead if the cache fails"
+    try:
+        return cache.publish(source_hash, format_spec, info, publish_locations, download)
+    except Exception:
+        logger.exception("Error publishing cached image %s, converting it" % info.filename)
+        return False
+
+
+def add_cached(cache, logger, source_hash, format_spec, filename, image_bytes, publish_locations):
+    "record the stored derivative in the cache, a cache error does not fail the conversion"
+    try:
+        cache.add(source_hash, format_spec, filename, image_bytes, publish_locations)
+    except Exception:
+        logger.exception("Error caching image %s" % filename)
+
+
+def format_specs(formats, info):
+    "list of (format_spec, download) for each format which applies to the image"
+    specs = []
+    for format_spec_name in formats:
+        format_spec = formats[format_spec_name]
+        # if sources not present or includes file extension for this image
+        if 'sources' not in format_spec or info.extension in [
+                x.strip() for x in format_spec['sources'].split(',')]:
+            download = 'download' in format_spec and format_spec['download']
+            specs.append((format_spec, download))
+    return specs
+
+
+def convert_image(format_spec, fp, info, logger):
+    fp.seek(0)  # rewind the tape
+    logger.info("Attempting new conversion/resize (current RSS memory: %s)", memory.current())
+    filename, image = resizer.resize(format_spec, fp, info, logger)
+    if filename is None or image is None:
+        raise RuntimeError("filename or image is None. resizer.resize problem.")
+    return filename, image
+
+
 def store_in_publish_locations(settings, filename, image, publish_locations, download):
         try:
             storage = storage_context(settings)
@@ -43,3 +102,306 @@ def store_in_publish_locations(settings, filename, image, publish_locations, dow
 
         finally:
             image.close()
+
+
+def copy_in_publish_locations(settings, filename, orig_resource, publish_locations, download):
+        "server-side copy of an already published image to the publish locations"
+        storage = storage_context(settings)
+
+        for resource in publish_locations:
+            if resource + filename == orig_resource:
+                # already published here, with its download copy
+                continue
+            content_type, encoding = guess_type(filename)
+            storage.copy_resource(orig_resource, resource + filename,
+                                  additional_dict_metadata={'Content-Type': content_type})
+
+            if download:
+                dict_metadata = {'Content-Disposition':
+                                 str("Content-Disposition: attachment; filename=" + filename + ";"),
+                                 'Content-Type': content_type}
+                filename_no_extension, extension = filename.rsplit('.', 1)
+                file_download = filename_no_extension + "-download." + extension
+                storage.copy_resource(orig_resource, resource + file_download,
+                                      additional_dict_metadata=dict_metadata)
+
+
+def file_hash(fp):
+    "MD5 hex digest of the file contents"
+    fp.seek(0)
+    md5 = hashlib.md5()
+    for chunk in iter(lambda: fp.read(1024 * 1024), b''):
+        md5.update(chunk)
+    fp.seek(0)
+    return md5.hexdigest()
+
+
+def derivative_cache(settings):
+    "a DerivativeCache sharing the process wide local tier, if enabled in settings"
+    global LOCAL_DERIVATIVES
+    if not getattr(settings, 'image_derivative_cache', None):
+        return None
+    with LOCAL_DERIVATIVES_LOCK:
+        if LOCAL_DERIVATIVES is None:
+            LOCAL_DERIVATIVES = LocalDerivatives(
+                getattr(settings, 'image_derivative_cache_size', DERIVATIVE_CACHE_MAX_BYTES),
+                getattr(settings, 'image_derivative_cache_entries',
+                        DERIVATIVE_CACHE_MAX_ENTRIES))
+    return DerivativeCache(settings, LOCAL_DERIVATIVES)
+
+
+class LocalDerivatives:
+    """
+    In memory least recently used cache of at most max_entries derivative entries, with
+    the image bytes of recent derivatives while the total is under max_bytes
+    """
+
+    def __init__(self, max_bytes=DERIVATIVE_CACHE_MAX_BYTES,
+                 max_entries=DERIVATIVE_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= len(self.entries.pop(key).get('image_bytes') or b'')
+            self.entries[key] = entry
+            self.total_bytes += len(entry.get('image_bytes') or b'')
+            # drop the least recently used entries over max_entries
+            while len(self.entries) > self.max_entries:
+                _, old_entry = self.entries.popitem(last=False)
+                self.total_bytes -= len(old_entry.get('image_bytes') or b'')
+            # drop the image bytes of the least recently used entries first
+            for old_entry in self.entries.values():
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.total_bytes -= len(old_entry.pop('image_bytes', None) or b'')
+
+
+LOCAL_DERIVATIVES = None
+LOCAL_DERIVATIVES_LOCK = threading.Lock()
+
+
+class DerivativeCache:
+    """
+    Content addressed cache of converted images, keyed by the source MD5 and the format
+    spec. An entry records where the derivative was published and its ETag, in the local
+    tier of this process and in a manifest in S3 shared by all workers
+    """
+
+    def __init__(self, settings, local=None):
+        self.settings = settings
+        self.local = local if local is not None else LocalDerivatives()
+        self.manifest_folder = getattr(settings, 'image_derivative_cache_folder', None)
+        self.thread_local = threading.local()
+
+    def storage(self):
+        "storage context of the calling thread, storage contexts are not thread safe"
+        if not hasattr(self.thread_local, 'storage'):
+            self.thread_local.storage = storage_context(self.settings)
+        return self.thread_local.storage
+
+    def key(self, source_hash, format_spec):
+        format_json = json.dumps(format_spec, sort_keys=True)
+        return hashlib.sha1((source_hash + format_json).encode('utf8')).hexdigest()
+
+    def manifest_resource(self, key):
+        return self.settings.storage_provider + "://" + self.manifest_folder + "/" + key + ".json"
+
+    def get(self, key):
+        entry = self.local.get(key)
+        if entry is None and self.manifest_folder:
+            storage = self.storage()
+            manifest_resource = self.manifest_resource(key)
+            if storage.resource_exists(manifest_resource):
+                entry = json.loads(storage.get_resource_as_string(manifest_resource))
+                self.local.put(key, entry)
+        return entry
+
+    def publish(self, source_hash, format_spec, info, publish_locations, download):
+        """
+        Publish a cached derivative instead of converting, by server-side copy of the
+        published derivative, or by uploading the local image bytes. Return True if published
+        """
+        key = self.key(source_hash, format_spec)
+        entry = self.get(key)
+        if entry is None:
+            return False
+        filename = resizer.output_filename(format_spec, info)
+        if self.storage().resource_etag(entry['resource']) == entry['etag']:
+            copy_in_publish_locations(self.settings, filename, entry['resource'],
+                                      publish_locations, download)
+            return True
+        if entry.get('image_bytes'):
+            store_in_publish_locations(self.settings, filename, BytesIO(entry['image_bytes']),
+                                       publish_locations, download)
+            return True
+        return False
+
+    def add(self, source_hash, format_spec, filename, image_bytes, publish_locations):
+        "record a derivative after it was stored in publish_locations"
+        key = self.key(source_hash, format_spec)
+        manifest = {
+            'filename': filename,
+            'resource': publish_locations[0] + filename,
+            # a single part upload ETag is the MD5 of its content
+            'etag': hashlib.md5(image_bytes).hexdigest(),
+        }
+        if self.manifest_folder:
+            self.storage().set_resource_from_string(
+                self.manifest_resource(key), json.dumps(manifest), content_type='application/json')
+        entry = dict(manifest)
+        entry['image_bytes'] = image_bytes
+        self.local.put(key, entry)
+
+
+class NullLogger:
+    "worker processes do not have the activity logger"
+    def info(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+
+def convert_file(task):
+    """
+    Conversion run in a worker process, task is (formats, file_path, info),
+    return a list of (filename, image bytes, download)
+    """
+    formats, file_path, info = task
+    images = []
+    with open(file_path, 'rb') as open_file:
+        for format_spec, download in format_specs(formats, info):
+            filename, image = convert_image(format_spec, open_file, info, NullLogger())
+            images.append((filename, image.getvalue(), download))
+            image.close()
+    return images
+
+
+class ConversionPipeline:
+    """
+    Download, convert and upload images as overlapping stages, downloads and uploads on
+    thread pools and conversions on a RecyclingProcessPool, with at most in_flight images
+    between starting a download and finishing its upload
+    """
+
+    def __init__(self, settings, logger, processes=None, in_flight=None, io_threads=None,
+                 max_images=None, max_rss=None):
+        self.settings = settings
+        self.logger = logger
+        self.processes = processes or getattr(
+            settings, 'image_conversion_processes', CONVERSION_PROCESSES)
+        self.io_threads = io_threads or getattr(
+            settings, 'image_conversion_io_threads', CONVERSION_IO_THREADS)
+        self.in_flight = in_flight or getattr(
+            settings, 'image_conversion_in_flight', max(self.processes * 2, 1))
+        self.max_images = max_images or getattr(
+            settings, 'image_conversion_worker_max_images', CONVERSION_WORKER_MAX_IMAGES)
+        self.max_rss = max_rss or getattr(
+            settings, 'image_conversion_worker_max_rss', CONVERSION_WORKER_MAX_RSS)
+        self.cache = derivative_cache(settings)
+
+    def uncached_formats(self, formats, file_path, info, publish_locations):
+        """
+        Publish the derivatives found in the cache, return (formats, source_hash) where
+        formats are the ones still to be converted
+        """
+        if not self.cache:
+            return formats, None
+        with open(file_path, 'rb') as open_file:
+            source_hash = file_hash(open_file)
+        uncached = {}
+        for name in formats:
+            for format_spec, download in format_specs({name: formats[name]}, info):
+                if publish_cached(self.cache, self.logger, source_hash, format_spec, info,
+                                  publish_locations, download):
+                    self.logger.info("Reused cached image %s for %s", info.filename, publish_locations)
+                else:
+                    uncached[name] = format_spec
+        return uncached, source_hash
+
+    def run(self, formats, figures, download, publish_locations):
+        """
+        Convert each figure, download(figure) is called on a download thread and returns
+        (file_path, info) of the local copy, converted images are stored in publish_locations
+        Return the number of figures converted, raise the first error after all finish
+        """
+        in_flight = threading.BoundedSemaphore(self.in_flight)
+        lock = threading.Lock()
+        done = threading.Condition(lock)
+        state = {'remaining': len(figures), 'errors': [], 'converted': 0}
+
+        def finish(figure, error=None):
+            in_flight.release()
+            with done:
+                if error is not None:
+                    self.logger.error("Error converting image %s: %s", figure, error)
+                    state['errors'].append(error)
+                else:
+                    state['converted'] += 1
+                state['remaining'] -= 1
+                done.notify_all()
+
+        def upload(figure, images, specs, source_hash):
+            try:
+                for (filename, image_bytes, image_download), (format_spec, _) in zip(images, specs):
+                    store_in_publish_locations(self.settings, filename, BytesIO(image_bytes),
+                                               publish_locations, image_download)
+                    self.logger.info("Stored image %s as %s", filename, publish_locations)
+                    if self.cache:
+                        add_cached(self.cache, self.logger, source_hash, format_spec, filename,
+                                   image_bytes, publish_locations)
+            except Exception as exception:
+                finish(figure, exception)
+                return
+            finish(figure)
+
+        def converted(figure, future, specs, source_hash):
+            try:
+                images = future.result()
+            except Exception as exception:
+                finish(figure, exception)
+                return
+            uploads.submit(upload, figure, images, specs, source_hash)
+
+        def download_and_convert(figure):
+            in_flight.acquire()
+            try:
+                file_path, info = download(figure)
+                uncached, source_hash = self.uncached_formats(
+                    formats, file_path, info, publish_locations)
+                specs = format_specs(uncached, info)
+                if not specs:
+                    finish(figure)
+                    return
+                future = pool.submit((uncached, file_path, info))
+            except Exception as exception:
+                finish(figure, exception)
+                return
+            future.add_done_callback(
+                lambda future: converted(figure, future, specs, source_hash))
+
+        with RecyclingProcessPool(convert_file, self.processes, self.max_images,
+                                  self.max_rss) as pool:
+            with ThreadPoolExecutor(max_workers=self.io_threads) as uploads:
+                with ThreadPoolExecutor(max_workers=self.io_threads) as downloads:
+                    for figure in figures:
+                        downloads.submit(download_and_convert, figure)
+                    with done:
+                        while state['remaining'] > 0:
+                            done.wait()
+
+        if state['errors']:
+            raise state['errors'][0]
+        return state['converted']
@@ -49,6 +49,11 @@ def resize(format, filep, info, logger):
             image.destroy()
         raise RuntimeError("%s (%s)" % (message, str(e)))
 
+    return output_filename(format, info), image_buffer
+
+
+def output_filename(format, info):
+    "file name of the image resized for the format"
     filename = info.filename
     if format.get('prefix') is not None:
         filename = format.get('prefix') + filename
@@ -60,4 +65,4 @@ def resize(format, filep, info, logger):
         filename = filename + "." + format['format']
     else:
         filename += '.tiff'
-    return filename, image_buffer
+    return filename
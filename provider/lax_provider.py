@@ -1,3 +1,6 @@
+import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import time
 from . import article
@@ -11,14 +14,19 @@ from provider.utils import base64_encode_string
 identity = "process_%s" % os.getpid()
 logger = log.logger("lax_provider.log", 'INFO', identity, loggerName=__name__)
 
+# Lax client defaults, can be overridden in settings, the cache is off unless a TTL is set
+CACHE_TTL = 0
+CACHE_SIZE = 1000
+POOL_SIZE = 10
+
 
 class ErrorCallingLaxException(Exception):
     pass
 
 
-def lax_request(url, article_id, verify_ssl, request_type='version', auth_key=None):
-    "common request logic to Lax"
-    response = requests.get(url, verify=verify_ssl, headers=lax_auth_header(auth_key))
+def lax_request(url, article_id, verify_ssl, request_type='version', auth_key=None, session=None):
+    "common request logic to Lax, over the session if given"
+    response = (session or requests).get(url, verify=verify_ssl, headers=lax_auth_header(auth_key))
     logger.info("Request to lax: GET %s", url)
     logger.info("Response from lax: %s\n%s", response.status_code, response.content)
     status_code = response.status_code
@@ -51,11 +59,115 @@ def lax_auth_key(settings, auth=False):
     return 'public'
 
 
+class LaxClient:
+    """
+    Requests to Lax over a pooled session, the article versions responses are cached per
+    article for ttl seconds and invalidated when Lax responds to an ingest or publish. The
+    cache is per process, so other processes only see a change once the ttl expires. Expired
+    responses are dropped when read, and when the cache holds cache_size of them
+    """
+
+    def __init__(self, settings, ttl=None, pool_size=None, session=None, cache_size=None):
+        self.settings = settings
+        self.ttl = ttl if ttl is not None else getattr(settings, 'lax_cache_ttl', CACHE_TTL)
+        self.cache_size = cache_size or getattr(settings, 'lax_cache_size', CACHE_SIZE)
+        self.pool_size = pool_size or getattr(settings, 'lax_pool_size', POOL_SIZE)
+        self.session = session or self.pooled_session()
+        self.cache = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def pooled_session(self):
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def article_versions(self, article_id, auth=False):
+        "status code and versions of the article, from the cache while it has not expired"
+        auth_key = lax_auth_key(self.settings, auth)
+        cache_key = (article_id, auth_key)
+        with self.lock:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                if cached[0] > time.time():
+                    self.hits += 1
+                    return cached[1], copy.deepcopy(cached[2])
+                del self.cache[cache_key]
+            self.misses += 1
+        url = self.settings.lax_article_versions.replace('{article_id}', article_id)
+        status_code, data = lax_request(url, article_id, self.settings.verify_ssl, 'version',
+                                        auth_key, self.session)
+        if self.ttl > 0:
+            with self.lock:
+                if len(self.cache) >= self.cache_size:
+                    self.purge()
+                self.cache[cache_key] = (time.time() + self.ttl, status_code, copy.deepcopy(data))
+        return status_code, data
+
+    def purge(self):
+        "drop the expired responses, then the oldest while the cache is full, lock held"
+        now = time.time()
+        for cache_key in [key for key, cached in self.cache.items() if cached[0] <= now]:
+            del self.cache[cache_key]
+        while len(self.cache) >= self.cache_size:
+            del self.cache[next(iter(self.cache))]
+
+    def articles_versions(self, article_ids, auth=False):
+        "dict of article_id to the status code and versions, requested concurrently"
+        article_ids = list(dict.fromkeys(article_ids))
+        if not article_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            results = executor.map(lambda article_id: self.article_versions(article_id, auth),
+                                   article_ids)
+            return dict(zip(article_ids, results))
+
+    def invalidate(self, article_id):
+        with self.lock:
+            for cache_key in [key for key in self.cache if key[0] == article_id]:
+                del self.cache[cache_key]
+
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'articles': len(self.cache)}
+
+
+CLIENT = None
+CLIENT_LOCK = threading.Lock()
+
+
+def lax_client(settings):
+    "the LaxClient shared in this process"
+    global CLIENT
+    with CLIENT_LOCK:
+        if CLIENT is None or CLIENT.settings is not settings:
+            CLIENT = LaxClient(settings)
+        return CLIENT
+
+
+def client_stats():
+    "cache stats of the LaxClient of this process, None if there is no client yet"
+    with CLIENT_LOCK:
+        client = CLIENT
+    return client.stats() if client else None
+
+
 def article_versions(article_id, settings, auth=False):
     "get json for article versions from lax"
-    url = settings.lax_article_versions.replace('{article_id}', article_id)
-    return lax_request(url, article_id, settings.verify_ssl, 'version',
-                       lax_auth_key(settings, auth))
+    return lax_client(settings).article_versions(article_id, auth)
+
+
+def articles_versions(article_ids, settings, auth=False):
+    "dict of article_id to the status code and json versions from lax, requested concurrently"
+    return lax_client(settings).articles_versions(article_ids, auth)
+
+
+def invalidate_article(article_id, settings):
+    "drop cached Lax responses of this process for the article when it changes in Lax"
+    lax_client(settings).invalidate(article_id)
 
 
 def article_snippet(article_id, version, settings, auth=False):
@@ -165,6 +277,11 @@ def poa_vor_status(data):
 def was_ever_poa(article_id, settings):
     "Use Lax data to check if the article was ever a PoA article"
     status_code, data = article_versions(article_id, settings)
+    return versions_was_ever_poa(status_code, data)
+
+
+def versions_was_ever_poa(status_code, data):
+    "was_ever_poa from a Lax article versions response already requested"
     if status_code == 200:
         poa_status, vor_status = poa_vor_status(data)
         if poa_status is True:
@@ -174,12 +291,20 @@ def was_ever_poa(article_id, settings):
     else:
         return None
 
+
 def published_considering_poa_status(article_id, settings, is_poa, was_ever_poa):
     """
     Check the lax data for whether an article is published
     considering whether it was or is PoA status
     """
     status_code, data = article_versions(article_id, settings)
+    return versions_published_considering_poa_status(status_code, data, is_poa, was_ever_poa)
+
+
+def versions_published_considering_poa_status(status_code, data, is_poa, was_ever_poa):
+    """
+    published_considering_poa_status from a Lax article versions response already requested
+    """
     if status_code == 200:
         poa_status, vor_status = poa_vor_status(data)
     else:
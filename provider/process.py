@@ -1,4 +1,10 @@
+import multiprocessing
+from multiprocessing.connection import wait
+import queue
 import signal
+import threading
+from concurrent.futures import Future
+from provider import memory
 
 """
 Provides process-management utilities such as catching signals and interrupts
@@ -36,3 +42,144 @@ def monitor_interrupt(work):
         work(flag)
     except KeyboardInterrupt:
         print("\ncaught KeyboardInterrupt, shutting down abruptly...")
+
+
+def pool_worker(conn, function, max_tasks=None, max_rss=None):
+    """
+    Worker process loop, receive a task from conn, send back (result, error, retiring)
+    from calling function(task), retiring after max_tasks or once RSS memory exceeds max_rss
+    """
+    task_count = 0
+    while True:
+        task = conn.recv()
+        if task is None:
+            return
+        task_count += 1
+        try:
+            result, error = function(task), None
+        except Exception as exception:
+            result, error = None, "%s: %s" % (exception.__class__.__name__, exception)
+        retiring = bool((max_tasks and task_count >= max_tasks)
+                        or (max_rss and memory.current() > max_rss))
+        conn.send((result, error, retiring))
+        if retiring:
+            return
+
+
+class PoolWorker:
+    def __init__(self, context, function, max_tasks, max_rss):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=pool_worker, args=(child_conn, function, max_tasks, max_rss))
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+        self.future = None
+        self.retiring = False
+
+
+class RecyclingProcessPool:
+    """
+    Pool of worker processes calling function for each submitted task. A worker is
+    replaced after max_tasks tasks or when its RSS memory exceeds max_rss, and a task
+    fails instead of hanging if its worker dies. submit returns a concurrent.futures.Future
+    function must be importable by the worker, a module level function
+    """
+
+    def __init__(self, function, processes, max_tasks=None, max_rss=None,
+                 start_method='spawn'):
+        self.function = function
+        self.processes = processes
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss
+        self.context = multiprocessing.get_context(start_method)
+        self.tasks = queue.Queue()
+        self.workers = []
+        self.closed = False
+        self.dispatcher = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        self.workers = [self.new_worker() for _ in range(self.processes)]
+        self.dispatcher = threading.Thread(target=self.dispatch)
+        self.dispatcher.daemon = True
+        self.dispatcher.start()
+
+    def new_worker(self):
+        return PoolWorker(self.context, self.function, self.max_tasks, self.max_rss)
+
+    def submit(self, task):
+        if self.closed:
+            raise RuntimeError("cannot submit to a closed pool")
+        future = Future()
+        self.tasks.put((future, task))
+        return future
+
+    def close(self):
+        "wait for the submitted tasks to finish then stop the workers"
+        self.closed = True
+        if self.dispatcher:
+            self.dispatcher.join()
+        for worker in self.workers:
+            try:
+                worker.conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self.workers:
+            worker.process.join()
+            worker.conn.close()
+
+    def busy(self):
+        return [worker for worker in self.workers if worker.future]
+
+    def dispatch(self):
+        while not (self.closed and self.tasks.empty() and not self.busy()):
+            # give waiting tasks to idle workers
+            for worker in self.workers:
+                if worker.future or worker.retiring or not worker.process.is_alive():
+                    continue
+                try:
+                    worker.future, task = self.tasks.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    worker.conn.send(task)
+                except OSError:
+                    # the worker died, it is replaced below
+                    pass
+
+            wait([worker.conn for worker in self.busy()] +
+                 [worker.process.sentinel for worker in self.workers], timeout=0.1)
+
+            for index, worker in enumerate(self.workers):
+                if worker.future:
+                    self.receive(worker)
+                if not worker.process.is_alive():
+                    # a retired or crashed worker, a result sent before exit was received above
+                    if worker.future:
+                        worker.future.set_exception(RuntimeError(
+                            "worker process exited with code %s" % worker.process.exitcode))
+                        worker.future = None
+                    worker.process.join()
+                    worker.conn.close()
+                    self.workers[index] = self.new_worker()
+
+    def receive(self, worker):
+        "set the future of the worker if its result has arrived"
+        try:
+            if not worker.conn.poll():
+                return
+            result, error, worker.retiring = worker.conn.recv()
+        except (EOFError, OSError):
+            return
+        if error:
+            worker.future.set_exception(RuntimeError(error))
+        else:
+            worker.future.set_result(result)
+        worker.future = None
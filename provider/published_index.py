@@ -0,0 +1,57 @@
+import json
+from boto.exception import S3ResponseError
+from provider.storage_provider import storage_context
+
+"""
+Index of the article DOI ids moved into a published folder, saved as one JSON file in the
+folder so checking whether an article was ever published is one read instead of listing
+every dated subfolder
+"""
+
+INDEX_FILE_NAME = "published_doi_ids.json"
+
+
+class PublishedIndex(object):
+
+    def __init__(self, settings, bucket_name, published_folder, storage=None):
+        self.settings = settings
+        self.bucket_name = bucket_name
+        self.published_folder = published_folder
+        self.storage = storage or storage_context(settings)
+        self.doi_ids = None
+
+    def resource(self):
+        return "%s://%s/%s%s" % (
+            self.settings.storage_provider, self.bucket_name, self.published_folder,
+            INDEX_FILE_NAME)
+
+    def load(self):
+        "read the index, returns the set of DOI ids or None if there is no index yet"
+        try:
+            index = json.loads(self.storage.get_resource_as_string(self.resource()))
+        except S3ResponseError:
+            return None
+        self.doi_ids = set(index.get("doi_ids", []))
+        return self.doi_ids
+
+    def save(self):
+        index = {"doi_ids": sorted(self.doi_ids)}
+        self.storage.set_resource_from_string(
+            self.resource(), json.dumps(index), content_type="application/json")
+
+    def rebuild(self, doi_ids):
+        "replace the index with the DOI ids found by listing the published folder"
+        self.doi_ids = set(doi_ids)
+        self.save()
+
+    def add(self, doi_ids):
+        """
+        add the DOI ids of files moved into the published folder, if there is no index yet
+        it is left to be built from the folder the next time it is read
+        """
+        if self.doi_ids is None and self.load() is None:
+            return
+        new_doi_ids = set(doi_ids) - self.doi_ids
+        if new_doi_ids:
+            self.doi_ids.update(new_doi_ids)
+            self.save()
@@ -67,6 +67,20 @@ def filter_list_by_file_extensions(s3_key_names, file_extensions):
     return good_s3_key_names
 
 
+def latest_pmc_zip_revisions(s3_key_names):
+    """
+    Given a list of zip file names from the PMC zip folder on S3, group them by the
+    article doi_id in their names and return a dict of doi_id (int) to the name of the
+    latest revision, so the folder can be listed once for many articles
+    """
+    doi_id_key_names = {}
+    for key_name in s3_key_names:
+        for doi_id in set(re.findall(r'-(\d{5,})', key_name)):
+            doi_id_key_names.setdefault(int(doi_id), []).append(key_name)
+    return {doi_id: latest_pmc_zip_revision(doi_id, key_names)
+            for doi_id, key_names in doi_id_key_names.items()}
+
+
 def latest_pmc_zip_revision(doi_id, s3_key_names):
     """
     Given a list of zip file names from the PMC zip folder on S3,
@@ -1,12 +1,40 @@
 from pydoc import locate
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import fnmatch
+import io
+import mimetypes
+import threading
+import zipfile
 from boto.s3.key import Key
 from boto.s3.connection import S3Connection
 from boto.s3.bucket import Bucket
+from boto.s3.multipart import MultiPartUpload
 import re
 import os
 import log
 
 
+# transfer manager defaults, can be overridden in settings
+TRANSFER_THREADS = 8
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+# S3 minimum part size is 5 MB
+MULTIPART_CHUNK_SIZE = 16 * 1024 * 1024
+# bytes read from the end of a zip to find its central directory
+ZIP_TAIL_SIZE = 1024 * 1024
+
+
+# a file listed in a folder, last_modified is the ISO 8601 string from the LIST response
+ResourceInfo = namedtuple('ResourceInfo', ['name', 'size', 'etag', 'last_modified'])
+
+
+def pattern_prefix(pattern):
+    "the literal start of a glob pattern, before any wildcard"
+    if not pattern:
+        return ""
+    return re.split(r'[*?\[]', pattern, 1)[0]
+
+
 def StorageContext(*args):
     logger = log.logger('deprecated.log', 'INFO', __name__, loggerName=__name__)
     logger.warning("provider.storage_provider.StorageContext() is deprecated")
@@ -45,6 +73,22 @@ class S3StorageContext:
         key.key = s3_key
         return key.exists()
 
+    def resource_etag(self, resource):
+        "ETag of the key without quotes, None if it does not exist"
+        bucket, s3_key = self.s3_storage_objects(resource)
+        key = bucket.get_key(s3_key)
+        if key is None:
+            return None
+        return key.etag.strip('"')
+
+    def resource_metadata(self, resource):
+        "user metadata of the key, None if it does not exist"
+        bucket, s3_key = self.s3_storage_objects(resource)
+        key = bucket.get_key(s3_key)
+        if key is None:
+            return None
+        return dict(key.metadata)
+
     def get_resource_to_file(self, resource, file):
         bucket, s3_key = self.s3_storage_objects(resource)
         key = Key(bucket)
@@ -74,13 +118,17 @@ class S3StorageContext:
 
         key.set_contents_from_file(file)
 
-    def set_resource_from_string(self, resource, data, content_type=None):
+    def set_resource_from_string(self, resource, data, content_type=None, metadata=None):
         bucket, s3_key = self.s3_storage_objects(resource)
         key = Key(bucket)
         key.key = s3_key
         if content_type != None:
             key.content_type = content_type
 
+        if metadata is not None:
+            for mdk in metadata:
+                key.metadata[mdk] = metadata[mdk]
+
         key.set_contents_from_string(data)
 
     def get_resource_to_file_pointer(self, resource, file_path):
@@ -100,16 +148,28 @@ class S3StorageContext:
         return fp
 
     def list_resources(self, folder):
+        "file names in the folder"
+        return [resource.name for resource in self.iter_resources(folder)]
+
+    def iter_resources(self, folder, pattern=None):
+        """
+        ResourceInfo of each file in the folder from the LIST responses, without requesting
+        each key, fetched a page at a time as the generator is consumed. Only names matching
+        the glob pattern are yielded, the part of the pattern before any wildcard is sent to
+        S3 as the prefix
+        """
         bucket, s3_key = self.s3_storage_objects(folder)
         folder = s3_key[1:] if s3_key[:1] == "/" else s3_key
-        bucketlist = bucket.list(prefix=folder + "/")
-        files = []
-        for file in bucketlist:
-            key = bucket.get_key(file.key)
+        prefix = folder + "/" + pattern_prefix(pattern)
+        for key in bucket.list(prefix=prefix):
             filename = key.name.rsplit('/', 1)[1]
-            files.append(filename)
-
-        return files
+            if pattern and not fnmatch.fnmatchcase(filename, pattern):
+                continue
+            yield ResourceInfo(
+                name=filename,
+                size=key.size,
+                etag=key.etag.strip('"') if key.etag else None,
+                last_modified=key.last_modified)
 
     def copy_resource(self, orig_resource, dest_resource, additional_dict_metadata=None):
         orig_bucket, orig_s3_key = self.s3_storage_objects(orig_resource)
@@ -130,6 +190,34 @@ class S3StorageContext:
 
         dest_bucket.copy_key(dest_key.name[1:], orig_bucket.name, orig_s3_key[1:], metadata=metadata)
 
+    def transfer_manager(self):
+        if 'transfer_manager' not in self.context:
+            self.context['transfer_manager'] = S3TransferManager(self.settings, storage=self)
+        return self.context['transfer_manager']
+
+    def get_resources_to_dir(self, resources, to_dir):
+        "download each resource in parallel to a file of the same name in to_dir"
+        return self.transfer_manager().get_resources_to_dir(resources, to_dir)
+
+    def set_resources_from_dir(self, from_dir, folder, file_names=None):
+        "upload files in from_dir, or only file_names if specified, in parallel to folder"
+        return self.transfer_manager().set_resources_from_dir(from_dir, folder, file_names)
+
+    def copy_resources(self, resource_pairs, additional_dict_metadata=None):
+        "copy each (orig_resource, dest_resource[, additional_dict_metadata]) in parallel"
+        return self.transfer_manager().copy_resources(resource_pairs, additional_dict_metadata)
+
+    def set_resource_from_stream(self, resource, stream, content_type=None, metadata=None):
+        "upload a readable stream, such as an HTTP response body, without reading it all first"
+        return self.transfer_manager().set_resource_from_stream(
+            resource, stream, content_type, metadata)
+
+    def set_resources_from_zip(self, zip_resource, folder, member_filter=None,
+                               check_names=None):
+        "stream members of a zip resource in parallel to folder, without a local copy"
+        return self.transfer_manager().set_resources_from_zip(
+            zip_resource, folder, member_filter, check_names)
+
     def delete_resource(self, resource):
         bucket, s3_key = self.s3_storage_objects(resource)
         bucket.delete_key(s3_key)
@@ -163,6 +251,336 @@ class S3StorageContext:
         conn = S3Connection(self.settings.aws_access_key_id, self.settings.aws_secret_access_key)
         return conn
 
+
+
+def read_full_chunk(stream, chunk_size):
+    """
+    read chunk_size bytes from the stream, fewer only at the end of the stream, a stream
+    such as an HTTP response body can return less than asked for before its end
+    """
+    chunk = stream.read(chunk_size)
+    if not chunk or len(chunk) >= chunk_size:
+        return chunk
+    chunks = [chunk]
+    size = len(chunk)
+    while size < chunk_size:
+        chunk = stream.read(chunk_size - size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size += len(chunk)
+    return b''.join(chunks)
+
+
+class S3TransferManager:
+    """
+    Parallel S3 transfers, ranged GET downloads, multipart uploads and multipart
+    server-side copies of large objects, and bulk transfers of many objects, on a
+    bounded thread pool. boto connections are not thread safe so each thread
+    uses its own S3StorageContext
+    """
+
+    def __init__(self, settings, threads=None, multipart_threshold=None, chunk_size=None,
+                 storage=None):
+        self.settings = settings
+        self.threads = threads or getattr(settings, 's3_transfer_threads', TRANSFER_THREADS)
+        self.multipart_threshold = multipart_threshold or getattr(
+            settings, 's3_multipart_threshold', MULTIPART_THRESHOLD)
+        self.chunk_size = chunk_size or getattr(
+            settings, 's3_multipart_chunk_size', MULTIPART_CHUNK_SIZE)
+        self.local = threading.local()
+        if storage is not None:
+            # the creating thread can use the storage context it already has
+            self.local.storage = storage
+
+    def storage(self):
+        "S3StorageContext for the current thread"
+        if not hasattr(self.local, 'storage'):
+            self.local.storage = S3StorageContext(self.settings)
+        return self.local.storage
+
+    def map(self, function, items, threads=None):
+        "call function with each item on a thread pool, return the results in order"
+        items = list(items)
+        threads = min(threads or self.threads, len(items))
+        if threads <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            return list(executor.map(function, items))
+
+    def part_ranges(self, size):
+        "list of (part_number, start, end) inclusive byte ranges covering size bytes"
+        return [(part_number, start, min(start + self.chunk_size, size) - 1)
+                for part_number, start in enumerate(range(0, size, self.chunk_size), 1)]
+
+    def multipart_upload(self, bucket, multipart):
+        "the multipart upload bound to a bucket of the current thread connection"
+        part_upload = MultiPartUpload(bucket)
+        part_upload.key_name = multipart.key_name
+        part_upload.id = multipart.id
+        return part_upload
+
+    def multipart(self, bucket, key_name, transfer_part, parts, threads=None, **kwargs):
+        "run transfer_part for each part of a multipart upload, cancel it on failure"
+        multipart = bucket.initiate_multipart_upload(key_name, **kwargs)
+        try:
+            self.map(lambda part: transfer_part(multipart, part), parts, threads)
+            multipart.complete_upload()
+        except Exception:
+            multipart.cancel_upload()
+            raise
+
+    def get_resource_to_file(self, resource, file, threads=None):
+        "download resource to the open file, large objects as parallel ranged GETs"
+        bucket, s3_key = self.storage().s3_storage_objects(resource)
+        key = bucket.get_key(s3_key)
+        if key is None or key.size < self.multipart_threshold:
+            return self.storage().get_resource_to_file(resource, file)
+
+        offset = file.tell()
+        lock = threading.Lock()
+
+        def download_part(part):
+            part_number, start, end = part
+            part_bucket, part_s3_key = self.storage().s3_storage_objects(resource)
+            part_key = Key(part_bucket)
+            part_key.key = part_s3_key
+            data = part_key.get_contents_as_string(
+                headers={'Range': 'bytes=%s-%s' % (start, end)})
+            with lock:
+                file.seek(offset + start)
+                file.write(data)
+
+        self.map(download_part, self.part_ranges(key.size), threads)
+        file.seek(offset + key.size)
+
+    def set_resource_from_filename(self, resource, file_name, threads=None):
+        "upload the file to resource, large files as a parallel multipart upload"
+        size = os.path.getsize(file_name)
+        if size < self.multipart_threshold:
+            return self.storage().set_resource_from_filename(resource, file_name)
+
+        bucket, s3_key = self.storage().s3_storage_objects(resource)
+
+        def upload_part(multipart, part):
+            part_number, start, end = part
+            part_bucket, part_s3_key = self.storage().s3_storage_objects(resource)
+            with open(file_name, 'rb') as open_file:
+                open_file.seek(start)
+                self.multipart_upload(part_bucket, multipart).upload_part_from_file(
+                    open_file, part_number, size=end - start + 1)
+
+        # as Key.set_contents_from_filename does, guess the type from the file name
+        content_type = mimetypes.guess_type(file_name)[0] or Key.DefaultContentType
+        self.multipart(bucket, s3_key[1:], upload_part, self.part_ranges(size), threads,
+                       headers={'Content-Type': content_type})
+
+    def copy_resource(self, orig_resource, dest_resource, additional_dict_metadata=None,
+                      threads=None):
+        "server-side copy, large objects as a parallel multipart copy"
+        orig_bucket, orig_s3_key = self.storage().s3_storage_objects(orig_resource)
+        key = orig_bucket.get_key(orig_s3_key)
+        if key is None or key.size < self.multipart_threshold:
+            return self.storage().copy_resource(
+                orig_resource, dest_resource, additional_dict_metadata)
+
+        # a multipart copy does not copy the object metadata as copy_key does
+        metadata = dict(key.metadata)
+        headers = {'Content-Type': key.content_type}
+        if additional_dict_metadata is not None:
+            for mdk in additional_dict_metadata:
+                if mdk == 'Content-Type':
+                    headers[mdk] = additional_dict_metadata[mdk]
+                else:
+                    metadata[mdk] = additional_dict_metadata[mdk]
+
+        dest_bucket, dest_s3_key = self.storage().s3_storage_objects(dest_resource)
+
+        def copy_part(multipart, part):
+            part_number, start, end = part
+            part_bucket, part_s3_key = self.storage().s3_storage_objects(dest_resource)
+            self.multipart_upload(part_bucket, multipart).copy_part_from_key(
+                orig_bucket.name, orig_s3_key[1:], part_number, start, end)
+
+        self.multipart(dest_bucket, dest_s3_key[1:], copy_part, self.part_ranges(key.size),
+                       threads, headers=headers, metadata=metadata)
+
+    def set_resource_from_stream(self, resource, stream, content_type=None, metadata=None):
+        """
+        upload the readable stream to resource reading it a chunk at a time,
+        more than one chunk is uploaded as a multipart upload
+        """
+        chunk = read_full_chunk(stream, self.chunk_size)
+        if len(chunk) < self.chunk_size:
+            return self.storage().set_resource_from_string(
+                resource, chunk, content_type=content_type, metadata=metadata)
+
+        bucket, s3_key = self.storage().s3_storage_objects(resource)
+        kwargs = {}
+        if content_type:
+            kwargs['headers'] = {'Content-Type': content_type}
+        if metadata:
+            kwargs['metadata'] = metadata
+        multipart = bucket.initiate_multipart_upload(s3_key[1:], **kwargs)
+        try:
+            part_number = 1
+            while chunk:
+                multipart.upload_part_from_file(io.BytesIO(chunk), part_number)
+                part_number += 1
+                chunk = read_full_chunk(stream, self.chunk_size)
+            multipart.complete_upload()
+        except Exception:
+            multipart.cancel_upload()
+            raise
+
+    def open_resource(self, resource, tail=None):
+        "seekable S3RangeReader for resource, using the current thread connection"
+        bucket, s3_key = self.storage().s3_storage_objects(resource)
+        key = bucket.get_key(s3_key)
+        if key is None:
+            raise IOError("resource %s does not exist" % resource)
+        return S3RangeReader(key, key.size, self.chunk_size, tail)
+
+    def set_resources_from_zip(self, zip_resource, folder, member_filter=None,
+                               check_names=None):
+        """
+        Read the zip central directory with ranged GETs, then stream each member
+        selected by member_filter(name) to folder in parallel, decompressing in memory.
+        check_names(names) is called with the selected names before any upload
+        Return the uploaded resources
+        """
+        reader = self.open_resource(zip_resource)
+        # threads share the end of the zip so each can read the central directory
+        reader.seek(max(reader.size - ZIP_TAIL_SIZE, 0))
+        tail = reader.read()
+        with zipfile.ZipFile(reader) as open_zip:
+            names = [zip_info.filename for zip_info in open_zip.infolist()
+                     if not zip_info.filename.endswith('/')]
+        if member_filter:
+            names = [name for name in names if member_filter(name)]
+        if check_names:
+            check_names(names)
+
+        def upload(name):
+            if not hasattr(self.local, 'zip_files'):
+                self.local.zip_files = {}
+            if zip_resource not in self.local.zip_files:
+                self.local.zip_files[zip_resource] = zipfile.ZipFile(
+                    self.open_resource(zip_resource, tail))
+            resource = folder.rstrip('/') + '/' + name
+            with self.local.zip_files[zip_resource].open(name) as member:
+                self.set_resource_from_stream(
+                    resource, member, content_type=mimetypes.guess_type(name)[0])
+            return resource
+        try:
+            return self.map(upload, names)
+        finally:
+            # the calling thread may have uploaded some members itself
+            zip_files = getattr(self.local, 'zip_files', {})
+            if zip_resource in zip_files:
+                zip_files.pop(zip_resource).close()
+
+    def get_resources_to_dir(self, resources, to_dir):
+        "download resources in parallel into to_dir, return the file paths"
+        def download(resource):
+            file_path = os.path.join(to_dir, resource.split('/')[-1])
+            with open(file_path, 'wb') as open_file:
+                self.get_resource_to_file(resource, open_file, threads=1)
+            return file_path
+        return self.map(download, resources)
+
+    def set_resources_from_dir(self, from_dir, folder, file_names=None):
+        "upload files from from_dir in parallel to the folder resource, return the resources"
+        if file_names is None:
+            file_names = sorted(
+                file_name for file_name in os.listdir(from_dir)
+                if os.path.isfile(os.path.join(from_dir, file_name)))
+
+        def upload(file_name):
+            resource = folder.rstrip('/') + '/' + file_name
+            self.set_resource_from_filename(
+                resource, os.path.join(from_dir, file_name), threads=1)
+            return resource
+        return self.map(upload, file_names)
+
+    def copy_resources(self, resource_pairs, additional_dict_metadata=None):
+        """
+        copy (orig_resource, dest_resource) pairs in parallel, a pair can have a third
+        value of additional_dict_metadata to use for that copy only
+        """
+        def copy(resource_pair):
+            orig_resource, dest_resource = resource_pair[:2]
+            metadata = additional_dict_metadata
+            if len(resource_pair) > 2:
+                metadata = resource_pair[2]
+            self.copy_resource(orig_resource, dest_resource, metadata, threads=1)
+            return dest_resource
+        return self.map(copy, resource_pairs)
+
+
+class S3RangeReader:
+    """
+    Seekable read only file object for an S3 key, reading ranges on demand into a read
+    ahead buffer of buffer_size bytes. tail is optionally the last bytes of the object
+    already downloaded
+    """
+
+    def __init__(self, key, size, buffer_size=MULTIPART_CHUNK_SIZE, tail=None):
+        self.key = key
+        self.size = size
+        self.buffer_size = buffer_size
+        self.tail = tail or b''
+        self.position = 0
+        self.buffer = b''
+        self.buffer_start = 0
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(offset, 0)
+        return self.position
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.size - self.position
+        end = min(self.position + size, self.size)
+        if end <= self.position:
+            return b''
+        data = self.cached(self.position, end)
+        if data is None:
+            fetch_end = min(max(end, self.position + self.buffer_size), self.size)
+            self.buffer = self.key.get_contents_as_string(
+                headers={'Range': 'bytes=%s-%s' % (self.position, fetch_end - 1)})
+            self.buffer_start = self.position
+            data = self.buffer[:end - self.position]
+        self.position = end
+        return data
+
+    def cached(self, start, end):
+        "bytes start to end if they are in the tail or buffer"
+        tail_start = self.size - len(self.tail)
+        if self.tail and start >= tail_start:
+            return self.tail[start - tail_start:end - tail_start]
+        buffer_end = self.buffer_start + len(self.buffer)
+        if self.buffer_start <= start and end <= buffer_end:
+            return self.buffer[start - self.buffer_start:end - self.buffer_start]
+        return None
+
+    def close(self):
+        self.buffer = b''
+
+
 class UnsupportedResourceType(Exception): #TODO
     pass
 
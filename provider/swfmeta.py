@@ -1,4 +1,6 @@
 import calendar
+import json
+import os
 import time
 
 import boto.swf
@@ -294,3 +296,105 @@ class SWFMeta(object):
             is_open = True
 
         return is_open
+
+
+# SWF may list an execution a little after it closes, query back this far from the watermark
+EXECUTION_CACHE_OVERLAP_SECONDS = 60 * 5
+
+
+def execution_key(workflow_id=None, workflow_name=None, workflow_version=None):
+    if workflow_id is not None:
+        return 'id:' + workflow_id
+    return 'type:%s:%s' % (workflow_name, workflow_version)
+
+
+class ClosedExecutionCache(object):
+    """
+    Start time of the last completed execution of workflows, kept in a local JSON file and
+    refreshed with one query for the executions completed since the previous refresh.
+    A workflow is looked up in the SWF history with SWFMeta the first time it is asked for,
+    after that its executions are followed by the refreshes
+    """
+
+    def __init__(self, settings, cache_file, swfmeta=None,
+                 overlap_seconds=EXECUTION_CACHE_OVERLAP_SECONDS):
+        self.settings = settings
+        self.cache_file = cache_file
+        self.swfmeta = swfmeta or SWFMeta(settings)
+        self.overlap_seconds = overlap_seconds
+        self.watermark = None
+        self.last_completed = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.cache_file):
+            return
+        with open(self.cache_file, 'r') as open_file:
+            cache = json.load(open_file)
+        self.watermark = cache.get('watermark')
+        self.last_completed = cache.get('last_completed', {})
+
+    def save(self):
+        cache = {'watermark': self.watermark, 'last_completed': self.last_completed}
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w') as open_file:
+            json.dump(cache, open_file)
+        os.replace(tmp_file, self.cache_file)
+
+    def completed_since(self, close_oldest_date, close_latest_date):
+        "execution infos of the domain completed between the dates, all pages"
+        if self.swfmeta.conn is None:
+            self.swfmeta.connect()
+        next_page_token = None
+        while True:
+            infos = self.swfmeta.conn.list_closed_workflow_executions(
+                domain=self.settings.domain,
+                close_oldest_date=close_oldest_date,
+                close_latest_date=close_latest_date,
+                close_status='COMPLETED',
+                maximum_page_size=1000,
+                next_page_token=next_page_token)
+            for execution in infos.get('executionInfos', []):
+                yield execution
+            next_page_token = infos.get('nextPageToken')
+            if not next_page_token:
+                break
+
+    def update(self, key, start_timestamp):
+        "record the start time if it is later than the one cached for a followed workflow"
+        if key not in self.last_completed or start_timestamp is None:
+            return
+        if self.last_completed[key] is None or start_timestamp > self.last_completed[key]:
+            self.last_completed[key] = start_timestamp
+
+    def refresh(self):
+        "update from the executions completed since the last refresh and save the cache"
+        now = calendar.timegm(time.gmtime())
+        if self.watermark is not None and self.last_completed:
+            close_oldest_date = self.watermark - self.overlap_seconds
+            for execution in self.completed_since(close_oldest_date, now):
+                workflow_type = execution.get('workflowType', {})
+                start_timestamp = execution.get('startTimestamp')
+                self.update(execution_key(execution['execution']['workflowId']), start_timestamp)
+                self.update(execution_key(workflow_name=workflow_type.get('name'),
+                                          workflow_version=workflow_type.get('version')),
+                            start_timestamp)
+        self.watermark = now
+        self.save()
+
+    def last_completed_start(self, workflow_id=None, workflow_name=None, workflow_version=None):
+        "start time of the last completed execution, from the cache after a refresh"
+        key = execution_key(workflow_id, workflow_name, workflow_version)
+        if key not in self.last_completed:
+            # first time asked for, look through the SWF history once
+            self.last_completed[key] = \
+                self.swfmeta.get_last_completed_workflow_execution_startTimestamp(
+                    workflow_id=workflow_id, workflow_name=workflow_name,
+                    workflow_version=workflow_version)
+            self.save()
+        return self.last_completed[key]
+
+    def last_completed_starts(self, workflow_ids):
+        "dict of workflow_id to the start time of its last completed execution"
+        return {workflow_id: self.last_completed_start(workflow_id)
+                for workflow_id in workflow_ids}
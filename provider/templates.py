@@ -1,7 +1,10 @@
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache, TemplateNotFound
 
 from boto.s3.connection import S3Connection
 
@@ -13,6 +16,145 @@ Templates provider
 Connects to S3, discovers, downloads, and parses templates using jinja2
 """
 
+# template cache defaults, can be overridden in settings
+TEMPLATE_CACHE_DIR = "templates_cache"
+TEMPLATE_CACHE_SECONDS = 60
+MANIFEST_FILE_NAME = "manifest.json"
+
+# process wide TemplateCache and jinja environments of local template folders
+TEMPLATE_CACHE = None
+DIRECTORY_ENVIRONMENTS = {}
+TEMPLATE_CACHE_LOCK = threading.Lock()
+
+
+def template_cache(settings):
+    "the TemplateCache of this process, created the first time it is used"
+    global TEMPLATE_CACHE
+    with TEMPLATE_CACHE_LOCK:
+        if TEMPLATE_CACHE is None:
+            TEMPLATE_CACHE = TemplateCache(
+                settings,
+                cache_dir=getattr(settings, 'templates_cache_dir', TEMPLATE_CACHE_DIR),
+                check_seconds=getattr(settings, 'templates_cache_seconds',
+                                      TEMPLATE_CACHE_SECONDS))
+        return TEMPLATE_CACHE
+
+
+def bytecode_cache(cache_dir):
+    "jinja bytecode cache in the bytecode folder of cache_dir"
+    bytecode_dir = os.path.join(cache_dir, "bytecode")
+    os.makedirs(bytecode_dir, exist_ok=True)
+    return FileSystemBytecodeCache(bytecode_dir)
+
+
+def directory_jinja_env(settings, template_dir):
+    "jinja environment of a local template folder shared by this process"
+    with TEMPLATE_CACHE_LOCK:
+        if template_dir not in DIRECTORY_ENVIRONMENTS:
+            DIRECTORY_ENVIRONMENTS[template_dir] = Environment(
+                loader=FileSystemLoader(template_dir),
+                bytecode_cache=bytecode_cache(
+                    getattr(settings, 'templates_cache_dir', TEMPLATE_CACHE_DIR)))
+        return DIRECTORY_ENVIRONMENTS[template_dir]
+
+
+class TemplateCache(object):
+    """
+    Templates downloaded from the templates bucket once per process into cache_dir, and
+    downloaded again only when the ETag listed in S3 changes, listed at most every
+    check_seconds. One jinja environment keeps the compiled templates in memory and
+    their bytecode on disk
+    """
+
+    def __init__(self, settings, cache_dir=TEMPLATE_CACHE_DIR,
+                 check_seconds=TEMPLATE_CACHE_SECONDS, bucket=None):
+        self.settings = settings
+        self.cache_dir = cache_dir
+        self.check_seconds = check_seconds
+        self.bucket = bucket
+        self.lock = threading.Lock()
+        # S3 key name to the ETag of the downloaded template
+        self.etags = {}
+        self.checked = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load()
+        self.jinja_env = Environment(
+            loader=FileSystemLoader(self.cache_dir),
+            bytecode_cache=bytecode_cache(self.cache_dir))
+
+    def manifest_path(self):
+        return os.path.join(self.cache_dir, MANIFEST_FILE_NAME)
+
+    def load(self):
+        "ETags of the templates downloaded by an earlier process"
+        try:
+            with open(self.manifest_path(), 'r') as open_file:
+                self.etags = json.load(open_file)
+        except (IOError, ValueError):
+            self.etags = {}
+
+    def save(self):
+        tmp_file = self.manifest_path() + '.tmp'
+        with open(tmp_file, 'w') as open_file:
+            json.dump(self.etags, open_file)
+        os.replace(tmp_file, self.manifest_path())
+
+    def get_bucket(self):
+        if self.bucket is None:
+            s3_conn = S3Connection(self.settings.aws_access_key_id,
+                                   self.settings.aws_secret_access_key)
+            self.bucket = s3_conn.lookup(self.settings.templates_bucket)
+        return self.bucket
+
+    def list_etags(self, prefix):
+        "S3 key name to ETag of the keys in the folder, from one listing"
+        return {key.name: key.etag.strip('"') for key in self.get_bucket().list(prefix=prefix)}
+
+    def template_path(self, template_name):
+        return os.path.join(self.cache_dir, template_name)
+
+    def refresh(self, templates):
+        """
+        Given an OrderedDict of template name to S3 key name, make sure each template is
+        downloaded and up to date, returns True if all of them are available
+        """
+        with self.lock:
+            missing = [s3_key_name for template_name, s3_key_name in templates.items()
+                       if s3_key_name not in self.etags
+                       or not os.path.exists(self.template_path(template_name))]
+            if (missing or self.checked is None
+                    or time.time() - self.checked >= self.check_seconds):
+                self.revalidate(templates)
+                self.checked = time.time()
+            return all(s3_key_name in self.etags for s3_key_name in templates.values())
+
+    def revalidate(self, templates):
+        "compare the ETags listed in S3 and download the changed templates"
+        s3_etags = {}
+        for prefix in set(s3_key_name.rsplit("/", 1)[0] + "/"
+                          for s3_key_name in templates.values()):
+            s3_etags.update(self.list_etags(prefix))
+        changed = False
+        for template_name, s3_key_name in templates.items():
+            etag = s3_etags.get(s3_key_name)
+            if etag is None:
+                # template is missing from the S3 bucket
+                if self.etags.pop(s3_key_name, None) is not None:
+                    changed = True
+                continue
+            if (self.etags.get(s3_key_name) == etag
+                    and os.path.exists(self.template_path(template_name))):
+                continue
+            contents = self.get_bucket().get_key(s3_key_name).get_contents_as_string()
+            tmp_file = self.template_path(template_name) + '.tmp'
+            with open(tmp_file, 'w') as open_file:
+                open_file.write(unicode_encode(contents))
+            os.replace(tmp_file, self.template_path(template_name))
+            self.etags[s3_key_name] = etag
+            changed = True
+        if changed:
+            self.save()
+
 class Templates(object):
 
     def __init__(self, settings=None, tmp_dir=None):
@@ -158,7 +300,13 @@ class Templates(object):
             self.lens_templates_warmed = True
 
     def download_templates_from_s3(self, template_list):
-        "download template files from s3"
+        "download template files from s3, or use the process template cache if enabled"
+        if getattr(self.settings, 'templates_cache', False):
+            cache = template_cache(self.settings)
+            self.email_templates_warmed = cache.refresh(OrderedDict(
+                [(t, self.get_s3_key_name("email", t)) for t in template_list]))
+            self.jinja_env = cache.jinja_env
+            return
         template_missing = False
         for t in template_list:
             success = self.download_template_from_s3(
@@ -313,6 +461,17 @@ class Templates(object):
         get the template, render it and return the content
         """
 
+        if getattr(self.settings, 'templates_cache', False):
+            # render from from_dir with the compiled templates shared by this process
+            jinja_env = directory_jinja_env(self.settings, from_dir)
+            try:
+                tmpl = self.get_jinja_template(jinja_env, "lens_article.html")
+            except TemplateNotFound:
+                return None
+            return tmpl.render(article=article,
+                               cdn_bucket=cdn_bucket,
+                               article_xml_filename=article_xml_filename)
+
         # Warm the template files
         if self.lens_templates_warmed is not True:
             self.copy_lens_templates(from_dir)
@@ -16,6 +16,85 @@ import newrelic.agent
 Amazon SQS worker
 """
 
+# SQS receives, sends and deletes at most 10 messages per batch request
+MAXIMUM_BATCH_SIZE = 10
+WAIT_TIME_SECONDS = 20
+
+RULES_FILE = 'newFileWorkflows.yaml'
+# how often to check the rules file for changes
+RULES_CHECK_SECONDS = 10
+
+
+class RoutingTable:
+    """
+    Starter names for S3 notifications by the rules of newFileWorkflows.yaml, the patterns
+    are compiled once and the rules which can match a bucket are indexed by bucket name.
+    Rules are tried in their order in the file, as before, and when loaded from a file it
+    is reloaded once it changes
+    """
+
+    def __init__(self, rules=None, rules_file=None, logger=None,
+                 check_seconds=RULES_CHECK_SECONDS):
+        self.rules_file = rules_file
+        self.logger = logger
+        self.check_seconds = check_seconds
+        self.checked = time.time()
+        self.modified = None
+        if rules is None:
+            self.modified = os.path.getmtime(rules_file)
+            rules = read_rules(rules_file)
+        self.load(rules)
+
+    def load(self, rules):
+        self.rules = [
+            (re.compile(rule['bucket_name_pattern']), re.compile(rule['file_name_pattern']),
+             rule['starter_name'])
+            for rule in rules.values()]
+        self.bucket_rules = {}
+
+    def reload_if_changed(self):
+        "reload the rules if the file changed, keeping the current rules if it cannot be read"
+        if not self.rules_file or time.time() - self.checked < self.check_seconds:
+            return
+        self.checked = time.time()
+        try:
+            modified = os.path.getmtime(self.rules_file)
+            if modified != self.modified:
+                self.load(read_rules(self.rules_file))
+                self.modified = modified
+                if self.logger:
+                    self.logger.info("reloaded rules from %s" % self.rules_file)
+        except Exception:
+            if self.logger:
+                self.logger.exception("error reloading rules from %s" % self.rules_file)
+
+    def rules_for_bucket(self, bucket_name):
+        if bucket_name not in self.bucket_rules:
+            self.bucket_rules[bucket_name] = [
+                (file_name_pattern, starter_name)
+                for bucket_name_pattern, file_name_pattern, starter_name in self.rules
+                if bucket_name_pattern.match(bucket_name)]
+        return self.bucket_rules[bucket_name]
+
+    def route(self, info):
+        "starter name for the S3NotificationInfo, None if no rule matches"
+        self.reload_if_changed()
+        for file_name_pattern, starter_name in self.rules_for_bucket(info.bucket_name):
+            if file_name_pattern.match(info.file_name):
+                return starter_name
+        return None
+
+    def route_many(self, infos):
+        "list of starter names for the S3NotificationInfo list"
+        self.reload_if_changed()
+        return [self.route(info) for info in infos]
+
+
+def read_rules(rules_file):
+    with open(rules_file, 'r') as open_file:
+        return yaml.safe_load(open_file.read())
+
+
 class QueueWorker:
     def __init__(self, settings, logger=None):
         self.settings = settings
@@ -25,6 +104,7 @@ class QueueWorker:
             self.create_log()
         self.conn = None
         self.sleep_seconds = 10
+        self.batch_size = min(getattr(settings, 'queue_worker_batch_size', 1), MAXIMUM_BATCH_SIZE)
 
     def create_log(self):
         # Log
@@ -52,10 +132,13 @@ class QueueWorker:
     def work(self, flag):
         "read messages from the queue"
 
+        if self.batch_size > 1:
+            return self.work_batch(flag)
+
         # Simple connect to the queues
         queue, out_queue = self.queues()
 
-        rules = self.load_rules()
+        routing = self.routing_table()
         application = newrelic.agent.application()
 
         # Poll for an activity task indefinitely
@@ -74,17 +157,8 @@ class QueueWorker:
                         self.logger.info('got message id: %s' % queue_message.id)
                         if queue_message.notification_type == 'S3Event':
                             info = S3NotificationInfo.from_S3SQSMessage(queue_message)
-                            self.logger.info("S3NotificationInfo: %s", info.to_dict())
-                            workflow_name = self.get_starter_name(rules, info)
-                            if workflow_name is None:
-                                self.logger.error("Could not handle file %s in bucket %s" % (info.file_name, info.bucket_name))
-                            else:
-                                # build message
-                                message = {
-                                    'workflow_name': workflow_name,
-                                    'workflow_data': info.to_dict()
-                                }
-    
+                            message = self.starter_message(info, routing.route(info))
+                            if message is not None:
                                 # send workflow initiation message
                                 m = Message()
                                 m.set_body(json.dumps(message))
@@ -105,18 +179,103 @@ class QueueWorker:
             self.logger.error('error obtaining queue')
 
 
+    def work_batch(self, flag):
+        """
+        read messages from the queue in batches, send their starter messages and delete
+        them in a batch each, sleeping only while the queue is empty
+        """
+        queue, out_queue = self.queues()
+
+        routing = self.routing_table()
+        application = newrelic.agent.application()
+
+        if queue is None:
+            self.logger.error('error obtaining queue')
+            return
+
+        idle_sleep_seconds = 1
+        while flag.green():
+            self.logger.info('reading messages')
+            queue_messages = queue.get_messages(
+                num_messages=self.batch_size, wait_time_seconds=WAIT_TIME_SECONDS)
+            if not queue_messages:
+                self.logger.info('no messages available')
+                # back off while the queue stays empty
+                time.sleep(idle_sleep_seconds)
+                idle_sleep_seconds = min(idle_sleep_seconds * 2, self.sleep_seconds)
+                continue
+            idle_sleep_seconds = 1
+            with newrelic.agent.BackgroundTask(application, name='S3EventBatch',
+                                               group='queue_worker.py'):
+                self.process_batch(routing, queue, out_queue, queue_messages)
+
+        self.logger.info("graceful shutdown")
+
+    def process_batch(self, routing, queue, out_queue, queue_messages):
+        """
+        send the starter messages for a batch of queue messages and delete those handled,
+        a message which fails is left on the queue to be received again
+        """
+        handled = {}
+        infos = []
+        for queue_message in queue_messages:
+            self.logger.info('got message id: %s' % queue_message.id)
+            if queue_message.notification_type != 'S3Event':
+                continue
+            try:
+                info = S3NotificationInfo.from_S3SQSMessage(queue_message)
+            except Exception:
+                self.logger.exception('error handling message id: %s' % queue_message.id)
+                continue
+            batch_id = str(len(handled))
+            handled[batch_id] = queue_message
+            infos.append((batch_id, info))
+
+        starter_messages = []
+        workflow_names = routing.route_many([info for batch_id, info in infos])
+        for (batch_id, info), workflow_name in zip(infos, workflow_names):
+            message = self.starter_message(info, workflow_name)
+            if message is not None:
+                out_message = Message()
+                out_message.set_body(json.dumps(message))
+                starter_messages.append((batch_id, out_message.get_body_encoded(), 0))
+
+        if starter_messages:
+            results = out_queue.write_batch(starter_messages)
+            for error in results.errors:
+                self.logger.error('error sending starter message for message id %s: %s' %
+                                  (handled[error['id']].id, error.get('error_message')))
+                del handled[error['id']]
+
+        if handled:
+            # cancel incoming messages
+            self.logger.info("cancelling %s messages" % len(handled))
+            results = queue.delete_message_batch(list(handled.values()))
+            for error in results.errors:
+                self.logger.error('error cancelling message: %s' % error)
+            self.logger.info("messages cancelled")
+
+    def starter_message(self, info, workflow_name):
+        "workflow starter message for the S3 notification, None if no workflow handles it"
+        self.logger.info("S3NotificationInfo: %s", info.to_dict())
+        if workflow_name is None:
+            self.logger.error("Could not handle file %s in bucket %s" % (info.file_name, info.bucket_name))
+            return None
+        return {
+            'workflow_name': workflow_name,
+            'workflow_data': info.to_dict()
+        }
+
     def load_rules(self):
         # load the rules from the YAML file
-        with open('newFileWorkflows.yaml', 'r') as open_file:
-            return yaml.load(open_file.read())
+        return read_rules(RULES_FILE)
 
+    def routing_table(self):
+        "routing table of the rules file, reloaded when the file changes"
+        return RoutingTable(rules_file=RULES_FILE, logger=self.logger)
 
     def get_starter_name(self, rules, info):
-        for rule_name in rules:
-            rule = rules[rule_name]
-            if re.match(rule['bucket_name_pattern'], info.bucket_name) and \
-                    re.match(rule['file_name_pattern'], info.file_name):
-                return rule['starter_name']
+        return RoutingTable(rules).route(info)
 
 
 if __name__ == "__main__":
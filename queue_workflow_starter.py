@@ -5,14 +5,15 @@ import os
 import uuid
 import json
 import importlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import log
 import boto.sqs
 import newrelic.agent
 from S3utility.s3_notification_info import S3NotificationInfo
 from provider import process, utils
 from provider.utils import bytes_decode
-# this is not an unused import, it is used dynamically
-import starter
+import starter.starter_helper as helper
 
 """
 Example message:
@@ -26,6 +27,12 @@ Example message:
 """
 
 
+# dispatcher defaults, can be overridden in settings
+DISPATCH_THREADS = 1
+# SQS receives at most 10 messages per request
+MAXIMUM_BATCH_SIZE = 10
+
+
 def main(settings, flag):
     log_file = "queue_workflow_starter.log"
     identity = "queue_workflow_starter_%s" % os.getpid()
@@ -33,6 +40,11 @@ def main(settings, flag):
     # Simple connect
     queue = get_queue(settings)
 
+    threads = getattr(settings, 'workflow_starter_threads', DISPATCH_THREADS)
+    if threads > 1:
+        dispatch(settings, logger, flag, queue, threads)
+        return
+
     while flag.green():
         messages = queue.get_messages(1, visibility_timeout=60,
                                       wait_time_seconds=20)
@@ -46,6 +58,52 @@ def main(settings, flag):
     logger.info("graceful shutdown")
 
 
+def dispatch(settings, logger, flag, queue, threads):
+    """
+    Receive messages in batches and start their workflows concurrently, each thread with its
+    own SWF connection. A message is deleted once its workflow started, the SQS connection
+    is only used from this thread
+    """
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        while flag.green():
+            messages = queue.get_messages(MAXIMUM_BATCH_SIZE, visibility_timeout=60,
+                                          wait_time_seconds=20)
+            if not messages:
+                logger.debug("No messages received")
+                continue
+            logger.info(str(len(messages)) + " messages received")
+            futures = {
+                executor.submit(start_message, settings, logger, message): message
+                for message in messages}
+            for future in as_completed(futures):
+                if future.result():
+                    futures[future].delete()
+
+    logger.info("graceful shutdown")
+
+
+def start_message(settings, logger, message):
+    """
+    Start the workflow of the message, return True if the message is done with: the workflow
+    started or the message is not valid. If starting fails it is received again later
+    """
+    # the starters run in this thread use its SWF connection
+    helper.thread_swf_connection(settings)
+    logger.info('message contents: %s', message.get_body())
+    try:
+        name, data = parse_message(message)
+        starter_class(name)
+    except Exception:
+        logger.exception("Invalid message %s", message.get_body())
+        return True
+    try:
+        start_workflow(settings, name, data)
+    except Exception:
+        logger.exception("Exception while starting workflow for %s", message.get_body())
+        return False
+    return True
+
+
 def get_queue(settings):
     conn = boto.sqs.connect_to_region(settings.sqs_region,
                                       aws_access_key_id=settings.aws_access_key_id,
@@ -54,27 +112,41 @@ def get_queue(settings):
     return queue
 
 
+def parse_message(message):
+    "workflow name and data of the message"
+    message_payload = json.loads(str(bytes_decode(message.get_body())))
+    return message_payload.get('workflow_name'), message_payload.get('workflow_data')
+
+
 def process_message(settings, logger, message):
     try:
-        message_payload = json.loads(str(bytes_decode(message.get_body())))
-        name = message_payload.get('workflow_name')
-        data = message_payload.get('workflow_data')
+        name, data = parse_message(message)
         start_workflow(settings, name, data)
     except Exception:
         logger.exception("Exception while processing %s", message.get_body())
     message.delete()
 
 
+STARTER_CLASSES = {}
+STARTER_CLASSES_LOCK = threading.Lock()
+
+
+def starter_class(workflow_name):
+    "the starter class of the workflow, its module is only imported once"
+    with STARTER_CLASSES_LOCK:
+        if workflow_name not in STARTER_CLASSES:
+            class_name = 'starter_' + workflow_name
+            module = importlib.import_module('starter.' + class_name)
+            STARTER_CLASSES[workflow_name] = getattr(module, class_name)
+        return STARTER_CLASSES[workflow_name]
+
+
 @newrelic.agent.background_task(group='queue_workflow_starter.py')
 def start_workflow(settings, workflow_name, workflow_data):
     data_processor = workflow_data_processors.get(workflow_name)
-    workflow_name = 'starter_' + workflow_name
     if data_processor is not None:
         workflow_data = data_processor(workflow_data)
-    module_name = "starter." + workflow_name
-    importlib.import_module(module_name)
-    full_path = "starter." + workflow_name + "." + workflow_name + "()"
-    starter_object = eval(full_path)
+    starter_object = starter_class(workflow_name)()
     starter_object.start(settings=settings, **workflow_data)
 
 
@@ -0,0 +1,106 @@
+# compare deciding on long synthetic event histories by rescanning events
+# against the one pass HistoryIndex, run from the elife-bot root directory:
+# PYTHONPATH=. python scripts/benchmark_decision_history.py
+import time
+from workflow.objects import Workflow
+
+
+STEP_COUNT = 40
+PARALLEL_COUNT = 5
+RETRIES = 10
+
+
+def step(activity_type, activity_id):
+    return {'activity_type': activity_type, 'activity_id': activity_id}
+
+
+def definition(step_count=STEP_COUNT, parallel_count=PARALLEL_COUNT):
+    steps = []
+    for step_number in range(step_count):
+        if step_number % 2:
+            steps.append([step('Parallel%s' % step_number, 'Parallel%s.%s' % (step_number, i))
+                          for i in range(parallel_count)])
+        else:
+            steps.append(step('Step%s' % step_number, 'Step%s' % step_number))
+    return {'name': 'Benchmark', 'steps': steps}
+
+
+def history(workflow_definition, retries=RETRIES):
+    """every activity fails retries times before completing, except the last step"""
+    events = [{'eventId': 1, 'eventType': 'WorkflowExecutionStarted'}]
+    activities = []
+    for workflow_step in workflow_definition['steps'][:-1]:
+        activities += workflow_step if isinstance(workflow_step, list) else [workflow_step]
+    for activity in activities:
+        for attempt in range(retries + 1):
+            scheduled_event_id = len(events) + 1
+            events.append({
+                'eventId': scheduled_event_id,
+                'eventType': 'ActivityTaskScheduled',
+                'activityTaskScheduledEventAttributes': {
+                    'activityType': {'name': activity['activity_type']},
+                    'activityId': activity['activity_id']}})
+            if attempt < retries:
+                events.append({
+                    'eventId': len(events) + 1,
+                    'eventType': 'ActivityTaskFailed',
+                    'activityTaskFailedEventAttributes': {
+                        'scheduledEventId': scheduled_event_id}})
+            else:
+                events.append({
+                    'eventId': len(events) + 1,
+                    'eventType': 'ActivityTaskCompleted',
+                    'activityTaskCompletedEventAttributes': {
+                        'scheduledEventId': scheduled_event_id}})
+    return {'events': events}
+
+
+def scan_activity_status(decision, activity_type, activity_id):
+    "the activity_status algorithm before HistoryIndex, two scans of the events"
+    event_ids = []
+    for event in decision['events']:
+        try:
+            attributes = event['activityTaskScheduledEventAttributes']
+            if (attributes['activityType']['name'] == activity_type
+                    and attributes['activityId'] == activity_id):
+                event_ids.append(event['eventId'])
+        except KeyError:
+            pass
+    for event in decision['events']:
+        for event_id in event_ids:
+            try:
+                if event['activityTaskCompletedEventAttributes']['scheduledEventId'] == event_id:
+                    return True
+            except KeyError:
+                pass
+    return False
+
+
+class ScanWorkflow(Workflow):
+    def activity_status(self, decision, activityType=None, activityID=None):
+        return scan_activity_status(decision, activityType, activityID)
+
+
+def benchmark(workflow_class, workflow_definition, decision):
+    workflow_object = workflow_class(None, None, decision=decision,
+                                     definition=workflow_definition)
+    start = time.time()
+    complete = workflow_object.is_workflow_complete()
+    next_activities = workflow_object.get_next_activities()
+    workflow_object.last_activity_status(decision)
+    return time.time() - start, complete, next_activities
+
+
+if __name__ == '__main__':
+    WORKFLOW_DEFINITION = definition()
+    DECISION = history(WORKFLOW_DEFINITION)
+    print("Events: %s" % len(DECISION['events']))
+    SCAN_SECONDS, SCAN_COMPLETE, SCAN_NEXT = benchmark(
+        ScanWorkflow, WORKFLOW_DEFINITION, DECISION)
+    INDEX_SECONDS, INDEX_COMPLETE, INDEX_NEXT = benchmark(
+        Workflow, WORKFLOW_DEFINITION, DECISION)
+    assert SCAN_COMPLETE == INDEX_COMPLETE
+    assert SCAN_NEXT == INDEX_NEXT
+    print("Scan: %.4f seconds" % SCAN_SECONDS)
+    print("Index: %.4f seconds" % INDEX_SECONDS)
+    print("Speedup: %.1fx" % (SCAN_SECONDS / INDEX_SECONDS))
@@ -22,9 +22,15 @@ class exp():
     # SQS settings
     sqs_region = 'eu-west-1'
     S3_monitor_queue = 'xxawsxx-incoming-queue'
+    queue_worker_batch_size = 10
     event_monitor_topic = 'arn:aws:sns:eu-west-1:123456789012:elife-bot-event-property--exp'
+    dashboard_emitter = True
+    dashboard_emitter_queue_size = 1000
+    dashboard_emitter_flush_size = 10
+    dashboard_emitter_flush_seconds = 1
     event_monitor_queue = 'exp-event-property-incoming-queue'
     workflow_starter_queue = 'exp-workflow-starter-queue'
+    workflow_starter_threads = 4
     workflow_starter_queue_pool_size = 5
     workflow_starter_queue_message_count = 5
 
@@ -35,14 +41,37 @@ class exp():
     # hostname list here http://docs.aws.amazon.com/general/latest/gr/rande.html#s3_region
 
     s3_hostname = 's3-eu-west-1.amazonaws.com'
+    # parallel S3 transfers, objects at least the threshold bytes use multipart
+    s3_transfer_threads = 8
+    s3_multipart_threshold = 64 * 1024 * 1024
+    s3_multipart_chunk_size = 16 * 1024 * 1024
+    # ExpandArticle streams zip members to the expanded bucket instead of extracting to disk
+    expand_article_stream_zip = True
+    # ConvertImagesToJPG worker processes, 0 converts one image at a time in the activity,
+    # workers are replaced after a number of images or when RSS memory exceeds the bytes
+    image_conversion_processes = 2
+    image_conversion_in_flight = 4
+    image_conversion_worker_max_images = 20
+    image_conversion_worker_max_rss = 1024 * 1024 * 1024
+    image_derivative_cache = True
+    image_derivative_cache_folder = 'elife-bot-dev/image_derivatives'
+    image_derivative_cache_size = 64 * 1024 * 1024
+    image_derivative_cache_entries = 10000
     production_bucket = 'elife-production-final'
     expanded_bucket = 'elife-publishing-expanded'
     ppp_cdn_bucket = 'elife-published/articles'
+    # Glencoe video stills copied to the CDN bucket at a time
+    glencoe_copy_threads = 4
     digest_cdn_bucket = 'elife-published/digests'
     archive_bucket = 'elife-publishing-archive'
 
     # lax endpoint to retrieve information about published versions of articles
     lax_article_versions = 'http://gateway.internal/articles/{article_id}/versions'
+    # seconds to cache Lax versions per process, 0 to not cache, a process
+    # only drops its own cached versions when Lax responds to an ingest
+    lax_cache_ttl = 0
+    lax_cache_size = 1000
+    lax_pool_size = 10
     verify_ssl = True  # False when testing
 
     no_download_extensions = 'tif'
@@ -51,7 +80,19 @@ class exp():
 
     # SWF queue settings
     domain = "Publish.dev"
+    swf_execution_cache_file = 'swf-closed-executions.json'
+    # cron run with --daemon
+    cron_schedule_file = 'cron.yaml'
+    cron_daemon_threads = 4
     default_task_list = "DefaultTaskList"
+    # worker.py slots per process, more than 1 runs the supervised worker pool
+    worker_pool_size = 1
+    worker_stats_seconds = 300
+    # maximum concurrent slots for an activityType in the worker pool
+    worker_activity_concurrency = {"ConvertImagesToJPG": 2, "FTPArticle": 2}
+    # decider history events per page, up to 1000, and drop activity input/result from events
+    decider_maximum_page_size = 1000
+    decider_compact_events = True
 
     # SES settings
     # email needs to be verified by AWS
@@ -81,6 +122,8 @@ class exp():
 
     # POA packaging bucket
     poa_packaging_bucket = 'elife-poa-packaging-dev'
+    # index of articles in the published folders, read by was_ever_published
+    published_doi_index = True
 
     # Article subjects data
     article_subjects_data_bucket = "elife-bot-dev/article_subjects_data"
@@ -136,9 +179,14 @@ class exp():
 
     # EJP S3 settings
     ejp_bucket = 'elife-ejp-ftp-dev'
+    ejp_bucket_file_list_ttl = 60
 
     # Templates S3 settings
     templates_bucket = 'elife-bot-dev'
+    # process wide cache of templates and their compiled bytecode
+    templates_cache = True
+    templates_cache_dir = 'templates_cache'
+    templates_cache_seconds = 60
 
     # Article subjects data
     article_subjects_data_bucket = "elife-bot-dev/article_subjects_data"
@@ -152,6 +200,9 @@ class exp():
     crossref_url = 'http://test.crossref.org/servlet/deposit'
     crossref_login_id = ''
     crossref_login_passwd = ''
+    # processes parsing and generating, and concurrent uploads of deposit files
+    crossref_processes = 2
+    crossref_upload_threads = 4
 
     # PubMed generation
     elifepubmed_config_file = 'pubmed.cfg'
@@ -256,6 +307,7 @@ class exp():
     redis_port = 6379
     redis_db = 0
     redis_expire_key = 86400  # seconds
+    redis_session_snapshot = False
 
     # Version control for xml
     github_token = "tokenhere"
@@ -276,10 +328,20 @@ class exp():
     # IIIF
     path_to_iiif_server = "https://pathto--iiif.elifesciences.org/"
     iiif_resolver = "{article_id}/{article_fig}/full/full/0/default.jpg"
+    iiif_verify_threads = 8
+    iiif_verify_timeout = 30
+    iiif_verify_retries = 3
+    iiif_verify_backoff = 1
 
     # Fastly CDNs
     fastly_service_ids = ['3M35rb7puabccOLrFFxy2']
     fastly_api_key = 'fake_fastly_api_key'
+    fastly_purge_threads = 4
+    fastly_purge_retries = 3
+    # coalesce purges in a queue in the worker process, for mass re-publication,
+    # InvalidateCdn then succeeds once the purge is queued, a purge that fails
+    # later is logged and sent to the dashboard as an error event
+    fastly_purge_queue = False
 
     article_path_pattern = "/articles/{id}v{version}"
 
@@ -297,9 +359,15 @@ class dev():
     # SQS settings
     sqs_region = 'eu-west-1'
     S3_monitor_queue = 'xxawsxx-incoming-queue'
+    queue_worker_batch_size = 10
     event_monitor_topic = 'arn:aws:sns:eu-west-1:123456789012:elife-bot-event-property--dev'
+    dashboard_emitter = True
+    dashboard_emitter_queue_size = 1000
+    dashboard_emitter_flush_size = 10
+    dashboard_emitter_flush_seconds = 1
     event_monitor_queue = 'dev-event-property-incoming-queue'
     workflow_starter_queue = 'dev-workflow-starter-queue'
+    workflow_starter_threads = 4
     workflow_starter_queue_pool_size = 5
     workflow_starter_queue_message_count = 5
 
@@ -310,14 +378,37 @@ class dev():
     # hostname list here http://docs.aws.amazon.com/general/latest/gr/rande.html#s3_region
 
     s3_hostname = 's3-eu-west-1.amazonaws.com'
+    # parallel S3 transfers, objects at least the threshold bytes use multipart
+    s3_transfer_threads = 8
+    s3_multipart_threshold = 64 * 1024 * 1024
+    s3_multipart_chunk_size = 16 * 1024 * 1024
+    # ExpandArticle streams zip members to the expanded bucket instead of extracting to disk
+    expand_article_stream_zip = True
+    # ConvertImagesToJPG worker processes, 0 converts one image at a time in the activity,
+    # workers are replaced after a number of images or when RSS memory exceeds the bytes
+    image_conversion_processes = 2
+    image_conversion_in_flight = 4
+    image_conversion_worker_max_images = 20
+    image_conversion_worker_max_rss = 1024 * 1024 * 1024
+    image_derivative_cache = True
+    image_derivative_cache_folder = 'elife-bot-dev/image_derivatives'
+    image_derivative_cache_size = 64 * 1024 * 1024
+    image_derivative_cache_entries = 10000
     production_bucket = 'elife-production-final'
     expanded_bucket = 'elife-publishing-expanded'
     ppp_cdn_bucket = 'elife-published/articles'
+    # Glencoe video stills copied to the CDN bucket at a time
+    glencoe_copy_threads = 4
     digest_cdn_bucket = 'elife-published/digests'
     archive_bucket = 'elife-publishing-archive'
 
     # lax endpoint to retrieve information about published versions of articles
     lax_article_versions = 'http://gateway.internal/articles/{article_id}/versions'
+    # seconds to cache Lax versions per process, 0 to not cache, a process
+    # only drops its own cached versions when Lax responds to an ingest
+    lax_cache_ttl = 0
+    lax_cache_size = 1000
+    lax_pool_size = 10
     verify_ssl = True  # False when testing
 
     no_download_extensions = 'tif'
@@ -326,7 +417,19 @@ class dev():
 
     # SWF queue settings
     domain = "Publish.dev"
+    swf_execution_cache_file = 'swf-closed-executions.json'
+    # cron run with --daemon
+    cron_schedule_file = 'cron.yaml'
+    cron_daemon_threads = 4
     default_task_list = "DefaultTaskList"
+    # worker.py slots per process, more than 1 runs the supervised worker pool
+    worker_pool_size = 1
+    worker_stats_seconds = 300
+    # maximum concurrent slots for an activityType in the worker pool
+    worker_activity_concurrency = {"ConvertImagesToJPG": 2, "FTPArticle": 2}
+    # decider history events per page, up to 1000, and drop activity input/result from events
+    decider_maximum_page_size = 1000
+    decider_compact_events = True
 
     # SES settings
     # email needs to be verified by AWS
@@ -356,6 +459,8 @@ class dev():
 
     # POA packaging bucket
     poa_packaging_bucket = 'elife-poa-packaging-dev'
+    # index of articles in the published folders, read by was_ever_published
+    published_doi_index = True
 
     # Article subjects data
     article_subjects_data_bucket = "elife-bot-dev/article_subjects_data"
@@ -411,9 +516,14 @@ class dev():
 
     # EJP S3 settings
     ejp_bucket = 'elife-ejp-ftp-dev'
+    ejp_bucket_file_list_ttl = 60
 
     # Templates S3 settings
     templates_bucket = 'elife-bot-dev'
+    # process wide cache of templates and their compiled bytecode
+    templates_cache = True
+    templates_cache_dir = 'templates_cache'
+    templates_cache_seconds = 60
 
     # Article subjects data
     article_subjects_data_bucket = "elife-bot-dev/article_subjects_data"
@@ -427,6 +537,9 @@ class dev():
     crossref_url = 'http://test.crossref.org/servlet/deposit'
     crossref_login_id = ''
     crossref_login_passwd = ''
+    # processes parsing and generating, and concurrent uploads of deposit files
+    crossref_processes = 2
+    crossref_upload_threads = 4
 
     # PubMed generation
     elifepubmed_config_file = 'pubmed.cfg'
@@ -531,6 +644,7 @@ class dev():
     redis_port = 6379
     redis_db = 0
     redis_expire_key = 86400  # seconds
+    redis_session_snapshot = False
 
     # Version control for xml
     github_token = "tokenhere"
@@ -547,10 +661,20 @@ class dev():
     # IIIF
     path_to_iiif_server = "https://pathto--iiif.elifesciences.org/"
     iiif_resolver = "{article_id}/{article_fig}/full/full/0/default.jpg"
+    iiif_verify_threads = 8
+    iiif_verify_timeout = 30
+    iiif_verify_retries = 3
+    iiif_verify_backoff = 1
 
     # Fastly CDNs
     fastly_service_ids = ['3M35rb7puabccOLrFFxy2']
     fastly_api_key = 'fake_fastly_api_key'
+    fastly_purge_threads = 4
+    fastly_purge_retries = 3
+    # coalesce purges in a queue in the worker process, for mass re-publication,
+    # InvalidateCdn then succeeds once the purge is queued, a purge that fails
+    # later is logged and sent to the dashboard as an error event
+    fastly_purge_queue = False
 
     article_path_pattern = "/articles/{id}v{version}"
 
@@ -568,9 +692,15 @@ class live():
     # SQS settings
     sqs_region = 'eu-west-1'
     S3_monitor_queue = 'incoming-queue'
+    queue_worker_batch_size = 10
     event_monitor_topic = 'arn:aws:sns:eu-west-1:123456789012:elife-bot-event-property--prod'
+    dashboard_emitter = True
+    dashboard_emitter_queue_size = 1000
+    dashboard_emitter_flush_size = 10
+    dashboard_emitter_flush_seconds = 1
     event_monitor_queue = 'event-property-incoming-queue'
     workflow_starter_queue = 'workflow-starter-queue'
+    workflow_starter_threads = 4
     workflow_starter_queue_pool_size = 5
     workflow_starter_queue_message_count = 5
 
@@ -581,15 +711,38 @@ class live():
     # hostname list here http://docs.aws.amazon.com/general/latest/gr/rande.html#s3_region
 
     s3_hostname = 's3-eu-west-1.amazonaws.com'
+    # parallel S3 transfers, objects at least the threshold bytes use multipart
+    s3_transfer_threads = 8
+    s3_multipart_threshold = 64 * 1024 * 1024
+    s3_multipart_chunk_size = 16 * 1024 * 1024
+    # ExpandArticle streams zip members to the expanded bucket instead of extracting to disk
+    expand_article_stream_zip = True
+    # ConvertImagesToJPG worker processes, 0 converts one image at a time in the activity,
+    # workers are replaced after a number of images or when RSS memory exceeds the bytes
+    image_conversion_processes = 2
+    image_conversion_in_flight = 4
+    image_conversion_worker_max_images = 20
+    image_conversion_worker_max_rss = 1024 * 1024 * 1024
+    image_derivative_cache = True
+    image_derivative_cache_folder = 'elife-bot/image_derivatives'
+    image_derivative_cache_size = 64 * 1024 * 1024
+    image_derivative_cache_entries = 10000
     production_bucket = 'elife-production-final'
     expanded_bucket = 'elife-publishing-expanded'
     # since prefix is empty
     ppp_cdn_bucket = 'prod-elife-published/articles'
+    # Glencoe video stills copied to the CDN bucket at a time
+    glencoe_copy_threads = 4
     digest_cdn_bucket = 'prod-elife-published/digests'
     archive_bucket = 'prod-elife-publishing-archive'
 
     # lax endpoint to retrieve information about published versions of articles
     lax_article_versions = 'http://gateway.internal/articles/{article_id}/versions'
+    # seconds to cache Lax versions per process, 0 to not cache, a process
+    # only drops its own cached versions when Lax responds to an ingest
+    lax_cache_ttl = 0
+    lax_cache_size = 1000
+    lax_pool_size = 10
     verify_ssl = True  # False when testing
 
     no_download_extensions = 'tif'
@@ -598,7 +751,19 @@ class live():
 
     # SWF queue settings
     domain = "Publish"
+    swf_execution_cache_file = 'swf-closed-executions.json'
+    # cron run with --daemon
+    cron_schedule_file = 'cron.yaml'
+    cron_daemon_threads = 4
     default_task_list = "DefaultTaskList"
+    # worker.py slots per process, more than 1 runs the supervised worker pool
+    worker_pool_size = 1
+    worker_stats_seconds = 300
+    # maximum concurrent slots for an activityType in the worker pool
+    worker_activity_concurrency = {"ConvertImagesToJPG": 2, "FTPArticle": 2}
+    # decider history events per page, up to 1000, and drop activity input/result from events
+    decider_maximum_page_size = 1000
+    decider_compact_events = True
 
     # SES settings
     # email needs to be verified by AWS
@@ -628,6 +793,8 @@ class live():
 
     # POA packaging bucket
     poa_packaging_bucket = 'elife-poa-packaging'
+    # index of articles in the published folders, read by was_ever_published
+    published_doi_index = True
 
     # Article subjects data
     article_subjects_data_bucket = "elife-bot/article_subjects_data"
@@ -683,9 +850,14 @@ class live():
 
     # EJP S3 settings
     ejp_bucket = 'elife-ejp-ftp'
+    ejp_bucket_file_list_ttl = 60
 
     # Templates S3 settings
     templates_bucket = 'elife-bot'
+    # process wide cache of templates and their compiled bytecode
+    templates_cache = True
+    templates_cache_dir = 'templates_cache'
+    templates_cache_seconds = 60
 
     # Crossref generation
     elifecrossref_config_file = 'crossref.cfg'
@@ -695,6 +867,9 @@ class live():
     crossref_url = 'http://doi.crossref.org/servlet/deposit'
     crossref_login_id = ''
     crossref_login_passwd = ''
+    # processes parsing and generating, and concurrent uploads of deposit files
+    crossref_processes = 2
+    crossref_upload_threads = 4
 
     # PubMed generation
     elifepubmed_config_file = 'pubmed.cfg'
@@ -799,6 +974,7 @@ class live():
     redis_port = 6379
     redis_db = 0
     redis_expire_key = 86400  # seconds
+    redis_session_snapshot = False
 
     # Version control for xml
     github_token = "tokenhere"
@@ -819,10 +995,20 @@ class live():
     # IIIF
     path_to_iiif_server = "https://pathto--iiif.elifesciences.org/"
     iiif_resolver = "{article_id}/{article_fig}/full/full/0/default.jpg"
+    iiif_verify_threads = 8
+    iiif_verify_timeout = 30
+    iiif_verify_retries = 3
+    iiif_verify_backoff = 1
 
     # Fastly CDNs
     fastly_service_ids = ['3M35rb7puabccOLrFFxy2']
     fastly_api_key = 'fake_fastly_api_key'
+    fastly_purge_threads = 4
+    fastly_purge_retries = 3
+    # coalesce purges in a queue in the worker process, for mass re-publication,
+    # InvalidateCdn then succeeds once the purge is queued, a purge that fails
+    # later is logged and sent to the dashboard as an error event
+    fastly_purge_queue = False
 
     article_path_pattern = "/articles/{id}v{version}"
 
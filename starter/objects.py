@@ -34,9 +34,7 @@ class Starter():
     def connect_to_swf(self):
         """connect to SWF"""
         # Simple connect
-        self.conn = boto.swf.layer1.Layer1(
-            self.settings.aws_access_key_id,
-            self.settings.aws_secret_access_key)
+        self.conn = helper.swf_connection(self.settings)
 
     def start_swf_workflow_execution(self, workflow_params):
         if not self.conn:
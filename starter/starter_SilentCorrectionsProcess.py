@@ -46,7 +46,7 @@ class starter_SilentCorrectionsProcess():
                                                          "%s.%s" % (article_id, version))
 
         # Simple connect
-        conn = boto.swf.layer1.Layer1(settings.aws_access_key_id, settings.aws_secret_access_key)
+        conn = helper.swf_connection(settings)
 
         try:
             response = conn.start_workflow_execution(settings.domain, workflow_id, workflow_name, workflow_version,
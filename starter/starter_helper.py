@@ -1,15 +1,37 @@
 import os
 import json
 import importlib
-import boto
+import threading
+import boto.swf.layer1
 import log
 
 
+# SWF connection of a thread which starts many workflows, see queue_workflow_starter
+THREAD_SWF = threading.local()
+
+
 class NullRequiredDataException(Exception):
     def __init__(self, message):
         self.message = message
 
 
+def swf_connection(settings):
+    "the SWF connection set for this thread, otherwise a new connection"
+    conn = getattr(THREAD_SWF, 'conn', None)
+    if conn is None:
+        conn = boto.swf.layer1.Layer1(settings.aws_access_key_id, settings.aws_secret_access_key)
+    return conn
+
+
+def thread_swf_connection(settings):
+    "the SWF connection of this thread, connected on first use, for the starters it runs"
+    conn = getattr(THREAD_SWF, 'conn', None)
+    if conn is None:
+        conn = THREAD_SWF.conn = boto.swf.layer1.Layer1(
+            settings.aws_access_key_id, settings.aws_secret_access_key)
+    return conn
+
+
 def get_starter_identity(name):
     return "starter_" + name + "." + str(os.getpid())
 
@@ -5,7 +5,10 @@ from shutil import copy
 import shutil
 import re
 import os
+import fnmatch
+import zipfile
 from mock import MagicMock
+from provider.storage_provider import ResourceInfo
 
 
 class FakeSession:
@@ -24,6 +27,12 @@ class FakeSession:
         except:
             return None
 
+    def store_values(self, mapping):
+        self.session_dict.update(mapping)
+
+    def get_values(self, keys):
+        return {key: self.get_value(key) for key in keys}
+
     @staticmethod
     def get_full_key(execution_id, key):
         return execution_id + '__' + key
@@ -153,9 +162,64 @@ class FakeStorageContext:
     def set_resource_from_string(self, resource, data, content_type=None):
         pass
 
+    def set_resource_from_stream(self, resource, stream, content_type=None, metadata=None):
+        pass
+
+    def resource_metadata(self, resource):
+        return None
+
     def list_resources(self, resource):
         return self.resources
 
+    def iter_resources(self, resource, pattern=None):
+        for name in self.resources:
+            if pattern and not fnmatch.fnmatchcase(name, pattern):
+                continue
+            yield ResourceInfo(name=name, size=None, etag=None, last_modified=None)
+
+    def get_resources_to_dir(self, resources, to_dir):
+        file_paths = []
+        for resource in resources:
+            file_path = os.path.join(to_dir, resource.split('/')[-1])
+            with open(file_path, 'wb') as open_file:
+                self.get_resource_to_file(resource, open_file)
+            file_paths.append(file_path)
+        return file_paths
+
+    def set_resources_from_dir(self, from_dir, folder, file_names=None):
+        if file_names is None:
+            file_names = sorted(os.listdir(from_dir))
+        resources = []
+        for file_name in file_names:
+            resource = folder.rstrip('/') + '/' + file_name
+            self.set_resource_from_filename(resource, os.path.join(from_dir, file_name))
+            resources.append(resource)
+        return resources
+
+    def set_resources_from_zip(self, zip_resource, folder, member_filter=None,
+                               check_names=None):
+        bucket_name, s3_key = self.get_bucket_and_key(zip_resource)
+        resources = []
+        with zipfile.ZipFile(self.dir + s3_key) as open_zip:
+            names = [name for name in open_zip.namelist() if not name.endswith('/')]
+            if member_filter:
+                names = [name for name in names if member_filter(name)]
+            if check_names:
+                check_names(names)
+            for name in names:
+                resource = folder.rstrip('/') + '/' + name
+                dest = data.ExpandArticle_files_dest_folder + '/' + resource.split('/')[-1]
+                with open(dest, 'wb') as open_file:
+                    open_file.write(open_zip.read(name))
+                resources.append(resource)
+        return resources
+
+    def copy_resources(self, resource_pairs, additional_dict_metadata=None):
+        for resource_pair in resource_pairs:
+            metadata = resource_pair[2] if len(resource_pair) > 2 else additional_dict_metadata
+            self.copy_resource(resource_pair[0], resource_pair[1], metadata)
+        return [resource_pair[1] for resource_pair in resource_pairs]
+
     def copy_resource(self, origin, destination, additional_dict_metadata=None):
         pass
 
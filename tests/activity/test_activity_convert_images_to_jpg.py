@@ -25,6 +25,22 @@ class TestConvertImagesToJPG(unittest.TestCase):
 
         self.assertEqual(self.convertimagestojpg.ACTIVITY_SUCCESS, result)
 
+    @patch.object(settings_mock, 'image_conversion_processes', 2, create=True)
+    @patch('provider.image_conversion.ConversionPipeline.run')
+    @patch('activity.activity_ConvertImagesToJPG.get_session')
+    @patch('activity.activity_ConvertImagesToJPG.storage_context')
+    @patch.object(activity_ConvertImagesToJPG, 'emit_monitor_event')
+    def test_activity_success_pipeline(self, fake_emit, fake_storage_context, fake_session,
+                                       fake_run):
+        fake_storage_context.return_value = FakeStorageContext()
+        fake_session.return_value = FakeSession(test_activity_data.session_example)
+        fake_run.return_value = 1
+        activity_data = test_activity_data.data_example_before_publish
+
+        result = self.convertimagestojpg.do_activity(activity_data)
+
+        self.assertEqual(self.convertimagestojpg.ACTIVITY_SUCCESS, result)
+        self.assertEqual(fake_run.call_args[0][1], ['elife-00353-fig1-v1.tif'])
 
     @patch('activity.activity_ConvertImagesToJPG.get_session')
     @patch('activity.activity_ConvertImagesToJPG.storage_context')
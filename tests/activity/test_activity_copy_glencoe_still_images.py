@@ -1,6 +1,8 @@
 import unittest
 from mock import patch, MagicMock
-from activity.activity_CopyGlencoeStillImages import activity_CopyGlencoeStillImages
+from activity.activity_CopyGlencoeStillImages import (
+    activity_CopyGlencoeStillImages, cdn_copy_matches, source_etag)
+from provider.storage_provider import ResourceInfo
 import tests.activity.settings_mock as settings_mock
 from tests.activity.classes_mock import FakeSession, FakeStorageContext, FakeLogger
 import tests.activity.test_activity_data as test_activity_data
@@ -258,6 +260,68 @@ class TestCopyGlencoeStillImages(unittest.TestCase):
             "http://glencoe.com/some-dir/elife-00666-media1.jpg", "12345600666")
         self.assertEqual(cdn_jpg_filename, "elife-12345600666-media1.jpg")
 
+    @patch('requests.Session.get')
+    @patch('activity.activity_CopyGlencoeStillImages.storage_context')
+    def test_store_jpgs(self, fake_storage_context, fake_get):
+        storage = MagicMock()
+        storage.iter_resources.return_value = [
+            ResourceInfo('elife-00666-media1.jpg', 3, 'abc', None),
+            ResourceInfo('elife-00666-media3.jpg', 3, 'ghi', None)]
+        storage.resource_metadata.side_effect = lambda resource: (
+            {'glencoe-etag': 'abc'} if resource.endswith('media1.jpg') else {})
+        fake_storage_context.return_value = storage
+        responses = {
+            'http://glencoe.com/elife-00666-media1.jpg': {'etag': '"abc"'},
+            'http://glencoe.com/elife-00666-media2.jpg': {'etag': '"def"'},
+            # no ETag, the same size as the CDN copy
+            'http://glencoe.com/elife-00666-media3.jpg': {'content-length': '3'},
+        }
+
+        def get(path, stream=False):
+            response = MagicMock()
+            response.status_code = 200
+            response.headers = dict(responses[path], **{'content-type': 'image/jpeg'})
+            return response
+        fake_get.side_effect = get
+        cdn_still_jpgs = self.copyglencoestillimages.store_jpgs(
+            sorted(responses.keys()), "00666")
+        self.assertEqual(cdn_still_jpgs, ["elife-00666-media1.jpg", "elife-00666-media2.jpg",
+                                          "elife-00666-media3.jpg"])
+        # one storage context, the still stored from the same Glencoe ETag is not uploaded
+        self.assertEqual(fake_storage_context.call_count, 1)
+        uploads = sorted(
+            (call[0][0].rsplit('/', 1)[1], call[1])
+            for call in storage.set_resource_from_stream.call_args_list)
+        self.assertEqual(uploads, [
+            ('elife-00666-media2.jpg',
+             {'content_type': 'image/jpeg', 'metadata': {'glencoe-etag': 'def'}}),
+            ('elife-00666-media3.jpg', {'content_type': 'image/jpeg', 'metadata': None}),
+        ])
+        # metadata is only requested for stills already on the CDN with a Glencoe ETag
+        self.assertEqual(storage.resource_metadata.call_count, 1)
+
+    @patch('requests.get')
+    def test_store_file_error_status(self, fake_requests_get):
+        fake_requests_get.return_value = MagicMock()
+        fake_requests_get.return_value.status_code = 404
+        self.assertRaises(
+            RuntimeError, self.copyglencoestillimages.store_file,
+            "http://glencoe.com/some-dir/elife-00666-media1.jpg", "00666", FakeStorageContext())
+
+    def test_cdn_copy_matches(self):
+        metadata = {'glencoe-etag': 'abc'}
+        self.assertFalse(cdn_copy_matches('abc', None))
+        self.assertTrue(cdn_copy_matches('abc', metadata))
+        self.assertFalse(cdn_copy_matches('def', metadata))
+        self.assertFalse(cdn_copy_matches('abc', {}))
+        self.assertFalse(cdn_copy_matches(None, metadata))
+
+    def test_source_etag(self):
+        self.assertEqual(source_etag({'etag': '"abc"'}), 'abc')
+        # weak ETags are not content derived
+        self.assertIsNone(source_etag({'etag': 'W/"abc"'}))
+        self.assertIsNone(source_etag({'content-length': '3'}))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -41,7 +41,7 @@ class TestDepositCrossref(unittest.TestCase):
         shutil.copy(source_doc, dest_doc)
 
     @patch.object(activity_module.email_provider, 'smtp_connect')
-    @patch('requests.post')
+    @patch('requests.Session.post')
     @patch.object(FakeStorageContext, 'list_resources')
     @patch('provider.crossref.storage_context')
     @data(
@@ -46,7 +46,7 @@ class TestDepositCrossrefPeerReview(unittest.TestCase):
     @patch.object(activity_module, 'check_vor_is_published')
     @patch.object(activity_module.email_provider, 'smtp_connect')
     @patch('requests.head')
-    @patch('requests.post')
+    @patch('requests.Session.post')
     @patch.object(FakeStorageContext, 'list_resources')
     @patch('provider.crossref.storage_context')
     @data(
@@ -128,7 +128,7 @@ class TestDepositCrossrefPeerReview(unittest.TestCase):
     @patch.object(activity_module, 'check_vor_is_published')
     @patch.object(activity_module.email_provider, 'smtp_connect')
     @patch('requests.head')
-    @patch('requests.post')
+    @patch('requests.Session.post')
     @patch.object(FakeStorageContext, 'list_resources')
     @patch('provider.crossref.storage_context')
     def test_do_activity_crossref_exception(self, fake_storage_context, fake_list_resources,
@@ -152,7 +152,7 @@ class TestDepositCrossrefPeerReview(unittest.TestCase):
 
     @patch.object(bigquery, 'get_client')
     @patch.object(activity_module.email_provider, 'smtp_connect')
-    @patch('requests.post')
+    @patch('requests.Session.post')
     @patch.object(FakeStorageContext, 'list_resources')
     @patch('provider.crossref.storage_context')
     def test_do_activity_no_good_one_bad(self, fake_storage_context, fake_list_resources,
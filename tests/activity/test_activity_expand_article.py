@@ -47,6 +47,26 @@ class TestExpandArticle(unittest.TestCase):
             self.assertEqual(testdata.ExpandArticle_files_dest_bytes_expected[index]['bytes'], statinfo.st_size)
             index += 1
 
+    @patch.object(settings_mock, 'expand_article_stream_zip', True, create=True)
+    @patch('activity.activity_ExpandArticle.get_session')
+    @patch('activity.activity_ExpandArticle.storage_context')
+    def test_do_activity_stream_zip(self, mock_storage_context, mock_session):
+        mock_storage_context.return_value = FakeStorageContext()
+        mock_session.return_value = FakeSession(testdata.session_example)
+
+        self.expandarticle.emit_monitor_event = mock.MagicMock()
+        self.expandarticle.logger = mock.MagicMock()
+
+        success = self.expandarticle.do_activity(testdata.ExpandArticle_data)
+        self.assertEqual(True, success)
+
+        files = sorted(file_name for file_name in os.listdir(testdata.ExpandArticle_files_dest_folder)
+                       if file_name != '.gitkeep')
+        self.assertEqual(files, testdata.ExpandArticle_files_dest_expected)
+        for expected in testdata.ExpandArticle_files_dest_bytes_expected:
+            statinfo = os.stat(testdata.ExpandArticle_files_dest_folder + '/' + expected['name'])
+            self.assertEqual(expected['bytes'], statinfo.st_size)
+
     @patch('activity.activity_ExpandArticle.get_session')
     @patch('activity.activity_ExpandArticle.storage_context')
     def test_do_activity_invalid_articleid(self, mock_storage_context, mock_session):
@@ -75,6 +95,12 @@ class TestExpandArticle(unittest.TestCase):
         success = self.expandarticle.do_activity(testdata.ExpandArticle_data_invalid_status)
         self.assertEqual(self.expandarticle.ACTIVITY_PERMANENT_FAILURE, success)
 
+    def test_upload_filename(self):
+        self.assertTrue(self.expandarticle.upload_filename('elife-12345-vor.xml'))
+        self.assertFalse(self.expandarticle.upload_filename('.DS_Store'))
+        self.assertFalse(self.expandarticle.upload_filename('__MACOSX/elife-12345-vor.xml'))
+        self.assertFalse(self.expandarticle.upload_filename('folder/elife-12345-vor.xml'))
+
     def test_check_filenames(self):
         self.expandarticle.check_filenames(['elife-12345-vor.xml'])
         self.expandarticle.check_filenames(['elife-12345-vor.xml', 'elife-12345-vor.pdf'])
@@ -112,10 +112,9 @@ class TestFTPArticle(unittest.TestCase):
         doi_id = 19405
         # create activity directories
         self.activity.make_activity_directories()
-        zip_renamed_files_dir = self.activity.directories.get("RENAME_DIR")
         pmc_zip_output_dir = self.activity.directories.get("INPUT_DIR")
         expected_pmc_zip_file = os.path.join(pmc_zip_output_dir, 'elife-05-19405.zip')
-        expected_article_xml_file = os.path.join(zip_renamed_files_dir, 'elife-19405.xml')
+        expected_article_xml_file = 'elife-19405.xml'
         expected_article_xml_string = b'elife-19405.pdf'
         expected_pmc_zip_file_contents = ['elife-19405.pdf', 'elife-19405.xml',
                                           'elife-19405-inf1.tif', 'elife-19405-fig1.tif']
@@ -126,13 +125,12 @@ class TestFTPArticle(unittest.TestCase):
         self.activity.repackage_archive_zip_to_pmc_zip(doi_id)
         # now can check the results
         self.assertTrue(os.path.exists(expected_pmc_zip_file))
-        self.assertTrue(os.path.exists(expected_article_xml_file))
-        with open(expected_article_xml_file, 'rb') as open_file:
-            # check for a renamed file in the XML contents
-            self.assertTrue(expected_article_xml_string in open_file.read())
         with zipfile.ZipFile(expected_pmc_zip_file) as zip_file:
             # check pmc zip file contents
             self.assertEqual(sorted(zip_file.namelist()), sorted(expected_pmc_zip_file_contents))
+            # check for a renamed file in the XML contents
+            self.assertTrue(expected_article_xml_string in zip_file.read(expected_article_xml_file))
+            self.assertIsNone(zip_file.testzip())
 
 
 @ddt
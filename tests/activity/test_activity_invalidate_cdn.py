@@ -35,5 +35,17 @@ class TestInvalidateCdn(unittest.TestCase):
         result = self.invalidatecdn.do_activity(activity_data)
         self.assertEqual(result, self.invalidatecdn.ACTIVITY_PERMANENT_FAILURE)
 
+    @patch('activity.activity_InvalidateCdn.get_session')
+    @patch('provider.fastly_provider.purge_queue')
+    @patch('provider.fastly_provider.purge')
+    @patch.object(activity_InvalidateCdn, 'emit_monitor_event')
+    @patch.object(settings_mock, 'fastly_purge_queue', True, create=True)
+    def test_invalidation_queued(self, fake_emit, purge_mock, fake_purge_queue, fake_session):
+        fake_session.return_value = FakeSession(test_activity_data.session_example)
+        result = self.invalidatecdn.do_activity(activity_data)
+        self.assertEqual(result, self.invalidatecdn.ACTIVITY_SUCCESS)
+        self.assertFalse(purge_mock.called)
+        self.assertTrue(fake_purge_queue.return_value.add.called)
+
 if __name__ == '__main__':
     unittest.main()
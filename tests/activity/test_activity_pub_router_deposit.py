@@ -33,7 +33,7 @@ class TestPubRouterDeposit(unittest.TestCase):
             settings_mock, FakeLogger(), None, None, None)
 
     @patch.object(activity_module.email_provider, 'smtp_connect')
-    @patch('provider.lax_provider.article_versions')
+    @patch('provider.lax_provider.LaxClient.article_versions')
     @patch.object(activity_PubRouterDeposit, 'clean_outbox')
     @patch.object(activity_PubRouterDeposit, 'start_ftp_article_workflow')
     @patch.object(activity_PubRouterDeposit, 'does_source_zip_exist_from_s3')
@@ -62,7 +62,7 @@ class TestPubRouterDeposit(unittest.TestCase):
 
     @patch.object(activity_module.email_provider, 'smtp_connect')
     @patch('provider.lax_provider.was_ever_poa')
-    @patch('provider.lax_provider.article_versions')
+    @patch('provider.lax_provider.LaxClient.article_versions')
     @patch.object(activity_PubRouterDeposit, 'clean_outbox')
     @patch.object(activity_PubRouterDeposit, 'start_pmc_deposit_workflow')
     @patch.object(activity_PubRouterDeposit, 'archive_zip_file_name')
@@ -146,6 +146,55 @@ class TestPubRouterDeposit(unittest.TestCase):
         self.assertIsNotNone(self.pubrouterdeposit.get_outbox_folder(workflow))
         self.assertIsNotNone(self.pubrouterdeposit.get_published_folder(workflow))
 
+    @patch('activity.activity_PubRouterDeposit.PublishedIndex')
+    def test_update_published_index(self, fake_index):
+        self.pubrouterdeposit.published_folder = 'cengage/published/'
+        self.pubrouterdeposit.update_published_index([
+            'cengage/published/20190101/elife00013.xml',
+            'cengage/published/20190101/elife_poa_e09169.xml',
+            'cengage/published/20190101/elife-09169-v1.zip'])
+        fake_index.assert_called_with(
+            settings_mock, settings_mock.poa_packaging_bucket, 'cengage/published/')
+        fake_index.return_value.add.assert_called_with([13, 9169])
+
+    @patch('activity.activity_PubRouterDeposit.PublishedIndex')
+    def test_update_published_index_no_xml(self, fake_index):
+        self.pubrouterdeposit.update_published_index([])
+        self.assertFalse(fake_index.called)
+
+
+    @patch('activity.activity_PubRouterDeposit.S3Connection')
+    @patch.object(s3lib, 'get_s3_key_names_from_bucket')
+    def test_does_source_zip_exist_from_s3(self, fake_key_names, fake_connection):
+        fake_key_names.return_value = [
+            'pmc/zip/elife-01-00013.zip', 'pmc/zip/elife-01-00013.r1.zip']
+        self.assertTrue(self.pubrouterdeposit.does_source_zip_exist_from_s3('00013'))
+        self.assertFalse(self.pubrouterdeposit.does_source_zip_exist_from_s3(9169))
+        # the folder is listed once for all the articles
+        self.assertEqual(fake_key_names.call_count, 1)
+
+    @patch.object(activity_PubRouterDeposit, 'does_source_zip_exist_from_s3')
+    @patch('provider.lax_provider.LaxClient.article_versions')
+    def test_approve_articles(self, fake_article_versions, fake_zip_exists):
+        poa_only = [{'status': 'poa', 'version': 1}]
+        fake_article_versions.side_effect = lambda article_id, auth=False: {
+            '00013': (200, poa_only),
+            '09169': (404, None),
+        }.get(article_id)
+        fake_zip_exists.return_value = True
+        articles = []
+        for doi_id in ['00013', '09169']:
+            article_object = article()
+            article_object.doi = '10.7554/eLife.' + doi_id
+            article_object.doi_id = doi_id
+            article_object.is_poa = True
+            articles.append(article_object)
+        approved = self.pubrouterdeposit.approve_articles(articles, 'CLOCKSS')
+        self.assertEqual([article_object.doi_id for article_object in approved], ['00013'])
+        self.assertTrue(articles[0].was_ever_poa)
+        self.assertIsNone(articles[1].was_ever_poa)
+        self.assertEqual(fake_article_versions.call_count, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -2,6 +2,7 @@ import unittest
 from mock import patch, MagicMock
 from ddt import ddt, data
 import tests.activity.settings_mock as settings_mock
+import provider.iiif as iiif
 from tests.activity.classes_mock import FakeSession
 from activity.activity_VerifyImageServer import activity_VerifyImageServer
 import tests.activity.test_activity_data as test_data
@@ -70,3 +71,12 @@ class TestVerifyImageServer(unittest.TestCase):
         # Then
         self.assertEqual(result, self.verifyimageserver.ACTIVITY_PERMANENT_FAILURE)
 
+    @patch('provider.iiif.EndpointVerifier.try_endpoint')
+    def test_retrieve_endpoints_check(self, fake_try_endpoint):
+        fake_try_endpoint.side_effect = lambda endpoint: iiif.EndpointResult(
+            endpoint.endswith('fig1'), endpoint, 200, 0.1, 1)
+        self.verifyimageserver.logger = MagicMock()
+        results = self.verifyimageserver.retrieve_endpoints_check(
+            ['fig1', 'fig2'], '00353/{article_fig}')
+        self.assertEqual([(result[0], result[1]) for result in results],
+                         [(True, '00353/fig1'), (False, '00353/fig2')])
@@ -27,9 +27,10 @@ class TestVerifyLaxResponse(unittest.TestCase):
             "message": None,
             "update_date": "2012-12-13T00:00:00Z"
         })
+    @patch('activity.activity_VerifyLaxResponse.invalidate_article')
     @patch('activity.activity_VerifyLaxResponse.get_session')
     @patch.object(activity_VerifyLaxResponse, 'emit_monitor_event')
-    def test_do_activity(self, data, fake_emit_monitor, fake_get_session):
+    def test_do_activity(self, data, fake_emit_monitor, fake_get_session, fake_invalidate):
         fake_emit_monitor.side_effect = fake_emit_monitor_event
         fake_session = FakeSession({})
         fake_get_session.return_value = fake_session
@@ -44,6 +45,7 @@ class TestVerifyLaxResponse(unittest.TestCase):
                                              " Article: " + data["article_id"])
         self.assertEqual(result, self.verifylaxresponse.ACTIVITY_SUCCESS)
         self.assertEqual(fake_session.get_value('published'), False)
+        fake_invalidate.assert_called_with(data["article_id"], settings_mock)
 
 
     @data({
@@ -225,3 +225,31 @@ class TestProviderArticle(unittest.TestCase):
 
 if __name__ == '__main__':
     unittest.main()
+
+    @patch('provider.article.PublishedIndex')
+    def test_was_published_doi_ids_from_index(self, fake_index):
+        fake_index.return_value.load.return_value = {2419, 2104}
+        fake_index.return_value.doi_ids = {2419, 2104}
+        self.assertEqual(self.articleprovider.was_published_doi_ids('HEFCE'), [2104, 2419])
+        fake_index.assert_called_with(
+            settings_mock, settings_mock.poa_packaging_bucket, 'pub_router/published/')
+        self.assertFalse(fake_index.return_value.rebuild.called)
+
+    @patch.object(article, 'get_s3_key_names_from_bucket')
+    @patch.object(article, 'get_folder_names_from_bucket')
+    @patch('provider.article.PublishedIndex')
+    def test_was_published_doi_ids_rebuild_index(self, fake_index, fake_folder_names,
+                                                 fake_key_names):
+        fake_index.return_value.load.return_value = None
+        fake_folder_names.return_value = ['pub_router/published/20140508/']
+        fake_key_names.return_value = [
+            'pub_router/published/20140508/elife02419.xml',
+            'pub_router/published/20140508/elife_poa_e02444v2.xml']
+        self.assertEqual(self.articleprovider.was_published_doi_ids('HEFCE'), [2419, 2444])
+        fake_index.return_value.rebuild.assert_called_with([2419, 2444])
+
+    def test_doi_ids_from_s3_key_names(self):
+        self.assertEqual(self.articleprovider.doi_ids_from_s3_key_names([
+            'cengage/published/20140508/elife_poa_e02444v2.xml',
+            'cengage/published/20140509/elife02444.xml',
+            'cengage/published/20140509/elife02104.xml']), [2104, 2444])
@@ -2,6 +2,7 @@ import unittest
 import os
 import zipfile
 from collections import OrderedDict
+from mock import MagicMock
 from ddt import ddt, data, unpack
 from testfixtures import tempdir
 from testfixtures import TempDirectory
@@ -137,6 +138,71 @@ class TestArticleProcessing(unittest.TestCase):
         article_processing.rename_files_remove_version_number(files_dir_path, output_dir_path)
 
 
+    def write_zip(self, zip_file_name, members, compression=zipfile.ZIP_DEFLATED):
+        zip_file_path = os.path.join(self.directory.path, zip_file_name)
+        with zipfile.ZipFile(zip_file_path, 'w', compression) as zip_file:
+            for name, member_data in members:
+                zip_file.writestr(name, member_data)
+        return zip_file_path
+
+    def test_zip_file_names(self):
+        zip_file_path = self.write_zip('in.zip', [
+            ('elife-00353-v1.xml', b'<article/>'), ('folder/elife-00353-fig1-v1.tif', b'tif')])
+        self.assertEqual(article_processing.zip_file_names(zip_file_path), ['elife-00353-v1.xml'])
+
+    def test_repackage_zip(self):
+        members = [
+            ('elife-00353-v1.xml', b'<article>elife-00353-v1.pdf</article>'),
+            ('elife-00353-v1.pdf', b'pdf' * 1000),
+            ('elife-00353-fig1-v1.tif', b'tif' * 1000),
+            ('elife-00353-supp1-v1.docx', b'docx')]
+        zip_file_path = self.write_zip('in.zip', members)
+        stored_zip_file_path = self.write_zip(
+            'stored.zip', [('elife-00353-v1.pdf', b'new pdf')], zipfile.ZIP_STORED)
+        new_zip_file_path = os.path.join(self.directory.path, 'out.zip')
+        file_name_map = article_processing.stripped_file_name_map(
+            [name for name, data in members])
+        names = article_processing.repackage_zip(
+            [zip_file_path, stored_zip_file_path], new_zip_file_path,
+            member_filter=lambda name: not name.endswith('.docx'),
+            file_name_map=file_name_map,
+            rewrite_members={
+                'elife-00353-v1.xml': lambda data: data.replace(b'-v1.pdf', b'.pdf')})
+        self.assertEqual(names, ['elife-00353.xml', 'elife-00353.pdf', 'elife-00353-fig1.tif'])
+        with zipfile.ZipFile(new_zip_file_path) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(zip_file.namelist(), names)
+            self.assertEqual(zip_file.read('elife-00353.xml'),
+                             b'<article>elife-00353.pdf</article>')
+            # the member from the later zip is used, copied with its compression
+            self.assertEqual(zip_file.read('elife-00353.pdf'), b'new pdf')
+            self.assertEqual(zip_file.getinfo('elife-00353.pdf').compress_type,
+                             zipfile.ZIP_STORED)
+            self.assertEqual(zip_file.read('elife-00353-fig1.tif'), b'tif' * 1000)
+            self.assertEqual(zip_file.getinfo('elife-00353-fig1.tif').compress_type,
+                             zipfile.ZIP_DEFLATED)
+
+    def test_copy_zip_member_raw_data_descriptor(self):
+        # members written from a stream have their sizes in a data descriptor
+        zip_file_path = os.path.join(self.directory.path, 'in.zip')
+        with open(zip_file_path, 'wb') as open_file:
+            # an unseekable stream
+            stream = MagicMock(spec=['write', 'flush'])
+            stream.write.side_effect = open_file.write
+            with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                with zip_file.open('elife-00353-v1.xml', 'w') as member:
+                    member.write(b'<article/>' * 100)
+        new_zip_file_path = os.path.join(self.directory.path, 'out.zip')
+        with zipfile.ZipFile(zip_file_path) as source_zip:
+            info = source_zip.getinfo('elife-00353-v1.xml')
+            self.assertTrue(info.flag_bits & article_processing.DATA_DESCRIPTOR_FLAG)
+            with zipfile.ZipFile(new_zip_file_path, 'w') as new_zip:
+                article_processing.copy_zip_member_raw(
+                    source_zip, info, new_zip, 'elife-00353.xml')
+        with zipfile.ZipFile(new_zip_file_path) as zip_file:
+            self.assertIsNone(zip_file.testzip())
+            self.assertEqual(zip_file.read('elife-00353.xml'), b'<article/>' * 100)
+
     @unpack
     @data(
         ('elife', '1', '7', None, 'elife-01-00007.zip'),
@@ -56,6 +56,24 @@ class TestCrossrefProvider(unittest.TestCase):
         self.assertEqual(len(article_object_map), 1)
         self.assertEqual(len(bad_xml_files), 1)
 
+    def test_article_xml_list_parse_processes(self):
+        article_xml_files = [self.good_xml_file, self.bad_xml_file, self.good_xml_file]
+        bad_xml_files = []
+        article_object_map = crossref.article_xml_list_parse(
+            article_xml_files, bad_xml_files, self.directory.path, processes=2)
+        self.assertEqual(list(article_object_map.keys()), [self.good_xml_file])
+        self.assertEqual(article_object_map[self.good_xml_file].doi, '10.7554/eLife.18753')
+        self.assertEqual(bad_xml_files, [self.bad_xml_file])
+
+    def test_map_in_processes(self):
+        self.assertEqual(crossref.map_in_processes(abs, [-1, 2, -3], processes=2), [1, 2, 3])
+
+    def test_map_in_processes_broken_pool(self):
+        # a worker process that dies fails its items instead of raising
+        self.assertEqual(
+            crossref.map_in_processes(os._exit, [1, 1], processes=2, failed=False),
+            [False, False])
+
     @patch('provider.lax_provider.article_versions')
     def test_set_article_pub_date(self, mock_article_versions):
         """test for when the date is missing and uses lax data"""
@@ -166,7 +184,7 @@ class TestCrossrefProvider(unittest.TestCase):
             settings_mock.crossref_login_id, settings_mock.crossref_login_passwd)
         self.assertEqual(payload, expected)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_upload_files_to_endpoint(self, fake_request):
         status_code = 200
         xml_files = [self.good_xml_file]
@@ -180,7 +198,7 @@ class TestCrossrefProvider(unittest.TestCase):
         self.assertEqual(status, expected_status)
         self.assertEqual(http_detail_list, expected_detail)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_upload_files_to_endpoint_failure(self, fake_request):
         status_code = 500
         xml_files = [self.good_xml_file]
@@ -194,6 +212,23 @@ class TestCrossrefProvider(unittest.TestCase):
         self.assertEqual(status, expected_status)
         self.assertEqual(http_detail_list, expected_detail)
 
+    @patch('requests.Session.post')
+    def test_upload_files_to_endpoint_threads(self, fake_request):
+        xml_files = [self.good_xml_file, self.bad_xml_file, self.good_xml_file]
+        fake_request.side_effect = [FakeResponse(200), FakeResponse(500), FakeResponse(200)]
+        fake_logger = FakeLogger()
+        status, http_detail_list = crossref.upload_files_to_endpoint(
+            '', '', xml_files, threads=1, logger=fake_logger)
+        self.assertEqual(status, False)
+        expected_detail = (
+            expected_http_detail(self.good_xml_file, 200) +
+            expected_http_detail(self.bad_xml_file, 500) +
+            expected_http_detail(self.good_xml_file, 200))
+        self.assertEqual(http_detail_list, expected_detail)
+        self.assertEqual(fake_request.call_count, 3)
+        self.assertTrue(fake_logger.loginfo[-1].startswith(
+            'Crossref upload of %s status 200 took ' % self.good_xml_file))
+
     def test_generate_crossref_xml_to_disk(self):
         articles = crossref.parse_article_xml([self.good_xml_file], self.directory.path)
         article_object_map = OrderedDict([
@@ -209,6 +244,23 @@ class TestCrossrefProvider(unittest.TestCase):
         self.assertEqual(len(good_xml_files), 1)
         self.assertEqual(len(bad_xml_files), 1)
 
+    def test_generate_crossref_xml_to_disk_processes(self):
+        articles = crossref.parse_article_xml([self.good_xml_file], self.directory.path)
+        article_object_map = OrderedDict([
+            ('fake_file_will_raise_exception.xml', None),
+            (self.good_xml_file, articles[0])
+        ])
+        good_xml_files = []
+        bad_xml_files = []
+        crossref_config = crossref.elifecrossref_config(settings_mock)
+        result = crossref.generate_crossref_xml_to_disk(
+            article_object_map, crossref_config, good_xml_files, bad_xml_files, processes=2)
+        self.assertTrue(result)
+        self.assertEqual(good_xml_files, [self.good_xml_file])
+        self.assertEqual(bad_xml_files, ['fake_file_will_raise_exception.xml'])
+        # the XML was written to the directory by the worker process
+        self.assertEqual(len(os.listdir(self.directory.path)), 1)
+
     def test_get_to_folder_name(self):
         folder_name = ''
         date_stamp = ''
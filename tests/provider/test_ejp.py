@@ -3,7 +3,8 @@
 import unittest
 import json
 import os
-from provider.ejp import EJP
+from provider import ejp
+from provider.ejp import EJP, EJPDataStore
 import tests.settings_mock as settings_mock
 from testfixtures import tempdir
 from testfixtures import TempDirectory
@@ -15,6 +16,8 @@ from ddt import ddt, data, unpack
 class TestProviderEJP(unittest.TestCase):
 
     def setUp(self):
+        ejp.DATA_STORES = {}
+        ejp.BUCKET_FILE_LISTS = {}
         self.directory = TempDirectory()
         self.ejp = EJP(settings_mock, tmp_dir=self.directory.path)
         self.author_column_headings = [
@@ -156,5 +159,69 @@ class TestProviderEJP(unittest.TestCase):
         self.assertEqual(s3_key_name, expected_s3_key_name)
 
 
+    @patch('provider.ejp.EJP.ejp_bucket_file_list')
+    def test_find_latest_s3_file_name_cached_list(self, fake_ejp_bucket_file_list):
+        bucket_list_file_new = os.path.join("tests", "test_data", "ejp_bucket_list_new.json")
+        with open(bucket_list_file_new, 'r') as open_file:
+            fake_ejp_bucket_file_list.return_value = json.loads(open_file.read())
+        with patch('time.time') as fake_time:
+            fake_time.return_value = 1000
+            self.ejp.find_latest_s3_file_name('author')
+            self.ejp.find_latest_s3_file_name('editor')
+            # the bucket is listed once for both file types
+            self.assertEqual(fake_ejp_bucket_file_list.call_count, 1)
+            fake_time.return_value = 1000 + ejp.BUCKET_FILE_LIST_TTL
+            self.ejp.find_latest_s3_file_name('author')
+            self.assertEqual(fake_ejp_bucket_file_list.call_count, 2)
+
+    def fake_s3key(self, etag, csv_file):
+        s3_key = MagicMock()
+        s3_key.etag = etag
+        with open(csv_file, 'rb') as open_file:
+            s3_key.get_contents_as_string.return_value = open_file.read()
+        return s3_key
+
+    @patch.object(EJP, 'get_s3key')
+    @patch.object(EJP, 'find_latest_s3_file_name')
+    def test_get_authors_cached_by_etag(self, fake_find_latest, fake_get_s3key):
+        author_csv_file = os.path.join("tests", "test_data", "ejp_author_file.csv")
+        fake_find_latest.return_value = 'authors.csv'
+        s3_key = self.fake_s3key('"one"', author_csv_file)
+        fake_get_s3key.return_value = s3_key
+        (column_headings, authors) = self.ejp.get_authors(3, True)
+        self.assertEqual(column_headings, self.author_column_headings)
+        self.assertEqual(authors, [
+            ['3', '3', 'Author', 'Three', 'Corresponding Author', ' ', 'author03@example.com']])
+        # another EJP object in the same process reuses the parsed file
+        (column_headings, authors) = EJP(settings_mock, self.directory.path).get_authors(13)
+        self.assertEqual(len(authors), 4)
+        self.assertEqual(s3_key.get_contents_as_string.call_count, 1)
+        # a new ETag is downloaded and parsed again
+        new_s3_key = self.fake_s3key('"two"', author_csv_file)
+        fake_get_s3key.return_value = new_s3_key
+        self.ejp.get_authors(3)
+        self.assertEqual(new_s3_key.get_contents_as_string.call_count, 1)
+
+    @patch.object(EJP, 'get_s3key')
+    @patch.object(EJP, 'find_latest_s3_file_name')
+    def test_get_editors_cached_by_etag(self, fake_find_latest, fake_get_s3key):
+        editor_csv_file = os.path.join("tests", "test_data", "ejp_editor_file.csv")
+        fake_find_latest.return_value = 'editors.csv'
+        s3_key = self.fake_s3key('"one"', editor_csv_file)
+        fake_get_s3key.return_value = s3_key
+        self.assertEqual(self.ejp.get_editors(3)[1], [['3', 'Editor', 'One', 'ed_one@example.com']])
+        self.assertEqual(self.ejp.get_editors(13)[1], [['13', 'Editor', 'Uno', 'ed_uno@example.com']])
+        self.assertEqual(s3_key.get_contents_as_string.call_count, 1)
+
+    def test_data_store(self):
+        rows = [['3', '1', 'Corresponding Author', ' '], ['x'], ['03', '2', 'Author', '1']]
+        store = EJPDataStore(
+            ['ms_no'], rows, corresponding=lambda fields: fields[2:3] == ['Corresponding Author'])
+        self.assertEqual(store.get(3), [rows[0], rows[2]])
+        self.assertEqual(store.get('00003', True), [rows[0]])
+        self.assertEqual(store.get(), rows)
+        self.assertIsNone(store.get(666))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,9 +2,10 @@ import unittest
 import json
 from mock import patch
 from provider.utils import unicode_encode
-from provider.execution_context import S3Session
+from provider.execution_context import S3Session, RedisSession
 from tests.activity.classes_mock import FakeS3Connection
 from tests import settings_mock
+from tests.activity import settings_mock as activity_settings_mock
 
 
 class TestS3Session(unittest.TestCase):
@@ -22,5 +23,74 @@ class TestS3Session(unittest.TestCase):
         self.assertEqual(s3_session_object.get_value(None), expected)
 
 
+class FakeRedis:
+    "hashes in a dict, counting the round trips"
+    def __init__(self, connection_pool=None):
+        self.connection_pool = connection_pool
+        self.hashes = {}
+        self.expires = {}
+        self.round_trips = 0
+        self.commands = []
+
+    def hmget(self, name, keys):
+        self.round_trips += 1
+        return [self.hashes.get(name, {}).get(key) for key in keys]
+
+    def hgetall(self, name):
+        self.round_trips += 1
+        return {key.encode('utf8'): value for key, value in self.hashes.get(name, {}).items()}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    def hset(self, name, key, value):
+        self.commands.append(lambda: self.hashes.setdefault(name, {}).__setitem__(key, value))
+
+    def expire(self, name, seconds):
+        self.commands.append(lambda: self.expires.__setitem__(name, seconds))
+
+    def execute(self):
+        self.round_trips += 1
+        for command in self.commands:
+            command()
+        self.commands = []
+
+
+@patch('provider.execution_context.redis.StrictRedis', FakeRedis)
+class TestRedisSession(unittest.TestCase):
+
+    def test_connection_pool_shared(self):
+        first = RedisSession(activity_settings_mock, {}, 'run')
+        second = RedisSession(activity_settings_mock, {}, 'other_run')
+        self.assertIs(first.r.connection_pool, second.r.connection_pool)
+
+    def test_store_values(self):
+        session = RedisSession(activity_settings_mock, {}, 'run')
+        session.store_values({'article_id': '00353', 'version': '1'})
+        self.assertEqual(session.r.round_trips, 1)
+        self.assertEqual(session.r.hashes['run'], {'article_id': '"00353"', 'version': '"1"'})
+        self.assertEqual(session.r.expires['run'], 86400)
+
+    def test_get_values(self):
+        session = RedisSession(activity_settings_mock, {'run': 'run', 'status': 'vor'}, 'run')
+        session.store_values({'article_id': '00353', 'status': 'poa'})
+        values = session.get_values(['article_id', 'status', 'run', 'version'])
+        self.assertEqual(values, {'article_id': '00353', 'status': 'poa', 'run': 'run',
+                                  'version': None})
+        self.assertEqual(session.r.round_trips, 2)
+        self.assertEqual(session.get_value('article_id'), '00353')
+
+    @patch.object(activity_settings_mock, 'redis_session_snapshot', True, create=True)
+    def test_get_values_snapshot(self):
+        session = RedisSession(activity_settings_mock, {}, 'run')
+        session.r.hashes['run'] = {'article_id': '"00353"'}
+        self.assertEqual(session.get_value('article_id'), '00353')
+        self.assertEqual(session.get_value('version'), None)
+        session.store_value('version', '1')
+        self.assertEqual(session.get_value('version'), '1')
+        # one read of the session, one write
+        self.assertEqual(session.r.round_trips, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
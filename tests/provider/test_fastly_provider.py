@@ -1,43 +1,182 @@
+import threading
 import unittest
-from mock import mock, patch
+from mock import mock, patch, MagicMock
 from provider import fastly_provider
 from tests import settings_mock
 from requests.models import Response
-from requests.exceptions import HTTPError
+from requests.exceptions import HTTPError, Timeout
 
 class TestFastlyProvider(unittest.TestCase):
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_purge(self, post_mock):
         self._allow_call(post_mock)
         fastly_provider.purge('10627', '1', settings_mock)
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
     def test_purge_various_keys(self, post_mock):
         self._allow_call(post_mock)
         fastly_provider.purge('10627', '1', settings_mock)
+        # one bulk request for the service with all the keys
         self.assertEqual(
-            [c[1][0] for c in post_mock.mock_calls],
+            [(c[1][0], c[2]['json']) for c in post_mock.mock_calls],
             [
-                'https://api.fastly.com/service/3M35rb7puabccOLrFFxy2/purge/article/10627v1',
-                'https://api.fastly.com/service/3M35rb7puabccOLrFFxy2/purge/article/10627/videos',
-                'https://api.fastly.com/service/3M35rb7puabccOLrFFxy2/purge/digest/10627',
+                ('https://api.fastly.com/service/3M35rb7puabccOLrFFxy2/purge',
+                 {'surrogate_keys': [
+                     'article/10627v1',
+                     'article/10627/videos',
+                     'digest/10627',
+                 ]}),
             ]
         )
+        self.assertEqual(post_mock.mock_calls[0][2]['headers']['Fastly-Soft-Purge'], '1')
 
-    @patch('requests.post')
+    @patch('requests.Session.post')
+    @patch.object(settings_mock, 'fastly_service_ids', ['service1', 'service2'])
+    def test_purge_services(self, post_mock):
+        self._allow_call(post_mock)
+        responses = fastly_provider.purge('10627', '1', settings_mock)
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(
+            sorted([c[1][0] for c in post_mock.mock_calls]),
+            [
+                'https://api.fastly.com/service/service1/purge',
+                'https://api.fastly.com/service/service2/purge',
+            ]
+        )
+
+    @patch('requests.Session.post')
+    def test_purge_keys_chunks(self, post_mock):
+        self._allow_call(post_mock)
+        keys = ['digest/%05d' % i for i in range(fastly_provider.BULK_PURGE_MAX_KEYS + 1)]
+        responses = fastly_provider.FastlyApi('key').purge_keys(keys, 'service1')
+        self.assertEqual(len(responses), 2)
+        self.assertEqual(
+            [len(c[2]['json']['surrogate_keys']) for c in post_mock.mock_calls],
+            [fastly_provider.BULK_PURGE_MAX_KEYS, 1])
+
+    @patch('requests.Session.post')
     def test_purge_return_responses(self, post_mock):
         self._allow_call(post_mock)
         responses = fastly_provider.purge('10627', '1', settings_mock)
         self.assertIsInstance(responses[0], Response)
         self.assertEqual(200, responses[0].status_code)
 
-    @patch('requests.post')
-    def test_purge_failure(self, post_mock):
+    @patch('time.sleep')
+    @patch('requests.Session.post')
+    def test_purge_retry(self, post_mock, fake_sleep):
+        post_mock.side_effect = [self._response(429), self._response(503), self._response(200)]
+        responses = fastly_provider.purge('10627', '1', settings_mock)
+        self.assertEqual(200, responses[0].status_code)
+        self.assertEqual(post_mock.call_count, 3)
+        self.assertEqual([c[1][0] for c in fake_sleep.mock_calls], [1, 2])
+
+    @patch('time.sleep')
+    @patch('requests.Session.post')
+    def test_purge_failure(self, post_mock, fake_sleep):
         self._allow_call(post_mock, status_code=500)
         self.assertRaises(HTTPError, lambda: fastly_provider.purge('10627', '1', settings_mock))
+        self.assertEqual(post_mock.call_count, fastly_provider.PURGE_RETRIES + 1)
 
-    def _allow_call(self, post_mock, status_code=200):
+    @patch('time.sleep')
+    @patch('requests.Session.post')
+    def test_purge_retry_timeout(self, post_mock, fake_sleep):
+        post_mock.side_effect = [Timeout(), self._response(200)]
+        responses = fastly_provider.purge('10627', '1', settings_mock)
+        self.assertEqual(200, responses[0].status_code)
+        self.assertEqual(post_mock.call_count, 2)
+
+    @patch('requests.Session.post')
+    def test_purge_client_error_not_retried(self, post_mock):
+        self._allow_call(post_mock, status_code=401)
+        self.assertRaises(HTTPError, lambda: fastly_provider.purge('10627', '1', settings_mock))
+        self.assertEqual(post_mock.call_count, 1)
+
+    def _response(self, status_code):
         response = Response()
         response.status_code = status_code
-        post_mock.return_value = response
+        return response
+
+    def _allow_call(self, post_mock, status_code=200):
+        post_mock.return_value = self._response(status_code)
+
+
+class TestPurgeQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.api = MagicMock()
+        self.purged = threading.Event()
+        self.api.purge_services.side_effect = lambda keys, service_ids: self.purged.set() or []
+
+    def test_close_purges_coalesced(self):
+        purge_queue = fastly_provider.PurgeQueue(
+            settings_mock, flush_size=100, flush_seconds=60, fastly_api=self.api)
+        purge_queue.add('10627', '1')
+        purge_queue.add('10627', '1')
+        purge_queue.add('353', '2')
+        purge_queue.close()
+        self.assertFalse(purge_queue.thread.is_alive())
+        # one purge for both articles, without the duplicate keys
+        self.api.purge_services.assert_called_once_with(
+            ['article/10627v1', 'article/10627/videos', 'digest/10627',
+             'article/00353v2', 'article/00353/videos', 'digest/00353'],
+            settings_mock.fastly_service_ids)
+
+    def test_flush_seconds(self):
+        purge_queue = fastly_provider.PurgeQueue(
+            settings_mock, flush_size=100, flush_seconds=0.1, fastly_api=self.api)
+        purge_queue.add('10627', '1')
+        self.assertTrue(self.purged.wait(5))
+        purge_queue.close()
+        self.assertEqual(self.api.purge_services.call_count, 1)
+
+    def test_add_queue_full(self):
+        logger = MagicMock()
+        # without the queue thread running the queue fills up
+        with patch.object(fastly_provider.PurgeQueue, 'run'):
+            purge_queue = fastly_provider.PurgeQueue(
+                settings_mock, queue_size=4, flush_size=100, flush_seconds=60,
+                fastly_api=self.api, logger=logger)
+        purge_queue.add('10627', '1')
+        # room for one more key but not the three of the article
+        purge_queue.add('353', '2')
+        logger.warning.assert_called_with(
+            "Fastly purge queue is %s, purging article %s now", "full", "353")
+        self.api.purge_services.assert_called_once_with(
+            ['article/00353v2', 'article/00353/videos', 'digest/00353'],
+            settings_mock.fastly_service_ids)
+        # none of the keys of the purged article were queued
+        self.assertEqual(purge_queue.keys.qsize(), 3)
+
+    def test_add_closed(self):
+        logger = MagicMock()
+        purge_queue = fastly_provider.PurgeQueue(
+            settings_mock, flush_size=100, flush_seconds=60,
+            fastly_api=self.api, logger=logger)
+        purge_queue.close()
+        purge_queue.add('10627', '1')
+        logger.warning.assert_called_with(
+            "Fastly purge queue is %s, purging article %s now", "closed", "10627")
+        self.api.purge_services.assert_called_once_with(
+            ['article/10627v1', 'article/10627/videos', 'digest/10627'],
+            settings_mock.fastly_service_ids)
+
+    @patch('provider.fastly_provider.dashboard_queue.send_message')
+    def test_purge_error_event(self, fake_send_message):
+        self.api.purge_services.side_effect = Exception("Fastly unavailable")
+        purge_queue = fastly_provider.PurgeQueue(
+            settings_mock, flush_size=100, flush_seconds=60, fastly_api=self.api,
+            logger=MagicMock())
+        purge_queue.add('10627', '1', 'run1')
+        purge_queue.add('10627', '1', 'run1')
+        purge_queue.add('353', '2', 'run2')
+        purge_queue.close()
+        # one error event for each article in the failed purge
+        messages = [call[0][0] for call in fake_send_message.call_args_list]
+        self.assertEqual([(message['item_identifier'], message['version'], message['run'],
+                           message['status']) for message in messages],
+                         [('10627', '1', 'run1', 'error'), ('353', '2', 'run2', 'error')])
 
+    def test_default_logger(self):
+        purge_queue = fastly_provider.PurgeQueue(settings_mock, fastly_api=self.api)
+        purge_queue.close()
+        self.assertIs(purge_queue.logger, fastly_provider.LOGGER)
@@ -1,4 +1,5 @@
 import unittest
+import requests
 from mock import mock, patch
 from provider.iiif import ShortRetryException
 import provider.iiif as iiif
@@ -64,5 +65,68 @@ class TestIiif(unittest.TestCase):
         request_mock.side_effect = [ObjectView({'status_code': code}) for code in status_codes]
 
 
+class FakeHttpSession:
+    "responses by method and endpoint, each a list of status codes or exceptions"
+    def __init__(self, head=None, get=None):
+        self.responses = {'head': head or {}, 'get': get or {}}
+        self.requests = []
+
+    def respond(self, method, endpoint):
+        self.requests.append((method, endpoint))
+        response = self.responses[method][endpoint].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return mock.MagicMock(status_code=response)
+
+    def head(self, endpoint, timeout=None):
+        return self.respond('head', endpoint)
+
+    def get(self, endpoint, timeout=None, stream=False):
+        return self.respond('get', endpoint)
+
+
+class TestEndpointVerifier(unittest.TestCase):
+
+    def setUp(self):
+        self.fake_logger = FakeLogger()
+
+    def verifier(self, session, retries=2):
+        return iiif.EndpointVerifier(None, self.fake_logger, threads=2, retries=retries, backoff=0,
+                                     session=session)
+
+    def test_verify(self):
+        session = FakeHttpSession(head={'fig1': [200], 'fig2': [500], 'fig3': [504, 200]})
+        results = self.verifier(session).verify(['fig1', 'fig2', 'fig3'])
+        self.assertEqual([(result.success, result.endpoint, result.status_code, result.attempts)
+                          for result in results],
+                         [(True, 'fig1', 200, 1), (False, 'fig2', 500, 1), (True, 'fig3', 200, 2)])
+
+    def test_verify_bounded_retries(self):
+        session = FakeHttpSession(head={'fig1': [404, 404, 404, 200]})
+        result = self.verifier(session, retries=2).verify(['fig1'])[0]
+        self.assertEqual((result.success, result.status_code, result.attempts), (False, 404, 3))
+
+    def test_verify_retry_request_exception(self):
+        session = FakeHttpSession(head={'fig1': [requests.exceptions.Timeout('timeout'), 200]})
+        result = self.verifier(session).verify(['fig1'])[0]
+        self.assertEqual((result.success, result.attempts), (True, 2))
+
+    def test_verify_head_not_supported(self):
+        session = FakeHttpSession(head={'fig1': [405]}, get={'fig1': [200], 'fig2': [200]})
+        results = self.verifier(session).verify(['fig1', 'fig2'])
+        self.assertTrue(all(result.success for result in results))
+        self.assertEqual(session.requests, [('head', 'fig1'), ('get', 'fig1'), ('get', 'fig2')])
+
+    def test_report(self):
+        results = [iiif.EndpointResult(True, 'fig1', 200, 0.5, 1),
+                   iiif.EndpointResult(False, 'fig2', 500, 1.5, 2)]
+        report = iiif.report(results)
+        self.assertEqual(report['endpoints'], 2)
+        self.assertEqual(report['failed'], ['fig2'])
+        self.assertEqual(report['retried'], 1)
+        self.assertEqual(report['max_seconds'], 1.5)
+        self.assertEqual(report['total_seconds'], 2.0)
+
+
 if __name__ == '__main__':
     unittest.main()
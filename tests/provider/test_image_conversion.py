@@ -0,0 +1,255 @@
+import hashlib
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from mock import MagicMock, patch
+import provider.image_conversion as image_conversion
+import provider.article_structure as article_structure
+from tests.activity.classes_mock import FakeLogger
+from tests.activity import settings_mock
+
+
+FORMATS = {
+    "Original": {
+        "sources": "tif",
+        "format": "jpg",
+        "download": "yes"
+        }}
+
+
+class FakeProcessPool:
+    "run the conversions in this process"
+    def __init__(self, function, processes, max_tasks=None, max_rss=None):
+        self.function = function
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+    def submit(self, task):
+        future = Future()
+        try:
+            future.set_result(self.function(task))
+        except Exception as exception:
+            future.set_exception(exception)
+        return future
+
+
+def fake_convert_file(task):
+    formats, file_path, info = task
+    if info.filename == 'elife-00353-fig2-v1':
+        raise RuntimeError("error resizing image %s" % info.filename)
+    return [(info.filename + '.jpg', b'jpg', True)]
+
+
+class TestFormatSpecs(unittest.TestCase):
+
+    def test_format_specs(self):
+        info = article_structure.ArticleInfo('elife-00353-fig1-v1.tif')
+        self.assertEqual(image_conversion.format_specs(FORMATS, info),
+                         [(FORMATS['Original'], 'yes')])
+
+    def test_format_specs_other_source(self):
+        info = article_structure.ArticleInfo('elife-00353-fig1-v1.png')
+        self.assertEqual(image_conversion.format_specs(FORMATS, info), [])
+
+
+@patch('provider.image_conversion.convert_file', fake_convert_file)
+@patch('provider.image_conversion.RecyclingProcessPool', FakeProcessPool)
+class TestConversionPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = FakeLogger()
+
+    def download(self, file_name):
+        return 'tests/tmp/' + file_name, article_structure.ArticleInfo(file_name)
+
+    @patch('provider.image_conversion.store_in_publish_locations')
+    def test_run(self, fake_store):
+        figures = ['elife-00353-fig1-v1.tif', 'elife-00353-fig3-v1.tif']
+        pipeline = image_conversion.ConversionPipeline(
+            settings_mock, self.logger, processes=2, in_flight=1)
+        converted = pipeline.run(FORMATS, figures, self.download, ['s3://cdn/00353/'])
+        self.assertEqual(converted, 2)
+        stored = sorted(call[0][1] for call in fake_store.call_args_list)
+        self.assertEqual(stored, ['elife-00353-fig1-v1.jpg', 'elife-00353-fig3-v1.jpg'])
+
+    @patch('provider.image_conversion.store_in_publish_locations')
+    def test_run_conversion_error(self, fake_store):
+        figures = ['elife-00353-fig1-v1.tif', 'elife-00353-fig2-v1.tif']
+        pipeline = image_conversion.ConversionPipeline(settings_mock, self.logger, processes=2)
+        with self.assertRaises(RuntimeError):
+            pipeline.run(FORMATS, figures, self.download, ['s3://cdn/00353/'])
+        # the other figure is still converted and stored
+        self.assertEqual(fake_store.call_count, 1)
+
+    @patch('provider.image_conversion.store_in_publish_locations')
+    def test_run_download_error(self, fake_store):
+        def download(file_name):
+            raise IOError("download failed")
+        pipeline = image_conversion.ConversionPipeline(settings_mock, self.logger, processes=1)
+        with self.assertRaises(IOError):
+            pipeline.run(FORMATS, ['elife-00353-fig1-v1.tif'], download, ['s3://cdn/00353/'])
+        self.assertEqual(fake_store.call_count, 0)
+
+    @patch('provider.image_conversion.store_in_publish_locations')
+    @patch('provider.image_conversion.file_hash')
+    @patch('provider.image_conversion.derivative_cache')
+    def test_run_cache_error(self, fake_derivative_cache, fake_file_hash, fake_store):
+        cache = MagicMock()
+        cache.publish.side_effect = IOError("manifest unavailable")
+        cache.add.side_effect = IOError("manifest unavailable")
+        fake_derivative_cache.return_value = cache
+        fake_file_hash.return_value = 'source'
+        pipeline = image_conversion.ConversionPipeline(settings_mock, self.logger, processes=1)
+        with patch('provider.image_conversion.open', create=True):
+            converted = pipeline.run(
+                FORMATS, ['elife-00353-fig1-v1.tif'], self.download, ['s3://cdn/00353/'])
+        # converted and stored as if there was no cache
+        self.assertEqual(converted, 1)
+        self.assertEqual(fake_store.call_count, 1)
+        self.assertEqual(self.logger.logexception, "Error caching image elife-00353-fig1-v1.jpg")
+
+
+class FakeEtagStorage:
+    "resources in a dict, ETag is the MD5 of the content"
+    def __init__(self):
+        self.resources = {}
+        self.copies = []
+
+    def resource_exists(self, resource):
+        return resource in self.resources
+
+    def resource_etag(self, resource):
+        if resource not in self.resources:
+            return None
+        return hashlib.md5(self.resources[resource]).hexdigest()
+
+    def get_resource_as_string(self, resource):
+        return self.resources[resource]
+
+    def set_resource_from_string(self, resource, data, content_type=None):
+        self.resources[resource] = data.encode('utf8') if isinstance(data, str) else data
+
+    def set_resource_from_file(self, resource, file, metadata=None):
+        self.resources[resource] = file.read()
+
+    def copy_resource(self, orig_resource, dest_resource, additional_dict_metadata=None):
+        self.copies.append(dest_resource)
+        self.resources[dest_resource] = self.resources[orig_resource]
+
+
+class TestDerivativeCache(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = FakeEtagStorage()
+        patcher = patch('provider.image_conversion.storage_context')
+        patcher.start().return_value = self.storage
+        self.addCleanup(patcher.stop)
+        self.info = article_structure.ArticleInfo('elife-00353-fig1-v1.tif')
+        self.format_spec = FORMATS['Original']
+
+    def cache(self, max_bytes=1024):
+        return image_conversion.DerivativeCache(
+            settings_mock, image_conversion.LocalDerivatives(max_bytes))
+
+    def publish_converted(self, cache, publish_locations):
+        filename = 'elife-00353-fig1-v1.jpg'
+        image_conversion.store_in_publish_locations(
+            settings_mock, filename, BytesIO(b'jpg'), publish_locations, False)
+        cache.add('source', self.format_spec, filename, b'jpg', publish_locations)
+
+    def test_key(self):
+        cache = self.cache()
+        self.assertEqual(cache.key('source', {'a': 1, 'b': 2}), cache.key('source', {'b': 2, 'a': 1}))
+        self.assertNotEqual(cache.key('source', {'a': 1}), cache.key('other', {'a': 1}))
+        self.assertNotEqual(cache.key('source', {'a': 1}), cache.key('source', {'a': 2}))
+
+    def test_publish_miss(self):
+        self.assertFalse(self.cache().publish(
+            'source', self.format_spec, self.info, ['s3://cdn/00353/'], False))
+
+    def test_publish_same_location(self):
+        cache = self.cache()
+        self.publish_converted(cache, ['s3://cdn/00353/'])
+        self.assertTrue(cache.publish(
+            'source', self.format_spec, self.info, ['s3://cdn/00353/'], False))
+        self.assertEqual(self.storage.copies, [])
+
+    def test_publish_copy(self):
+        cache = self.cache()
+        self.publish_converted(cache, ['s3://cdn/00353/'])
+        self.assertTrue(cache.publish(
+            'source', self.format_spec, self.info, ['s3://cdn/00353v2/'], True))
+        self.assertEqual(self.storage.copies, ['s3://cdn/00353v2/elife-00353-fig1-v1.jpg',
+                                               's3://cdn/00353v2/elife-00353-fig1-v1-download.jpg'])
+
+    def test_publish_changed_upload_bytes(self):
+        cache = self.cache()
+        self.publish_converted(cache, ['s3://cdn/00353/'])
+        self.storage.resources['s3://cdn/00353/elife-00353-fig1-v1.jpg'] = b'changed'
+        self.assertTrue(cache.publish(
+            'source', self.format_spec, self.info, ['s3://cdn/00353v2/'], False))
+        self.assertEqual(self.storage.copies, [])
+        self.assertEqual(self.storage.resources['s3://cdn/00353v2/elife-00353-fig1-v1.jpg'], b'jpg')
+
+    def test_publish_changed_evicted_bytes(self):
+        cache = self.cache(max_bytes=0)
+        self.publish_converted(cache, ['s3://cdn/00353/'])
+        self.storage.resources['s3://cdn/00353/elife-00353-fig1-v1.jpg'] = b'changed'
+        self.assertFalse(cache.publish(
+            'source', self.format_spec, self.info, ['s3://cdn/00353v2/'], False))
+
+    @patch.object(settings_mock, 'image_derivative_cache_folder', 'bot/image_derivatives', create=True)
+    def test_publish_from_manifest(self):
+        self.publish_converted(self.cache(), ['s3://cdn/00353/'])
+        # another worker without the local entry
+        self.assertTrue(self.cache().publish(
+            'source', self.format_spec, self.info, ['s3://cdn/00353v2/'], False))
+        self.assertEqual(self.storage.copies, ['s3://cdn/00353v2/elife-00353-fig1-v1.jpg'])
+
+    @patch('provider.image_conversion.convert_file', fake_convert_file)
+    @patch('provider.image_conversion.RecyclingProcessPool', FakeProcessPool)
+    @patch('provider.image_conversion.file_hash')
+    @patch('provider.image_conversion.derivative_cache')
+    def test_pipeline_reuses_derivatives(self, fake_derivative_cache, fake_file_hash):
+        fake_derivative_cache.return_value = self.cache()
+        fake_file_hash.return_value = 'source'
+
+        def download(file_name):
+            return __file__, article_structure.ArticleInfo(file_name)
+        for version in ['00353', '00353v2']:
+            pipeline = image_conversion.ConversionPipeline(settings_mock, FakeLogger(), processes=1)
+            pipeline.run(FORMATS, ['elife-00353-fig1-v1.tif'], download, ['s3://cdn/%s/' % version])
+        self.assertIn('s3://cdn/00353v2/elife-00353-fig1-v1.jpg', self.storage.copies)
+
+    def test_local_eviction(self):
+        local = image_conversion.LocalDerivatives(max_bytes=4)
+        local.put('one', {'image_bytes': b'123'})
+        local.put('two', {'image_bytes': b'45'})
+        self.assertIsNone(local.get('one').get('image_bytes'))
+        self.assertEqual(local.get('two').get('image_bytes'), b'45')
+        self.assertEqual(local.total_bytes, 2)
+
+    def test_local_max_entries(self):
+        local = image_conversion.LocalDerivatives(max_bytes=1024, max_entries=2)
+        local.put('one', {'image_bytes': b'1'})
+        local.put('two', {'image_bytes': b'2'})
+        # one is now the most recently used
+        local.get('one')
+        local.put('three', {'image_bytes': b'3'})
+        self.assertEqual(list(local.entries.keys()), ['one', 'three'])
+        self.assertEqual(local.total_bytes, 2)
+
+    def test_storage_context_per_thread(self):
+        cache = self.cache()
+        self.assertIs(cache.storage(), cache.storage())
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            executor.submit(cache.storage).result()
+        self.assertEqual(image_conversion.storage_context.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
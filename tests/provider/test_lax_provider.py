@@ -13,6 +13,9 @@ from ddt import ddt, data, unpack
 @ddt
 class TestLaxProvider(unittest.TestCase):
 
+    def setUp(self):
+        lax_provider.CLIENT = None
+
     @patch('provider.lax_provider.article_versions')
     def test_article_highest_version_200(self, mock_lax_provider_article_versions):
         mock_lax_provider_article_versions.return_value = 200, test_data.lax_article_versions_response_data
@@ -67,7 +70,7 @@ class TestLaxProvider(unittest.TestCase):
         result = lax_provider.article_version_date_by_version('08411', "2", settings_mock)
         self.assertEqual("2015-11-30T00:00:00Z", result)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_article_version_200(self, mock_requests_get):
         response = MagicMock()
         response.status_code = 200
@@ -77,7 +80,7 @@ class TestLaxProvider(unittest.TestCase):
         self.assertEqual(status_code, 200)
         self.assertEqual(versions, [{'version': 1}])
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_article_version_404(self, mock_requests_get):
         response = MagicMock()
         response.status_code = 404
@@ -86,7 +89,7 @@ class TestLaxProvider(unittest.TestCase):
         self.assertEqual(status_code, 404)
         self.assertIsNone(versions)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_article_version_500(self, mock_requests_get):
         response = MagicMock()
         response.status_code = 500
@@ -110,7 +113,7 @@ class TestLaxProvider(unittest.TestCase):
         expected = 'an_auth_key'
         self.assertEqual(lax_provider.lax_auth_key(settings_mock, True), expected)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_article_snippet_200_auth(self, mock_requests_get):
         expected_data = {'version': 1, 'type': 'research-article'}
         response_data = {'versions': [expected_data]}
@@ -121,7 +124,7 @@ class TestLaxProvider(unittest.TestCase):
         data = lax_provider.article_snippet('08411', 1, settings_mock, True)
         self.assertEqual(data, expected_data)
 
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_article_snippet_403(self, mock_requests_get):
         "scenario where the request is not authorized"
         response = MagicMock()
@@ -323,5 +326,112 @@ class TestLaxProvider(unittest.TestCase):
         self.assertEqual(first, expected)
 
 
+class TestLaxClient(unittest.TestCase):
+
+    def setUp(self):
+        self.session = MagicMock()
+        self.session.get.side_effect = self.response
+
+    def response(self, url, verify=None, headers=None):
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {'versions': [{'version': 1, 'url': url}]}
+        return response
+
+    def test_article_versions_cached(self):
+        client = lax_provider.LaxClient(settings_mock, ttl=60, session=self.session)
+        first = client.article_versions('08411')
+        second = client.article_versions('08411')
+        self.assertEqual(first, second)
+        self.assertEqual(self.session.get.call_count, 1)
+        self.assertEqual(client.stats(), {'hits': 1, 'misses': 1, 'articles': 1})
+
+    def test_article_versions_cached_copy(self):
+        client = lax_provider.LaxClient(settings_mock, ttl=60, session=self.session)
+        client.article_versions('08411')[1].append({'version': 2})
+        self.assertEqual(len(client.article_versions('08411')[1]), 1)
+
+    def test_article_versions_by_auth(self):
+        client = lax_provider.LaxClient(settings_mock, ttl=60, session=self.session)
+        client.article_versions('08411')
+        client.article_versions('08411', auth=True)
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_article_versions_expired(self):
+        client = lax_provider.LaxClient(settings_mock, ttl=60, session=self.session)
+        with patch('time.time') as fake_time:
+            fake_time.return_value = 1000
+            client.article_versions('08411')
+            fake_time.return_value = 1061
+            client.article_versions('08411')
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_article_versions_expired_dropped(self):
+        client = lax_provider.LaxClient(settings_mock, ttl=60, session=self.session)
+        with patch('time.time') as fake_time:
+            fake_time.return_value = 1000
+            client.article_versions('08411')
+            client.article_versions('00353')
+            fake_time.return_value = 1061
+            client.article_versions('08411')
+        # the expired entry read again is replaced, the other is not yet purged
+        self.assertEqual(client.stats()['articles'], 2)
+        self.assertEqual(client.cache[('08411', 'public')][0], 1121)
+
+    def test_article_versions_cache_size(self):
+        client = lax_provider.LaxClient(
+            settings_mock, ttl=60, session=self.session, cache_size=2)
+        with patch('time.time') as fake_time:
+            fake_time.return_value = 1000
+            client.article_versions('08411')
+            fake_time.return_value = 1030
+            client.article_versions('00353')
+            client.article_versions('00666')
+            # the oldest response is dropped to make room
+            self.assertEqual([key[0] for key in client.cache], ['00353', '00666'])
+            fake_time.return_value = 1100
+            client.article_versions('00777')
+            # expired responses are dropped first
+            self.assertEqual([key[0] for key in client.cache], ['00777'])
+
+    def test_client_stats(self):
+        lax_provider.lax_client(settings_mock)
+        self.assertEqual(sorted(lax_provider.client_stats().keys()),
+                         ['articles', 'hits', 'misses'])
+
+    def test_article_versions_no_ttl(self):
+        client = lax_provider.LaxClient(settings_mock, ttl=0, session=self.session)
+        client.article_versions('08411')
+        client.article_versions('08411')
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_invalidate(self):
+        client = lax_provider.LaxClient(settings_mock, ttl=60, session=self.session)
+        client.article_versions('08411')
+        client.article_versions('00353')
+        client.invalidate('08411')
+        client.article_versions('08411')
+        client.article_versions('00353')
+        self.assertEqual(self.session.get.call_count, 3)
+
+    def test_articles_versions(self):
+        client = lax_provider.LaxClient(settings_mock, ttl=60, session=self.session)
+        results = client.articles_versions(['08411', '00353', '08411'])
+        self.assertEqual(sorted(results.keys()), ['00353', '08411'])
+        self.assertEqual(results['00353'],
+                         (200, [{'version': 1, 'url': 'https://test/eLife.00353/version/'}]))
+        self.assertEqual(self.session.get.call_count, 2)
+
+    def test_articles_versions_empty(self):
+        self.assertEqual(lax_provider.articles_versions([], settings_mock), {})
+
+    def test_article_versions_not_cached_by_default(self):
+        client = lax_provider.lax_client(settings_mock)
+        client.session = self.session
+        lax_provider.article_versions('00353', settings_mock)
+        lax_provider.article_versions('00353', settings_mock)
+        self.assertEqual(self.session.get.call_count, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
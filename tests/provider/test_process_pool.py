@@ -0,0 +1,60 @@
+import os
+import unittest
+from provider.process import RecyclingProcessPool
+
+
+def square(number):
+    return number * number
+
+
+def worker_pid(task):
+    return os.getpid()
+
+
+def fail(task):
+    raise ValueError("bad task %s" % task)
+
+
+def crash(task):
+    os._exit(1)
+
+
+class TestRecyclingProcessPool(unittest.TestCase):
+
+    def test_submit(self):
+        with RecyclingProcessPool(square, 2) as pool:
+            futures = [pool.submit(number) for number in range(10)]
+        self.assertEqual([future.result() for future in futures],
+                         [number * number for number in range(10)])
+
+    def test_recycle_after_max_tasks(self):
+        with RecyclingProcessPool(worker_pid, 1, max_tasks=2) as pool:
+            futures = [pool.submit(number) for number in range(6)]
+        pids = [future.result() for future in futures]
+        # each worker process ran two tasks before being replaced
+        self.assertEqual(len(set(pids)), 3)
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+
+    def test_recycle_after_max_rss(self):
+        with RecyclingProcessPool(worker_pid, 1, max_rss=1) as pool:
+            futures = [pool.submit(number) for number in range(3)]
+        self.assertEqual(len(set(future.result() for future in futures)), 3)
+
+    def test_task_exception(self):
+        with RecyclingProcessPool(fail, 1) as pool:
+            future = pool.submit(1)
+        with self.assertRaises(RuntimeError) as context:
+            future.result()
+        self.assertEqual(str(context.exception), "ValueError: bad task 1")
+
+    def test_worker_crash(self):
+        with RecyclingProcessPool(crash, 1) as pool:
+            futures = [pool.submit(number) for number in range(2)]
+        for future in futures:
+            with self.assertRaises(RuntimeError):
+                future.result()
+
+
+if __name__ == '__main__':
+    unittest.main()
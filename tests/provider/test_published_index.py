@@ -0,0 +1,67 @@
+import unittest
+import json
+from mock import MagicMock
+from boto.exception import S3ResponseError
+import tests.settings_mock as settings_mock
+from provider.published_index import PublishedIndex
+
+
+class FakeStorage(object):
+    def __init__(self, resources=None):
+        self.resources = resources or {}
+
+    def get_resource_as_string(self, resource):
+        if resource not in self.resources:
+            raise S3ResponseError(404, 'Not Found')
+        return self.resources[resource]
+
+    def set_resource_from_string(self, resource, data, content_type=None):
+        self.resources[resource] = data
+
+
+class TestPublishedIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = FakeStorage()
+        self.index = PublishedIndex(
+            settings_mock, 'bucket', 'pub_router/published/', storage=self.storage)
+
+    def test_resource(self):
+        self.assertEqual(
+            self.index.resource(), 's3://bucket/pub_router/published/published_doi_ids.json')
+
+    def test_load_no_index(self):
+        self.assertIsNone(self.index.load())
+
+    def test_rebuild_and_load(self):
+        self.index.rebuild([3, 1, 2])
+        self.assertEqual(
+            json.loads(self.storage.resources[self.index.resource()]), {'doi_ids': [1, 2, 3]})
+        index = PublishedIndex(
+            settings_mock, 'bucket', 'pub_router/published/', storage=self.storage)
+        self.assertEqual(index.load(), {1, 2, 3})
+
+    def test_add(self):
+        self.index.rebuild([1])
+        index = PublishedIndex(
+            settings_mock, 'bucket', 'pub_router/published/', storage=self.storage)
+        index.add([1, 2])
+        self.assertEqual(
+            json.loads(self.storage.resources[self.index.resource()]), {'doi_ids': [1, 2]})
+
+    def test_add_no_change(self):
+        self.index.rebuild([1])
+        storage = MagicMock(wraps=self.storage)
+        index = PublishedIndex(
+            settings_mock, 'bucket', 'pub_router/published/', storage=storage)
+        index.add([1])
+        self.assertFalse(storage.set_resource_from_string.called)
+
+    def test_add_no_index(self):
+        # left to be built by listing the folder when it is first read
+        self.index.add([1])
+        self.assertEqual(self.storage.resources, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -68,5 +68,23 @@ class TestProviderS3Lib(unittest.TestCase):
         self.assertEqual(s3lib.latest_pmc_zip_revision(doi_id, s3_key_names), expected_s3_key_name)
 
 
+    def test_latest_pmc_zip_revisions(self):
+        s3_key_names = [
+            'pmc/zip/',
+            'pmc/zip/elife-05-19405.zip',
+            'pmc/zip/elife-06-24052.zip',
+            'pmc/zip/elife-06-24052.r1.zip',
+            'pmc/zip/elife-06-24052.r2.zip',
+        ]
+        latest = s3lib.latest_pmc_zip_revisions(s3_key_names)
+        self.assertEqual(latest, {
+            19405: 'pmc/zip/elife-05-19405.zip',
+            24052: 'pmc/zip/elife-06-24052.r2.zip',
+        })
+        # same answer as looking through all the names for each article
+        for doi_id, s3_key_name in latest.items():
+            self.assertEqual(s3lib.latest_pmc_zip_revision(doi_id, s3_key_names), s3_key_name)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,16 @@
 import unittest
 from mock import MagicMock, call
-from provider.storage_provider import S3StorageContext
+from provider.storage_provider import S3StorageContext, ResourceInfo, pattern_prefix
+
+
+def fake_key(name, size=1, etag='"abc"', last_modified='2019-01-01T00:00:00.000Z'):
+    key = MagicMock()
+    key.name = name
+    key.size = size
+    key.etag = etag
+    key.last_modified = last_modified
+    return key
+
 
 class TestProviderStorage(unittest.TestCase):
     def setUp(self):
@@ -21,4 +31,30 @@ class TestProviderStorage(unittest.TestCase):
         self.storage.copy_resource(original, destination, {'Content-Type': 'application/json'})
         self.assertEqual({'metadata': {'Content-Type': 'application/json'}}, self.storage.context['buckets']['b'].copy_key.mock_calls[0][2])
 
-        
+    def test_list_resources(self):
+        bucket = self.storage.context['buckets']['a']
+        bucket.list.return_value = [fake_key('folder/one.tif'), fake_key('folder/two.xml')]
+        self.assertEqual(self.storage.list_resources("s3://a/folder"), ['one.tif', 'two.xml'])
+        bucket.list.assert_called_with(prefix='folder/')
+        # names come from the listing, each key is not requested
+        self.assertFalse(bucket.get_key.called)
+
+    def test_iter_resources(self):
+        bucket = self.storage.context['buckets']['a']
+        bucket.list.return_value = [
+            fake_key('folder/elife-00666-fig1.tif', size=10, etag='"fig1"'),
+            fake_key('folder/elife-00666-fig1.jpg'),
+            fake_key('folder/elife-00666.xml')]
+        resources = self.storage.iter_resources("s3://a/folder", pattern='elife-00666-fig*.tif')
+        self.assertFalse(bucket.list.called)
+        self.assertEqual(list(resources), [ResourceInfo(
+            name='elife-00666-fig1.tif', size=10, etag='fig1',
+            last_modified='2019-01-01T00:00:00.000Z')])
+        bucket.list.assert_called_with(prefix='folder/elife-00666-fig')
+
+    def test_pattern_prefix(self):
+        self.assertEqual(pattern_prefix(None), '')
+        self.assertEqual(pattern_prefix('*.tif'), '')
+        self.assertEqual(pattern_prefix('elife-00666-fig?.tif'), 'elife-00666-fig')
+        self.assertEqual(pattern_prefix('elife-[0-9].xml'), 'elife-')
+        self.assertEqual(pattern_prefix('elife-00666.xml'), 'elife-00666.xml')
@@ -0,0 +1,264 @@
+import io
+import os
+import unittest
+import zipfile
+from mock import MagicMock, patch
+from provider.storage_provider import S3StorageContext, S3TransferManager, S3RangeReader
+from tests.activity.classes_mock import fake_get_tmp_dir, fake_clean_tmp_dir
+
+
+def fake_key(size, metadata=None, content_type='image/tiff'):
+    key = MagicMock()
+    key.size = size
+    key.metadata = metadata or {}
+    key.content_type = content_type
+    return key
+
+
+class FakeRangeKey:
+    "S3 key serving Range requests from content"
+    def __init__(self, content):
+        self.content = content
+        self.size = len(content)
+        self.ranges = []
+
+    def get_contents_as_string(self, headers):
+        start, end = headers['Range'].split('=')[1].split('-')
+        self.ranges.append((int(start), int(end)))
+        return self.content[int(start):int(end) + 1]
+
+
+def zip_content(members):
+    zip_bytes = io.BytesIO()
+    with zipfile.ZipFile(zip_bytes, 'w', zipfile.ZIP_DEFLATED) as open_zip:
+        for name, content in members:
+            open_zip.writestr(name, content)
+    return zip_bytes.getvalue()
+
+
+class TestS3RangeReader(unittest.TestCase):
+
+    def test_read(self):
+        key = FakeRangeKey(b'0123456789')
+        reader = S3RangeReader(key, key.size, buffer_size=4)
+        self.assertEqual(reader.read(2), b'01')
+        # served from the read ahead buffer
+        self.assertEqual(reader.read(2), b'23')
+        self.assertEqual(key.ranges, [(0, 3)])
+        reader.seek(-3, io.SEEK_END)
+        self.assertEqual(reader.tell(), 7)
+        self.assertEqual(reader.read(), b'789')
+        self.assertEqual(reader.read(), b'')
+        self.assertEqual(key.ranges, [(0, 3), (7, 9)])
+
+    def test_read_tail(self):
+        key = FakeRangeKey(b'0123456789')
+        reader = S3RangeReader(key, key.size, buffer_size=4, tail=b'6789')
+        reader.seek(6)
+        self.assertEqual(reader.read(3), b'678')
+        self.assertEqual(key.ranges, [])
+
+    def test_zip_file(self):
+        content = zip_content([('elife-00353-v1.xml', b'<article/>' * 100)])
+        key = FakeRangeKey(content)
+        with zipfile.ZipFile(S3RangeReader(key, key.size, buffer_size=64)) as open_zip:
+            self.assertEqual(open_zip.read('elife-00353-v1.xml'), b'<article/>' * 100)
+
+
+class TestS3TransferManager(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = S3StorageContext({})
+        self.storage.context['buckets']['a'] = MagicMock()
+        self.storage.context['buckets']['a'].name = 'a'
+        self.storage.context['buckets']['b'] = MagicMock()
+        self.storage.context['buckets']['b'].name = 'b'
+        self.storage.context['connection'] = MagicMock()
+        self.manager = S3TransferManager(
+            {}, threads=4, multipart_threshold=10, chunk_size=4, storage=self.storage)
+        # share the mock storage context with the pool threads
+        patcher = patch.object(S3TransferManager, 'storage', return_value=self.storage)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        fake_clean_tmp_dir()
+
+    def test_part_ranges(self):
+        self.assertEqual(self.manager.part_ranges(10), [(1, 0, 3), (2, 4, 7), (3, 8, 9)])
+        self.assertEqual(self.manager.part_ranges(8), [(1, 0, 3), (2, 4, 7)])
+
+    def test_map(self):
+        self.assertEqual(self.manager.map(lambda x: x * 2, range(10)), list(range(0, 20, 2)))
+        self.assertEqual(self.manager.map(lambda x: x, []), [])
+
+    def test_get_resource_to_file_small(self):
+        self.storage.context['buckets']['a'].get_key.return_value = fake_key(5)
+        with patch.object(S3StorageContext, 'get_resource_to_file') as fake_get:
+            self.manager.get_resource_to_file('s3://a/small.xml', io.BytesIO())
+            self.assertEqual(fake_get.call_count, 1)
+
+    @patch('provider.storage_provider.Key')
+    def test_get_resource_to_file_ranged(self, fake_key_class):
+        content = b'0123456789abc'
+        self.storage.context['buckets']['a'].get_key.return_value = fake_key(len(content))
+
+        def get_range(headers):
+            start, end = headers['Range'].split('=')[1].split('-')
+            return content[int(start):int(end) + 1]
+
+        fake_key_class.return_value.get_contents_as_string.side_effect = get_range
+        open_file = io.BytesIO()
+        self.manager.get_resource_to_file('s3://a/video.mp4', open_file)
+        self.assertEqual(open_file.getvalue(), content)
+        self.assertEqual(open_file.tell(), len(content))
+        self.assertEqual(fake_key_class.return_value.get_contents_as_string.call_count, 4)
+
+    @patch('provider.storage_provider.MultiPartUpload')
+    def test_set_resource_from_filename_multipart(self, fake_multipart_upload):
+        file_name = os.path.join(fake_get_tmp_dir(), 'video.mp4')
+        with open(file_name, 'wb') as open_file:
+            open_file.write(b'0123456789abc')
+        bucket = self.storage.context['buckets']['a']
+        self.manager.set_resource_from_filename('s3://a/folder/video.mp4', file_name)
+        bucket.initiate_multipart_upload.assert_called_with(
+            'folder/video.mp4', headers={'Content-Type': 'video/mp4'})
+        part_calls = fake_multipart_upload.return_value.upload_part_from_file.call_args_list
+        self.assertEqual(sorted((call[0][1], call[1]['size']) for call in part_calls),
+                         [(1, 4), (2, 4), (3, 4), (4, 1)])
+        self.assertEqual(bucket.initiate_multipart_upload.return_value.complete_upload.call_count, 1)
+
+    @patch('provider.storage_provider.MultiPartUpload')
+    def test_set_resource_from_filename_multipart_failure(self, fake_multipart_upload):
+        file_name = os.path.join(fake_get_tmp_dir(), 'video.mp4')
+        with open(file_name, 'wb') as open_file:
+            open_file.write(b'0123456789abc')
+        fake_multipart_upload.return_value.upload_part_from_file.side_effect = IOError()
+        bucket = self.storage.context['buckets']['a']
+        with self.assertRaises(IOError):
+            self.manager.set_resource_from_filename('s3://a/folder/video.mp4', file_name)
+        multipart = bucket.initiate_multipart_upload.return_value
+        self.assertEqual(multipart.cancel_upload.call_count, 1)
+        self.assertEqual(multipart.complete_upload.call_count, 0)
+
+    @patch('provider.storage_provider.MultiPartUpload')
+    def test_copy_resource_multipart(self, fake_multipart_upload):
+        self.storage.context['buckets']['a'].get_key.return_value = fake_key(
+            12, {'source': 'yes'})
+        dest_bucket = self.storage.context['buckets']['b']
+        self.manager.copy_resource(
+            's3://a/folder/video.mp4', 's3://b/1/video-download.mp4',
+            {'Content-Disposition': 'attachment', 'Content-Type': 'video/mp4'})
+        dest_bucket.initiate_multipart_upload.assert_called_with(
+            '1/video-download.mp4', headers={'Content-Type': 'video/mp4'},
+            metadata={'source': 'yes', 'Content-Disposition': 'attachment'})
+        part_calls = fake_multipart_upload.return_value.copy_part_from_key.call_args_list
+        self.assertEqual(sorted(call[0] for call in part_calls), [
+            ('a', 'folder/video.mp4', 1, 0, 3),
+            ('a', 'folder/video.mp4', 2, 4, 7),
+            ('a', 'folder/video.mp4', 3, 8, 11)])
+
+    def test_set_resource_from_stream(self):
+        with patch.object(S3StorageContext, 'set_resource_from_string') as fake_set:
+            self.manager.set_resource_from_stream('s3://b/folder/one.xml', io.BytesIO(b'one'))
+            fake_set.assert_called_with(
+                's3://b/folder/one.xml', b'one', content_type=None, metadata=None)
+
+    def test_set_resource_from_stream_multipart(self):
+        bucket = self.storage.context['buckets']['b']
+        multipart = bucket.initiate_multipart_upload.return_value
+        self.manager.set_resource_from_stream('s3://b/folder/video.mp4', io.BytesIO(b'0123456789'))
+        bucket.initiate_multipart_upload.assert_called_with('folder/video.mp4')
+        self.assertEqual([call[0][1] for call in multipart.upload_part_from_file.call_args_list],
+                         [1, 2, 3])
+        self.assertEqual(multipart.complete_upload.call_count, 1)
+
+    def test_set_resource_from_stream_short_reads(self):
+        # an HTTP response body can return less than asked for before its end
+        stream = MagicMock()
+        stream.read.side_effect = [b'01', b'23', b'456', b'7', b'89', b'', b'']
+        bucket = self.storage.context['buckets']['b']
+        multipart = bucket.initiate_multipart_upload.return_value
+        self.manager.set_resource_from_stream('s3://b/folder/still.jpg', stream)
+        self.assertEqual(
+            [call[0][0].getvalue() for call in multipart.upload_part_from_file.call_args_list],
+            [b'0123', b'4567', b'89'])
+        self.assertEqual(multipart.complete_upload.call_count, 1)
+
+    def test_set_resource_from_stream_content_type(self):
+        bucket = self.storage.context['buckets']['b']
+        self.manager.set_resource_from_stream(
+            's3://b/folder/video.jpg', io.BytesIO(b'0123456789'), content_type='image/jpeg')
+        bucket.initiate_multipart_upload.assert_called_with(
+            'folder/video.jpg', headers={'Content-Type': 'image/jpeg'})
+
+    def test_set_resources_from_zip(self):
+        members = [('elife-00353-v1.xml', b'<article/>'),
+                   ('elife-00353-fig1-v1.tif', b'tif'),
+                   ('__MACOSX/._elife-00353-v1.xml', b'mac')]
+        key = FakeRangeKey(zip_content(members))
+        self.storage.context['buckets']['a'].get_key.return_value = key
+        checked_names = []
+        with patch.object(S3StorageContext, 'set_resource_from_string') as fake_set:
+            resources = self.storage.set_resources_from_zip(
+                's3://a/elife-00353-vor-v1.zip', 's3://b/00353.1/run',
+                lambda name: not name.startswith('_'), checked_names.extend)
+            uploaded = sorted((call[0][0], call[0][1], call[1]['content_type'])
+                              for call in fake_set.call_args_list)
+        self.assertEqual(checked_names, ['elife-00353-v1.xml', 'elife-00353-fig1-v1.tif'])
+        self.assertEqual(resources, ['s3://b/00353.1/run/elife-00353-v1.xml',
+                                     's3://b/00353.1/run/elife-00353-fig1-v1.tif'])
+        self.assertEqual(uploaded, [
+            ('s3://b/00353.1/run/elife-00353-fig1-v1.tif', b'tif', 'image/tiff'),
+            ('s3://b/00353.1/run/elife-00353-v1.xml', b'<article/>', 'application/xml')])
+
+    @patch('provider.storage_provider.MultiPartUpload')
+    def test_set_resources_from_zip_multipart_content_type(self, fake_multipart_upload):
+        key = FakeRangeKey(zip_content([('elife-00353-media1.mp4', b'0123456789')]))
+        self.storage.context['buckets']['a'].get_key.return_value = key
+        self.manager.set_resources_from_zip('s3://a/elife-00353-vor-v1.zip', 's3://b/00353.1/run')
+        self.storage.context['buckets']['b'].initiate_multipart_upload.assert_called_with(
+            '00353.1/run/elife-00353-media1.mp4', headers={'Content-Type': 'video/mp4'})
+
+    def test_set_resources_from_zip_check_names_failure(self):
+        key = FakeRangeKey(zip_content([('elife-00353-v1.pdf', b'pdf')]))
+        self.storage.context['buckets']['a'].get_key.return_value = key
+
+        def check_names(names):
+            raise RuntimeError("No .xml file found")
+        with patch.object(S3StorageContext, 'set_resource_from_string') as fake_set:
+            with self.assertRaises(RuntimeError):
+                self.storage.set_resources_from_zip(
+                    's3://a/elife-00353-vor-v1.zip', 's3://b/00353.1/run', None, check_names)
+            self.assertEqual(fake_set.call_count, 0)
+
+    def test_copy_resources(self):
+        self.storage.context['buckets']['a'].get_key.return_value = fake_key(5)
+        pairs = [('s3://a/%s' % i, 's3://b/%s' % i) for i in range(6)]
+        result = self.storage.copy_resources(pairs)
+        self.assertEqual(result, ['s3://b/%s' % i for i in range(6)])
+        self.assertEqual(self.storage.context['buckets']['b'].copy_key.call_count, 6)
+
+    def test_get_resources_to_dir(self):
+        self.storage.context['buckets']['a'].get_key.return_value = fake_key(5)
+        to_dir = fake_get_tmp_dir()
+        with patch.object(S3StorageContext, 'get_resource_to_file') as fake_get:
+            file_paths = self.storage.get_resources_to_dir(
+                ['s3://a/folder/one.tif', 's3://a/folder/two.tif'], to_dir)
+            self.assertEqual(fake_get.call_count, 2)
+        self.assertEqual(file_paths, [os.path.join(to_dir, 'one.tif'),
+                                      os.path.join(to_dir, 'two.tif')])
+
+    def test_set_resources_from_dir(self):
+        from_dir = fake_get_tmp_dir()
+        for file_name in ['one.tif', 'two.tif']:
+            with open(os.path.join(from_dir, file_name), 'wb') as open_file:
+                open_file.write(b'tif')
+        with patch.object(S3StorageContext, 'set_resource_from_filename') as fake_set:
+            resources = self.storage.set_resources_from_dir(from_dir, 's3://b/folder/')
+            self.assertEqual(fake_set.call_count, 2)
+        self.assertEqual(resources, ['s3://b/folder/one.tif', 's3://b/folder/two.tif'])
+
+
+if __name__ == '__main__':
+    unittest.main()
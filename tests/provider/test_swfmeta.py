@@ -1,7 +1,7 @@
 import unittest
 import os
 import json
-from provider.swfmeta import SWFMeta
+from provider.swfmeta import SWFMeta, ClosedExecutionCache
 import tests.settings_mock as settings_mock
 from testfixtures import tempdir
 from testfixtures import TempDirectory
@@ -146,5 +146,81 @@ class TestProviderSWFMeta(unittest.TestCase):
         self.assertEqual(len(infos.get("executionInfos")), 15)
 
 
+def execution_info(workflow_id, start_timestamp, workflow_name='DepositCrossref'):
+    return {
+        'execution': {'workflowId': workflow_id, 'runId': 'run'},
+        'workflowType': {'name': workflow_name, 'version': '1'},
+        'startTimestamp': start_timestamp,
+        'closeStatus': 'COMPLETED'}
+
+
+class TestClosedExecutionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TempDirectory()
+        self.cache_file = self.directory.getpath('closed_executions.json')
+        self.swfmeta = SWFMeta(settings_mock)
+        self.swfmeta.conn = MagicMock()
+        self.swfmeta.get_last_completed_workflow_execution_startTimestamp = MagicMock(
+            return_value=100)
+
+    def tearDown(self):
+        TempDirectory.cleanup_all()
+
+    def cache(self):
+        return ClosedExecutionCache(settings_mock, self.cache_file, swfmeta=self.swfmeta)
+
+    @patch('calendar.timegm')
+    def test_first_refresh_no_query(self, fake_timegm):
+        fake_timegm.return_value = 1000
+        cache = self.cache()
+        cache.refresh()
+        self.swfmeta.conn.list_closed_workflow_executions.assert_not_called()
+        self.assertEqual(cache.last_completed_start('AdminEmail'), 100)
+        # looked up once, then from the cache
+        self.assertEqual(self.cache().last_completed_start('AdminEmail'), 100)
+        self.assertEqual(
+            self.swfmeta.get_last_completed_workflow_execution_startTimestamp.call_count, 1)
+
+    @patch('calendar.timegm')
+    def test_refresh_delta(self, fake_timegm):
+        fake_timegm.return_value = 1000
+        cache = self.cache()
+        cache.refresh()
+        cache.last_completed_starts(['AdminEmail', 'PubmedArticleDeposit'])
+
+        self.swfmeta.conn.list_closed_workflow_executions.side_effect = [
+            {'executionInfos': [execution_info('AdminEmail', 900)], 'nextPageToken': 'token'},
+            {'executionInfos': [execution_info('AdminEmail', 800),
+                                execution_info('Unfollowed', 950)]}]
+        fake_timegm.return_value = 1060
+        cache = self.cache()
+        cache.refresh()
+        self.assertEqual(cache.last_completed_starts(['AdminEmail', 'PubmedArticleDeposit']),
+                         {'AdminEmail': 900, 'PubmedArticleDeposit': 100})
+        # workflows not asked for are not kept
+        self.assertNotIn('id:Unfollowed', cache.last_completed)
+        calls = self.swfmeta.conn.list_closed_workflow_executions.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(calls[0][1]['close_oldest_date'], 1000 - 300)
+        self.assertEqual(calls[0][1]['close_latest_date'], 1060)
+        self.assertEqual(calls[0][1]['close_status'], 'COMPLETED')
+        self.assertEqual(calls[1][1]['next_page_token'], 'token')
+        self.assertEqual(self.cache().watermark, 1060)
+
+    @patch('calendar.timegm')
+    def test_never_completed(self, fake_timegm):
+        fake_timegm.return_value = 1000
+        self.swfmeta.get_last_completed_workflow_execution_startTimestamp.return_value = None
+        cache = self.cache()
+        cache.refresh()
+        self.assertIsNone(cache.last_completed_start('AdminEmail'))
+        self.swfmeta.conn.list_closed_workflow_executions.return_value = {
+            'executionInfos': [execution_info('AdminEmail', 1010)]}
+        fake_timegm.return_value = 1060
+        cache.refresh()
+        self.assertEqual(cache.last_completed_start('AdminEmail'), 1010)
+
+
 if __name__ == '__main__':
     unittest.main()
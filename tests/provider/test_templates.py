@@ -1,6 +1,7 @@
 import unittest
 import os
 import shutil
+from collections import OrderedDict
 import provider.templates as templates_provider
 from provider.templates import Templates
 from provider.article import article
@@ -191,5 +192,107 @@ class TestProviderTemplatesFunctions(unittest.TestCase):
         self.assertEqual(test_article.article_title, test_data.get('expected'))
 
 
+class FakeTemplateKey(object):
+    def __init__(self, name, etag, contents=None):
+        self.name = name
+        self.etag = '"%s"' % etag
+        self.contents = contents
+
+    def get_contents_as_string(self):
+        return self.contents
+
+
+class FakeTemplateBucket(object):
+    def __init__(self):
+        self.keys = {}
+        self.downloads = []
+        self.list_count = 0
+
+    def put(self, name, etag, contents):
+        self.keys[name] = FakeTemplateKey(name, etag, contents)
+
+    def list(self, prefix=None):
+        self.list_count += 1
+        return [key for name, key in self.keys.items() if name.startswith(prefix)]
+
+    def get_key(self, name):
+        self.downloads.append(name)
+        return self.keys.get(name)
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    def setUp(self):
+        templates_provider.DIRECTORY_ENVIRONMENTS = {}
+        self.directory = TempDirectory()
+        self.bucket = FakeTemplateBucket()
+        self.bucket.put('email_templates/header.html', 'one', b'Hello {{ name }}')
+        self.templates = OrderedDict([('header.html', 'email_templates/header.html')])
+
+    def tearDown(self):
+        templates_provider.DIRECTORY_ENVIRONMENTS = {}
+        TempDirectory.cleanup_all()
+
+    def template_cache(self, check_seconds=60):
+        return templates_provider.TemplateCache(
+            settings_mock, cache_dir=self.directory.path, check_seconds=check_seconds,
+            bucket=self.bucket)
+
+    def test_refresh(self):
+        cache = self.template_cache()
+        self.assertTrue(cache.refresh(self.templates))
+        self.assertEqual(
+            cache.jinja_env.get_template('header.html').render(name='World'), 'Hello World')
+        # within check_seconds S3 is not listed again
+        self.assertTrue(cache.refresh(self.templates))
+        self.assertEqual(self.bucket.list_count, 1)
+        self.assertEqual(self.bucket.downloads, ['email_templates/header.html'])
+
+    def test_refresh_changed_etag(self):
+        cache = self.template_cache(check_seconds=0)
+        cache.refresh(self.templates)
+        # unchanged template is not downloaded again
+        cache.refresh(self.templates)
+        self.assertEqual(len(self.bucket.downloads), 1)
+        self.bucket.put('email_templates/header.html', 'two', b'Hi {{ name }}')
+        cache.refresh(self.templates)
+        self.assertEqual(len(self.bucket.downloads), 2)
+        with open(os.path.join(self.directory.path, 'header.html')) as open_file:
+            self.assertEqual(open_file.read(), 'Hi {{ name }}')
+
+    def test_refresh_from_manifest(self):
+        self.template_cache().refresh(self.templates)
+        # a new process reuses the downloaded templates with the same ETag
+        self.template_cache().refresh(self.templates)
+        self.assertEqual(len(self.bucket.downloads), 1)
+
+    def test_refresh_missing(self):
+        templates = OrderedDict([('missing.html', 'email_templates/missing.html')])
+        self.assertFalse(self.template_cache().refresh(templates))
+
+    @patch.object(templates_provider, 'template_cache')
+    def test_download_templates_from_s3_cached(self, fake_template_cache):
+        cache = self.template_cache()
+        fake_template_cache.return_value = cache
+        templates_object = Templates(settings_mock, tmp_dir=self.directory.path)
+        with patch.object(settings_mock, 'templates_cache', True, create=True):
+            templates_object.download_templates_from_s3(['header.html'])
+        self.assertTrue(templates_object.email_templates_warmed)
+        self.assertEqual(templates_object.get_jinja_env(), cache.jinja_env)
+
+    @patch.object(settings_mock, 'templates_cache', True, create=True)
+    def test_lens_article_html_cached(self):
+        templates_object = Templates(settings_mock, tmp_dir=self.directory.path)
+        with patch.object(settings_mock, 'templates_cache_dir', self.directory.path,
+                          create=True):
+            content = templates_object.get_lens_article_html(
+                'tests/test_data/templates/', {'article_title': 'Title'}, 'cdn-bucket',
+                'elife03385.xml')
+            self.assertTrue('document_url: "http://example.com/cdn-bucket/elife03385.xml"'
+                            in content)
+            self.assertIsNone(templates_object.get_lens_article_html(
+                self.directory.path, {}, 'cdn-bucket', 'elife03385.xml'))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -15,6 +15,7 @@ aws_secret_access_key = ""
 
 workflow_starter_queue = ""
 sqs_region = ""
+event_monitor_topic = ""
 
 ejp_bucket = 'ejp_bucket'
 templates_bucket = 'templates_bucket'
@@ -1,8 +1,10 @@
 import unittest
+import calendar
 import datetime
+import time
 from pytz import timezone
 from ddt import ddt, data
-from mock import patch
+from mock import patch, MagicMock
 import tests.settings_mock as settings_mock
 from tests.classes_mock import FakeLayer1
 import cron
@@ -42,6 +44,14 @@ class TestCron(unittest.TestCase):
             date_time, '%Y-%m-%d %H:%M:%S')
         self.assertIsNone(cron.run_cron(settings_mock))
 
+    @patch.object(cron, 'get_execution_cache')
+    @patch.object(cron, 'read_schedule')
+    @patch.object(settings_mock, 'cron_schedule_file', 'cron-test.yaml', create=True)
+    def test_run_cron_schedule_file(self, fake_read_schedule, fake_get_execution_cache):
+        fake_read_schedule.return_value = []
+        cron.run_cron(settings_mock)
+        fake_read_schedule.assert_called_with('cron-test.yaml')
+
     @patch("calendar.timegm")
     @patch("provider.swfmeta.SWFMeta.get_last_completed_workflow_execution_startTimestamp")
     @data(
@@ -62,6 +72,15 @@ class TestCron(unittest.TestCase):
             settings_mock, start_seconds, workflow_id=workflow_id)
         self.assertEqual(return_value, test_data.get("expected"))
 
+    def test_workflow_conditional_start_execution_cache(self):
+        execution_cache = MagicMock()
+        execution_cache.last_completed_start.return_value = calendar.timegm(time.gmtime())
+        return_value = cron.workflow_conditional_start(
+            settings_mock, 60, workflow_id='AdminEmail', execution_cache=execution_cache)
+        self.assertIsNone(return_value)
+        execution_cache.last_completed_start.assert_called_with(
+            workflow_id='AdminEmail', workflow_name=None, workflow_version=None)
+
     @patch.object(FakeLayer1, 'start_workflow_execution')
     @patch('boto.swf.layer1.Layer1')
     @data(
@@ -456,5 +475,97 @@ class TestConditionalStarts(unittest.TestCase):
         self.conditional_start_test_run(test_data)
 
 
+class TestCronSchedule(unittest.TestCase):
+
+    def test_parse_cron_field(self):
+        self.assertEqual(cron.parse_cron_field('*', 0, 6), frozenset(range(7)))
+        self.assertEqual(cron.parse_cron_field('5', 0, 59), frozenset([5]))
+        self.assertEqual(cron.parse_cron_field('0-14', 0, 59), frozenset(range(15)))
+        self.assertEqual(cron.parse_cron_field('10,12', 0, 23), frozenset([10, 12]))
+        self.assertEqual(cron.parse_cron_field('*/15', 0, 59), frozenset([0, 15, 30, 45]))
+        self.assertEqual(cron.parse_cron_field('50/5', 0, 59), frozenset([50, 55]))
+
+    def test_parse_cron_invalid(self):
+        self.assertRaises(ValueError, cron.parse_cron, '* * * *')
+        self.assertRaises(ValueError, cron.parse_cron, '60 * * * *')
+        self.assertRaises(ValueError, cron.parse_cron, '14-0 * * * *')
+
+    def test_cron_matches(self):
+        # 1970-01-01 was a Thursday
+        current_datetime = datetime.datetime(1970, 1, 1, 10, 5)
+        self.assertTrue(cron.cron_matches(cron.parse_cron('0-14 10 1 1 4'), current_datetime))
+        self.assertFalse(cron.cron_matches(cron.parse_cron('0-14 10 * * 1-3'), current_datetime))
+        self.assertFalse(cron.cron_matches(cron.parse_cron('15-29 * * * *'), current_datetime))
+
+    def test_read_schedule(self):
+        schedule = cron.read_schedule(cron.SCHEDULE_FILE)
+        self.assertEqual(schedule[0].get("starter_name"), "cron_FiveMinute")
+        self.assertEqual(schedule[0].get("start_seconds"), 180)
+        self.assertEqual(schedule[-1].get("start_seconds"), (60*60*4)-(14*60))
+        self.assertEqual(str(schedule[2].get("timezone")), "Europe/London")
+
+
+class TestRunDaemon(unittest.TestCase):
+
+    def schedule(self):
+        return [
+            {"starter_name": "starter_AdminEmail", "workflow_id": "AdminEmail",
+             "start_seconds": 60, "cron": cron.parse_cron('* * * * *'),
+             "timezone": timezone("UTC")},
+            {"starter_name": "starter_PubmedArticleDeposit",
+             "workflow_id": "PubmedArticleDeposit",
+             "start_seconds": 60, "cron": cron.parse_cron('* * * * *'),
+             "timezone": timezone("UTC")},
+        ]
+
+    @patch('time.sleep')
+    @patch.object(cron, 'get_current_datetime')
+    @patch.object(cron, 'start_workflow')
+    @patch.object(cron, 'workflow_conditional_start')
+    @patch('provider.swfmeta.ClosedExecutionCache')
+    @patch('starter.starter_helper.thread_swf_connection')
+    def test_run_daemon(self, fake_set_connection, fake_cache, fake_conditional_start,
+                        fake_start_workflow, fake_get_current_datetime, fake_sleep):
+        fake_get_current_datetime.side_effect = [
+            datetime.datetime(1970, 1, 1, 10, 45, 1),
+            datetime.datetime(1970, 1, 1, 10, 45, 2),
+            datetime.datetime(1970, 1, 1, 10, 46, 0),
+        ]
+        # only AdminEmail is due
+        fake_conditional_start.side_effect = lambda **kwargs: (
+            kwargs.get("workflow_id") == "AdminEmail")
+        flag = MagicMock()
+        flag.green.side_effect = [True, True, True, False]
+        cron.run_daemon(settings_mock, flag, schedule=self.schedule(), threads=2)
+        # one start each minute, the cache is created once and refreshed each minute
+        self.assertEqual(fake_start_workflow.call_count, 2)
+        fake_start_workflow.assert_called_with(settings_mock, "starter_AdminEmail", "AdminEmail")
+        # each start uses the SWF connection of its thread
+        self.assertEqual(fake_set_connection.call_count, 2)
+        self.assertEqual(fake_cache.call_count, 1)
+        self.assertEqual(fake_cache.return_value.refresh.call_count, 2)
+        self.assertEqual(fake_sleep.call_count, 3)
+
+    @patch.object(cron, 'LOGGER')
+    @patch('time.sleep')
+    @patch.object(cron, 'get_current_datetime')
+    @patch.object(cron, 'start_workflow')
+    @patch.object(cron, 'workflow_conditional_start')
+    @patch('provider.swfmeta.ClosedExecutionCache')
+    @patch('starter.starter_helper.thread_swf_connection')
+    def test_run_daemon_start_exception(self, fake_set_connection, fake_cache,
+                                        fake_conditional_start, fake_start_workflow,
+                                        fake_get_current_datetime, fake_sleep, fake_logger):
+        fake_get_current_datetime.return_value = datetime.datetime(1970, 1, 1, 10, 45)
+        fake_conditional_start.return_value = True
+        fake_start_workflow.side_effect = [Exception('start failed'), None]
+        flag = MagicMock()
+        flag.green.side_effect = [True, False]
+        cron.run_daemon(settings_mock, flag, schedule=self.schedule(), threads=1)
+        # one failed start does not stop the others
+        self.assertEqual(fake_start_workflow.call_count, 2)
+        self.assertEqual(fake_logger.exception.call_count, 1)
+
+
 if __name__ == '__main__':
     unittest.main()
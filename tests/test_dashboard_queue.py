@@ -0,0 +1,114 @@
+import unittest
+import json
+import threading
+from mock import patch, MagicMock
+import tests.settings_mock as settings_mock
+import dashboard_queue
+
+
+class FakeSNSConnection:
+    def __init__(self):
+        self.published = []
+        self.published_event = threading.Event()
+
+    def publish(self, topic=None, message=None):
+        self.published.append(json.loads(message))
+        self.published_event.set()
+
+
+@patch('dashboard_queue.connect')
+class TestDashboardEmitter(unittest.TestCase):
+
+    def message(self, message_id):
+        return {'message_type': 'event', 'message_id': message_id}
+
+    def test_close_publishes_buffered(self, fake_connect):
+        conn = FakeSNSConnection()
+        fake_connect.return_value = conn
+        emitter = dashboard_queue.DashboardEmitter(
+            settings_mock, flush_size=100, flush_seconds=60)
+        for message_id in range(5):
+            emitter.emit(self.message(message_id))
+        emitter.close()
+        self.assertFalse(emitter.thread.is_alive())
+        self.assertEqual([message['message_id'] for message in conn.published], list(range(5)))
+        # one connection for all the messages
+        self.assertEqual(fake_connect.call_count, 1)
+
+    def test_flush_size(self, fake_connect):
+        conn = FakeSNSConnection()
+        fake_connect.return_value = conn
+        emitter = dashboard_queue.DashboardEmitter(settings_mock, flush_size=2, flush_seconds=60)
+        emitter.emit(self.message(1))
+        emitter.emit(self.message(2))
+        self.assertTrue(conn.published_event.wait(5))
+        emitter.close()
+        self.assertEqual(len(conn.published), 2)
+
+    def test_flush_seconds(self, fake_connect):
+        conn = FakeSNSConnection()
+        fake_connect.return_value = conn
+        emitter = dashboard_queue.DashboardEmitter(
+            settings_mock, flush_size=100, flush_seconds=0.1)
+        emitter.emit(self.message(1))
+        self.assertTrue(conn.published_event.wait(5))
+        emitter.close()
+        self.assertEqual(len(conn.published), 1)
+
+    def test_emit_queue_full(self, fake_connect):
+        logger = MagicMock()
+        # without the emitter thread running the queue fills up
+        with patch.object(dashboard_queue.DashboardEmitter, 'run'):
+            emitter = dashboard_queue.DashboardEmitter(
+                settings_mock, queue_size=1, flush_size=100, flush_seconds=60, logger=logger)
+        emitter.emit(self.message(1))
+        emitter.emit(self.message(2))
+        self.assertTrue(logger.error.called)
+        self.assertEqual(emitter.messages.qsize(), 1)
+
+    def test_emit_after_close(self, fake_connect):
+        logger = MagicMock()
+        emitter = dashboard_queue.DashboardEmitter(
+            settings_mock, flush_size=100, flush_seconds=60, logger=logger)
+        emitter.close()
+        emitter.emit(self.message(1))
+        logger.error.assert_called_with(
+            "Dashboard emitter is closed, dropped message %s", 1)
+        self.assertEqual(emitter.messages.qsize(), 0)
+
+    def test_default_logger(self, fake_connect):
+        emitter = dashboard_queue.DashboardEmitter(settings_mock)
+        emitter.close()
+        self.assertIs(emitter.logger, dashboard_queue.LOGGER)
+
+    def test_publish_error_reconnects(self, fake_connect):
+        failing_conn = MagicMock()
+        failing_conn.publish.side_effect = Exception('publish failed')
+        conn = FakeSNSConnection()
+        fake_connect.side_effect = [failing_conn, conn]
+        emitter = dashboard_queue.DashboardEmitter(
+            settings_mock, flush_size=100, flush_seconds=60, logger=MagicMock())
+        emitter.emit(self.message(1))
+        emitter.emit(self.message(2))
+        emitter.close()
+        self.assertEqual(conn.published, [self.message(2)])
+
+
+class TestSendMessage(unittest.TestCase):
+
+    @patch('dashboard_queue.connect')
+    def test_send_message(self, fake_connect):
+        conn = FakeSNSConnection()
+        fake_connect.return_value = conn
+        dashboard_queue.send_message({'message_id': 1}, settings_mock)
+        self.assertEqual(conn.published, [{'message_id': 1}])
+
+    @patch('dashboard_queue.emitter')
+    @patch.object(settings_mock, 'dashboard_emitter', True, create=True)
+    def test_send_message_emitter(self, fake_emitter):
+        dashboard_queue.send_message({'message_id': 1}, settings_mock)
+        fake_emitter.return_value.emit.assert_called_with({'message_id': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
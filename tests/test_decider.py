@@ -48,6 +48,69 @@ class TestDecider(unittest.TestCase):
             decision_json, fake_conn, None, None, None, None)
         self.assertEqual(decision.get('events'), polled_decision_json.get('events'))
 
+    def test_get_all_paged_events_event_filter(self):
+        decision = decider.get_all_paged_events(
+            self.decision_json, FakeLayer1(), None, None, None, None, decider.compact_event)
+        self.assertEqual(len(decision.get('events')), 22)
+        for event in decision.get('events'):
+            if 'activityTaskScheduledEventAttributes' in event:
+                self.assertIsNone(event['activityTaskScheduledEventAttributes'].get('input'))
+        self.assertIsNotNone(decider.get_input(decision))
+
+    @patch.object(FakeLayer1, 'poll_for_decision_task')
+    def test_iter_paged_events(self, fake_poll):
+        first_page = {'events': [1, 2], 'nextPageToken': 'one'}
+        fake_poll.side_effect = [
+            {'events': [3, 4], 'nextPageToken': 'two'},
+            {'events': [5]},
+        ]
+        last_page = {}
+        events = decider.iter_paged_events(
+            first_page, FakeLayer1(), None, None, None, 1000, last_page)
+        # pages are only polled once the events before them are consumed
+        self.assertEqual(next(events), 1)
+        self.assertEqual(next(events), 2)
+        self.assertEqual(fake_poll.call_count, 0)
+        self.assertEqual(list(events), [3, 4, 5])
+        self.assertEqual(fake_poll.call_count, 2)
+        self.assertEqual(last_page.get('decision'), {'events': [5]})
+
+    @patch.object(FakeLayer1, 'poll_for_decision_task')
+    def test_get_indexed_decision(self, fake_poll):
+        first_page = {'events': self.decision_json['events'][:10], 'nextPageToken': 'one'}
+        fake_poll.return_value = {'events': self.decision_json['events'][10:]}
+        decision = decider.get_indexed_decision(
+            first_page, FakeLayer1(), None, None, None, 1000, decider.compact_event)
+        index = decision.get(decider.HISTORY_INDEX_KEY)
+        self.assertEqual(index.event_count, 22)
+        self.assertTrue(index.is_for(decision))
+        # only the first event is kept, for the workflow input
+        self.assertEqual(len(decision.get('events')), 1)
+        self.assertIsNotNone(decider.get_input(decision))
+        self.assertIsNone(decision.get('nextPageToken'))
+
+    def test_get_maximum_page_size(self):
+        self.assertEqual(decider.get_maximum_page_size(settings_mock), 100)
+
+        class FakeSettings:
+            decider_maximum_page_size = 5000
+        self.assertEqual(decider.get_maximum_page_size(FakeSettings), 1000)
+
+    def test_compact_event(self):
+        event = {
+            'eventId': 6,
+            'eventType': 'ActivityTaskCompleted',
+            'activityTaskCompletedEventAttributes': {
+                'result': 'a long result', 'scheduledEventId': 5, 'startedEventId': 6}
+        }
+        expected = {
+            'eventId': 6,
+            'eventType': 'ActivityTaskCompleted',
+            'activityTaskCompletedEventAttributes': {'scheduledEventId': 5, 'startedEventId': 6}
+        }
+        self.assertEqual(decider.compact_event(event), expected)
+        self.assertEqual(decider.compact_event('something'), 'something')
+
     def test_get_input(self):
         expected = {'data': [1, 3, 7, 11]}
         decider_input = decider.get_input(self.decision_json)
@@ -165,6 +228,13 @@ class TestTrimmedDecision(unittest.TestCase):
         # original is unchanged
         self.assertEqual(len(self.decision_json.get('events')), 22)
 
+    def test_trimmed_decision_history_index(self):
+        decision = decider.get_indexed_decision(
+            self.decision_json, FakeLayer1(), None, None, None, 1000)
+        decision_trimmed = decider.trimmed_decision(decision)
+        self.assertIsNone(decision_trimmed.get(decider.HISTORY_INDEX_KEY))
+        json.dumps(decision_trimmed)
+
     def test_trimmed_decision_debug(self):
         decision_trimmed = decider.trimmed_decision(self.decision_json, True)
         self.assertEqual(len(decision_trimmed.get('events')), 22)
@@ -1,8 +1,9 @@
 import unittest
 import json
-from mock import Mock, patch
+import base64
+from mock import Mock, MagicMock, patch
 import tests.settings_mock as settings_mock
-from queue_worker import QueueWorker
+from queue_worker import QueueWorker, RoutingTable
 from S3utility.s3_notification_info import S3NotificationInfo
 from provider.utils import bytes_decode
 import tests.test_data as test_data
@@ -96,5 +97,164 @@ class TestQueueWorker(unittest.TestCase):
         self.assertIsNone(out_queue_list, None)
         self.assertEqual(return_value, None)
 
+
+class FakeBatchResults:
+    def __init__(self, errors=None):
+        self.errors = errors or []
+
+
+class FakeBatchQueue:
+    "queue receiving the messages in batches, then none"
+    def __init__(self, batches=None, write_errors=None):
+        self.batches = batches or []
+        self.write_errors = write_errors or []
+        self.written = []
+        self.deleted = []
+
+    def get_messages(self, num_messages=1, wait_time_seconds=None):
+        return self.batches.pop(0) if self.batches else []
+
+    def write_batch(self, messages):
+        self.written.append(messages)
+        return FakeBatchResults([{'id': batch_id} for batch_id in self.write_errors])
+
+    def delete_message_batch(self, messages):
+        self.deleted.append(messages)
+        return FakeBatchResults()
+
+
+def s3_event(message_id, bucket_name=u'jen-elife-production-final'):
+    event = FakeS3Event()
+    event.id = message_id
+    event._bucket_name = bucket_name
+    return event
+
+
+@patch('queue_worker.time.sleep')
+@patch('queue_worker.QueueWorker.queues')
+class TestQueueWorkerBatch(unittest.TestCase):
+    def setUp(self):
+        self.logger = Mock()
+        self.worker = QueueWorker(settings_mock, self.logger)
+        self.worker.batch_size = 10
+        self.routing = RoutingTable(test_data.queue_worker_rules)
+        self.worker.routing_table = Mock(return_value=self.routing)
+
+    def starter_messages(self, out_queue):
+        return [json.loads(base64.b64decode(message[1]).decode('utf8'))
+                for batch in out_queue.written for message in batch]
+
+    def test_work_batch(self, mock_queues, mock_sleep):
+        messages = [s3_event('1'), s3_event('2'), s3_event('3', 'not_a_real_bucket')]
+        queue, out_queue = FakeBatchQueue([messages]), FakeBatchQueue()
+        mock_queues.return_value = queue, out_queue
+        flag = MagicMock()
+        flag.green.side_effect = [True, False]
+        self.worker.work(flag)
+        self.assertEqual(self.starter_messages(out_queue),
+                         [test_data.queue_worker_starter_message] * 2)
+        self.assertEqual(len(out_queue.written), 1)
+        # the message for an unknown bucket is deleted too
+        self.assertEqual(queue.deleted, [messages])
+        mock_sleep.assert_not_called()
+
+    def test_work_batch_empty_sleeps(self, mock_queues, mock_sleep):
+        queue, out_queue = FakeBatchQueue(), FakeBatchQueue()
+        mock_queues.return_value = queue, out_queue
+        flag = MagicMock()
+        flag.green.side_effect = [True, True, True, True, True, False]
+        self.worker.work(flag)
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list], [1, 2, 4, 8, 10])
+        self.assertEqual(queue.deleted, [])
+
+    def test_process_batch_message_error(self, mock_queues, mock_sleep):
+        "a message which cannot be handled is not deleted, the others are"
+        bad_message = s3_event('2')
+        bad_message.file_name = Mock(side_effect=Exception('bad message'))
+        messages = [s3_event('1'), bad_message]
+        queue, out_queue = FakeBatchQueue(), FakeBatchQueue()
+        self.worker.process_batch(self.routing, queue, out_queue, messages)
+        self.assertEqual(len(self.starter_messages(out_queue)), 1)
+        self.assertEqual(queue.deleted, [[messages[0]]])
+
+    def test_process_batch_write_error(self, mock_queues, mock_sleep):
+        "a message whose starter message is not sent is not deleted"
+        messages = [s3_event('1'), s3_event('2')]
+        queue, out_queue = FakeBatchQueue(), FakeBatchQueue(write_errors=['0'])
+        self.worker.process_batch(self.routing, queue, out_queue, messages)
+        self.assertEqual(queue.deleted, [[messages[1]]])
+
+
+class TestRoutingTable(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = TempDirectory()
+
+    def tearDown(self):
+        TempDirectory.cleanup_all()
+
+    def info(self, data=None, **kwargs):
+        info_data = dict(data or test_data.queue_worker_article_zip_data)
+        info_data.update(kwargs)
+        return S3NotificationInfo.from_dict(info_data)
+
+    def test_route(self):
+        routing = RoutingTable(test_data.queue_worker_rules)
+        self.assertEqual(routing.route(self.info()), 'InitialArticleZip')
+        self.assertEqual(routing.route(self.info(test_data.ingest_digest_data)), 'IngestDigest')
+        self.assertIsNone(routing.route(self.info(bucket_name='not_a_real_bucket')))
+
+    def test_route_many(self):
+        routing = RoutingTable(test_data.queue_worker_rules)
+        infos = [self.info(), self.info(file_name='elife-00353-vor-r1.pdf'),
+                 self.info(test_data.ingest_decision_letter_data)]
+        self.assertEqual(routing.route_many(infos),
+                         ['InitialArticleZip', None, 'IngestDecisionLetter'])
+        # the matching rules are indexed by bucket name
+        self.assertEqual(len(routing.bucket_rules), 2)
+
+    def test_route_rules_order(self):
+        rules = {
+            'First': {'bucket_name_pattern': 'bucket', 'file_name_pattern': r'.*\.zip',
+                      'starter_name': 'First'},
+            'Second': {'bucket_name_pattern': '.*', 'file_name_pattern': '.*',
+                       'starter_name': 'Second'}}
+        routing = RoutingTable(rules)
+        self.assertEqual(routing.route(self.info(bucket_name='bucket', file_name='a.zip')), 'First')
+        self.assertEqual(routing.route(self.info(bucket_name='bucket', file_name='a.pdf')), 'Second')
+
+    def test_reload_if_changed(self):
+        rules_file = self.directory.write('rules.yaml', b"""
+Zip:
+  bucket_name_pattern: '.*'
+  file_name_pattern: '.*\\.zip'
+  starter_name: 'Zip'
+""")
+        routing = RoutingTable(rules_file=rules_file, check_seconds=0)
+        self.assertEqual(routing.route(self.info()), 'Zip')
+        self.directory.write('rules.yaml', b"""
+Zip:
+  bucket_name_pattern: '.*'
+  file_name_pattern: '.*\\.zip'
+  starter_name: 'NewZip'
+""")
+        routing.modified = None
+        self.assertEqual(routing.route(self.info()), 'NewZip')
+
+    def test_reload_error_keeps_rules(self):
+        rules_file = self.directory.write('rules.yaml', b"""
+Zip:
+  bucket_name_pattern: '.*'
+  file_name_pattern: '.*'
+  starter_name: 'Zip'
+""")
+        logger = Mock()
+        routing = RoutingTable(rules_file=rules_file, logger=logger, check_seconds=0)
+        self.directory.write('rules.yaml', b"Zip: [")
+        routing.modified = None
+        self.assertEqual(routing.route(self.info()), 'Zip')
+        self.assertTrue(logger.exception.called)
+
+
 if __name__ == '__main__':
     unittest.main()
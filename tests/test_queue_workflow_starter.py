@@ -1,7 +1,8 @@
 import unittest
 import json
+import threading
 import boto.swf.layer1
-from mock import patch
+from mock import patch, MagicMock
 from testfixtures import TempDirectory
 import tests.settings_mock as settings_mock
 from tests.classes_mock import FakeFlag, FakeBotoConnection
@@ -144,5 +145,73 @@ class TestQueueWorkflowStarter(unittest.TestCase):
         self.assertIsNotNone(data.get('run'))
 
 
+class FakeMessage:
+    def __init__(self, workflow_name):
+        self.body = json.dumps({'workflow_name': workflow_name, 'workflow_data': {}})
+        self.deleted = False
+
+    def get_body(self):
+        return self.body
+
+    def delete(self):
+        self.deleted = True
+
+
+class FakeThreadBotoConnection:
+    "records the threads which start workflows on the connection"
+    def __init__(self):
+        self.threads = []
+
+    def start_workflow_execution(self, *args, **kwargs):
+        self.threads.append(threading.current_thread().name)
+
+
+class TestDispatch(unittest.TestCase):
+
+    def setUp(self):
+        self.logger = FakeLogger()
+
+    def test_starter_class(self):
+        starter_class = queue_workflow_starter.starter_class('Ping')
+        self.assertEqual(starter_class.__name__, 'starter_Ping')
+        self.assertIs(queue_workflow_starter.starter_class('Ping'), starter_class)
+
+    @patch.object(boto.swf.layer1, 'Layer1')
+    def test_dispatch(self, fake_boto_conn):
+        connections = []
+
+        def connect(*args):
+            connections.append(FakeThreadBotoConnection())
+            return connections[-1]
+        fake_boto_conn.side_effect = connect
+        messages = [FakeMessage('PubmedArticleDeposit') for _ in range(5)]
+        queue = MagicMock()
+        queue.get_messages.return_value = messages
+        flag = MagicMock()
+        flag.green.side_effect = [True, False]
+        queue_workflow_starter.dispatch(settings_mock, self.logger, flag, queue, 2)
+        self.assertTrue(all(message.deleted for message in messages))
+        queue.get_messages.assert_called_with(10, visibility_timeout=60, wait_time_seconds=20)
+        # one connection per thread, each used only by its own thread
+        self.assertTrue(1 <= len(connections) <= 2)
+        self.assertEqual(sum(len(conn.threads) for conn in connections), 5)
+        for conn in connections:
+            self.assertTrue(len(set(conn.threads)) <= 1)
+
+    @patch('queue_workflow_starter.start_workflow')
+    def test_start_message_failed(self, fake_start_workflow):
+        "a message whose workflow fails to start is not done with"
+        fake_start_workflow.side_effect = Exception('start failed')
+        self.assertFalse(queue_workflow_starter.start_message(
+            settings_mock, self.logger, FakeMessage('Ping')))
+
+    @patch('queue_workflow_starter.start_workflow')
+    def test_start_message_invalid(self, fake_start_workflow):
+        "a message for an unknown workflow is done with, it would never start"
+        self.assertTrue(queue_workflow_starter.start_message(
+            settings_mock, self.logger, FakeMessage('not_a_real_workflow')))
+        fake_start_workflow.assert_not_called()
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,10 @@
 import unittest
 import json
+import threading
+from mock import patch, MagicMock
 from tests import settings_mock
 import worker
+from provider import process
 
 
 class TestWorker(unittest.TestCase):
@@ -66,5 +69,151 @@ class TestWorker(unittest.TestCase):
         self.assertEqual(activity_object.__class__.__name__, activity_name)
 
 
+class TestActivityConcurrency(unittest.TestCase):
+
+    def test_reserve_unlimited(self):
+        concurrency = worker.ActivityConcurrency()
+        self.assertEqual(concurrency.reserve(0), [])
+        self.assertEqual(concurrency.reserve(0), [])
+
+    def test_reserve(self):
+        concurrency = worker.ActivityConcurrency({'ConvertImagesToJPG': 1, 'PingWorker': 2})
+        reserved = concurrency.reserve(0)
+        self.assertEqual(reserved, ['ConvertImagesToJPG', 'PingWorker'])
+        self.assertIsNone(concurrency.reserve(0))
+        # the PingWorker slot taken by the failed reservation was released
+        ping_worker = concurrency.semaphores.get('PingWorker')
+        self.assertTrue(ping_worker.acquire(blocking=False))
+        ping_worker.release()
+        concurrency.release(reserved)
+        self.assertEqual(concurrency.reserve(0), ['ConvertImagesToJPG', 'PingWorker'])
+
+
+class TestWorkPool(unittest.TestCase):
+
+    def setUp(self):
+        with open('tests/test_data/activity.json', 'r') as open_file:
+            self.activity_json = json.loads(open_file.read())
+
+    @patch('worker.process_activity_task')
+    @patch('worker.connect')
+    def test_work_slot(self, fake_connect, fake_process):
+        flag = process.Flag()
+        poll_count = []
+
+        def poll_for_activity_task(*args):
+            poll_count.append(1)
+            if len(poll_count) >= 2:
+                flag.stop_process()
+                return {}
+            return self.activity_json
+
+        fake_connect.return_value.poll_for_activity_task = poll_for_activity_task
+        worker.work_slot(settings_mock, flag, 0, worker.ActivityConcurrency())
+        self.assertEqual(len(poll_count), 2)
+        self.assertEqual(fake_process.call_count, 1)
+
+    @patch('worker.SLOT_WAIT_SECONDS', 0.01)
+    @patch('worker.process_activity_task')
+    @patch('worker.connect')
+    def test_work_slot_concurrency_limit(self, fake_connect, fake_process):
+        flag = process.Flag()
+        activity_type = self.activity_json['activityType']['name']
+        concurrency = worker.ActivityConcurrency({activity_type: 1, 'PingWorker': 1})
+        # another slot is running the activity type
+        concurrency.reserve(0)
+        concurrency.release(['PingWorker'])
+        stopper = threading.Timer(0.1, flag.stop_process)
+        stopper.start()
+        worker.work_slot(settings_mock, flag, 0, concurrency, logger=MagicMock())
+        stopper.join()
+        # no task was polled while the activity type was at its limit
+        self.assertFalse(fake_connect.return_value.poll_for_activity_task.called)
+        self.assertEqual(fake_process.call_count, 0)
+        concurrency.release([activity_type])
+
+    @patch('worker.process_activity_task')
+    @patch('worker.connect')
+    def test_work_slot_concurrency_release(self, fake_connect, fake_process):
+        flag = process.Flag()
+        activity_type = self.activity_json['activityType']['name']
+        concurrency = worker.ActivityConcurrency({activity_type: 1, 'PingWorker': 1})
+
+        def process_activity_task(*args):
+            # only the slot of the activity type being run is held
+            self.assertIsNone(concurrency.reserve(0))
+            ping_worker = concurrency.semaphores.get('PingWorker')
+            self.assertTrue(ping_worker.acquire(blocking=False))
+            ping_worker.release()
+            flag.stop_process()
+
+        fake_process.side_effect = process_activity_task
+        fake_connect.return_value.poll_for_activity_task.return_value = self.activity_json
+        worker.work_slot(settings_mock, flag, 0, concurrency, logger=MagicMock())
+        self.assertEqual(fake_process.call_count, 1)
+        # every slot is released once the task is done
+        self.assertEqual(concurrency.reserve(0), sorted([activity_type, 'PingWorker']))
+
+    @patch('worker.SUPERVISOR_SLEEP_SECONDS', 0.01)
+    @patch('log.logger')
+    @patch('worker.work_slot')
+    def test_work_pool_restart_slot_logger(self, fake_work_slot, fake_logger):
+        flag = process.Flag()
+
+        def work_slot(*args):
+            # the slot stops, and is restarted once
+            if fake_work_slot.call_count >= 2:
+                flag.stop_process()
+
+        fake_work_slot.side_effect = work_slot
+        worker.work_pool(settings_mock, flag, pool_size=1)
+        self.assertEqual(fake_work_slot.call_count, 2)
+        # the pool logger and one slot logger
+        self.assertEqual(fake_logger.call_count, 2)
+        self.assertIs(fake_work_slot.call_args_list[0][0][4], fake_work_slot.call_args_list[1][0][4])
+
+    @patch('worker.SUPERVISOR_SLEEP_SECONDS', 0.01)
+    @patch('worker.STATS_SECONDS', 0)
+    @patch('provider.lax_provider.client_stats')
+    @patch('log.logger')
+    @patch('worker.work_slot')
+    def test_work_pool_log_stats(self, fake_work_slot, fake_logger, fake_client_stats):
+        flag = process.Flag()
+        fake_work_slot.side_effect = lambda *args: flag.stop_process()
+        fake_client_stats.return_value = {'hits': 1, 'misses': 1, 'articles': 1}
+        worker.work_pool(settings_mock, flag, pool_size=1)
+        fake_logger.return_value.info.assert_any_call(
+            "lax cache stats: {'hits': 1, 'misses': 1, 'articles': 1}")
+
+    @patch('worker.SUPERVISOR_SLEEP_SECONDS', 0.01)
+    @patch('worker.process_activity_task')
+    @patch('worker.connect')
+    def test_work_pool_drain(self, fake_connect, fake_process):
+        flag = process.Flag()
+        pool_size = 3
+        barrier = threading.Barrier(pool_size + 1)
+        stopped = threading.Event()
+
+        def poll_for_activity_task(*args):
+            # every slot is mid-poll when the shutdown signal arrives
+            barrier.wait(timeout=5)
+            stopped.wait(timeout=5)
+            return self.activity_json
+
+        fake_connect.return_value.poll_for_activity_task = poll_for_activity_task
+
+        def stop():
+            barrier.wait(timeout=5)
+            flag.stop_process()
+            stopped.set()
+
+        stopper = threading.Thread(target=stop)
+        stopper.start()
+        worker.work_pool(settings_mock, flag, pool_size=pool_size)
+        stopper.join()
+        # every slot finished the task it polled before shutting down
+        self.assertEqual(fake_process.call_count, pool_size)
+
+
 if __name__ == '__main__':
     unittest.main()
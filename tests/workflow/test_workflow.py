@@ -3,7 +3,7 @@ import json
 import tests.settings_mock as settings_mock
 from tests.classes_mock import FakeLayer1
 from tests.activity.classes_mock import FakeLogger
-from workflow.objects import Workflow
+from workflow.objects import Workflow, HistoryIndex, HISTORY_INDEX_KEY
 
 
 def decisions_data():
@@ -115,3 +115,98 @@ class TestWorkflow(unittest.TestCase):
         self.assertTrue(return_value)
         return_value = self.workflow.activity_status(decisions, None, 'PingWorker')
         self.assertTrue(return_value)
+
+    def test_last_activity_status(self):
+        decision = {'events': history_events(
+            [('PingWorker', 'PingWorker', 'ActivityTaskCompleted'),
+             ('NextStep', 'NextStep', 'ActivityTaskFailed')])}
+        self.assertEqual(self.workflow.last_activity_status(decision), 'ActivityTaskFailed')
+
+    def test_history_index_rebuilt_for_new_events(self):
+        decision = {'events': history_events(
+            [('PingWorker', 'PingWorker', 'ActivityTaskCompleted')])}
+        self.assertFalse(self.workflow.activity_status(decision, 'NextStep', 'NextStep'))
+        next_events = history_events([('NextStep', 'NextStep', 'ActivityTaskCompleted')])
+        for event in next_events:
+            event['eventId'] += len(decision['events'])
+            if 'activityTaskCompletedEventAttributes' in event:
+                event['activityTaskCompletedEventAttributes']['scheduledEventId'] += len(
+                    decision['events'])
+        decision['events'] += next_events
+        self.assertTrue(self.workflow.activity_status(decision, 'NextStep', 'NextStep'))
+
+
+def history_events(activities):
+    """
+    synthetic decision history events, activities is a list of
+    (activityType, activityId, outcome eventType) tuples
+    """
+    events = [{'eventId': 1, 'eventType': 'WorkflowExecutionStarted'}]
+    for activity_type, activity_id, outcome in activities:
+        scheduled_event_id = len(events) + 1
+        events.append({
+            'eventId': scheduled_event_id,
+            'eventType': 'ActivityTaskScheduled',
+            'activityTaskScheduledEventAttributes': {
+                'activityType': {'name': activity_type, 'version': '1'},
+                'activityId': activity_id}})
+        attributes_key = 'activityTaskCompletedEventAttributes'
+        if outcome == 'ActivityTaskFailed':
+            attributes_key = 'activityTaskFailedEventAttributes'
+        events.append({
+            'eventId': len(events) + 1,
+            'eventType': outcome,
+            attributes_key: {'scheduledEventId': scheduled_event_id}})
+    return events
+
+
+    def test_history_index_attached(self):
+        events = history_events([('PingWorker', 'PingWorker', 'ActivityTaskCompleted')])
+        decision = {'events': events[:1]}
+        decision[HISTORY_INDEX_KEY] = HistoryIndex(decision, iter(events))
+        self.assertTrue(self.workflow.activity_status(decision, 'PingWorker', 'PingWorker'))
+        self.assertIs(self.workflow.history_index(decision), decision[HISTORY_INDEX_KEY])
+
+
+class TestHistoryIndex(unittest.TestCase):
+
+    def test_history_index(self):
+        decision = {'events': history_events(
+            [('PingWorker', 'PingWorker', 'ActivityTaskCompleted'),
+             ('NextStep', 'NextStep', 'ActivityTaskFailed'),
+             ('NextStep', 'NextStep', 'ActivityTaskCompleted')])}
+        index = HistoryIndex(decision)
+        self.assertTrue(index.is_for(decision))
+        self.assertTrue(index.activity_completed('PingWorker', 'PingWorker'))
+        self.assertTrue(index.activity_completed('NextStep', None))
+        self.assertTrue(index.activity_completed(None, 'NextStep'))
+        self.assertFalse(index.activity_completed('PingWorker', 'NextStep'))
+        self.assertFalse(index.activity_completed(None, None))
+        self.assertEqual(index.last_activity_status, 'ActivityTaskCompleted')
+        self.assertFalse(index.cancel_requested)
+
+    def test_history_index_cancel_requested(self):
+        events = history_events([('PingWorker', 'PingWorker', 'ActivityTaskFailed')])
+        events.append({'eventId': len(events) + 1,
+                       'eventType': 'WorkflowExecutionCancelRequested'})
+        index = HistoryIndex({'events': events})
+        self.assertTrue(index.cancel_requested)
+        self.assertFalse(index.activity_completed('PingWorker', 'PingWorker'))
+
+    def test_history_index_decision_json(self):
+        index = HistoryIndex(decisions_data())
+        self.assertTrue(index.activity_completed('PingWorker', 'PingWorker'))
+        self.assertFalse(index.is_for(decisions_data()))
+
+    def test_history_index_streamed(self):
+        events = decisions_data()['events']
+        decision = {'events': events[:1]}
+        index = HistoryIndex(decision, iter(events))
+        self.assertEqual(index.event_count, 22)
+        self.assertEqual(index.first_event, events[0])
+        self.assertTrue(index.activity_completed('PingWorker', 'PingWorker'))
+        self.assertTrue(index.is_for(decision))
+
+    def test_history_index_none(self):
+        with self.assertRaises(TypeError):
+            HistoryIndex(None)
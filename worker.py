@@ -5,8 +5,9 @@ import random
 import os
 import importlib
 import time
+import threading
 import newrelic.agent
-from provider import process, utils
+from provider import lax_provider, process, utils
 
 import activity
 from activity.objects import Activity
@@ -16,100 +17,259 @@ from activity.objects import Activity
 Amazon SWF worker
 """
 
+DEFAULT_POOL_SIZE = 1
+SUPERVISOR_SLEEP_SECONDS = 1
+# how long a slot waits for a free slot of the limited activities before checking the flag
+SLOT_WAIT_SECONDS = 1
+STATS_SECONDS = 300
+
 def work(settings, flag):
     # Log
     identity = "worker_%s" % os.getpid()
     logger = log.logger("worker.log", settings.setLevel, identity)
 
     # Simple connect
-    conn = boto.swf.layer1.Layer1(settings.aws_access_key_id, settings.aws_secret_access_key)
+    conn = connect(settings)
 
-    token = None
     application = newrelic.agent.application()
+    stats_seconds = getattr(settings, 'worker_stats_seconds', STATS_SECONDS)
+    stats_logged = time.time()
 
     # Poll for an activity task indefinitely
     while flag.green():
-        if token is None:
-            logger.info('polling for activity...')
-            activity_task = conn.poll_for_activity_task(settings.domain,
-                                                        settings.default_task_list, identity)
-
-            token = get_taskToken(activity_task)
-
-            logger.info('got activity: \n%s' % json.dumps(activity_task, sort_keys=True, indent=4))
-
-            # Complete the activity based on data and activity type
-            activity_result = False
-            if token is not None:
-                # Get the activityType and attempt to do the work
-                activityType = get_activityType(activity_task)
-                if activityType is not None:
-                    logger.info('activityType: %s' % activityType)
-
-                    # Build a string for the object name
-                    activity_name = get_activity_name(activityType)
-
-                    with newrelic.agent.BackgroundTask(application, name=activity_name, group='worker.py'):
-                        # Attempt to import the module for the activity
-                        if import_activity_class(activity_name):
-                            # Instantiate the activity object
-                            activity_object = get_activity_object(activity_name, settings,
-                                                                  logger, conn, token, activity_task)
-
-                            # Get the data to pass
-                            data = get_input(activity_task)
-
-                            # Do the activity
-                            try:
-                                activity_result = activity_object.do_activity(data)
-                            except Exception as e:
-                                logger.error('error executing activity %s' %
-                                             activity_name, exc_info=True)
-
-                            # Print the result to the log
-                            logger.info('got result: \n%s' %
-                                        json.dumps(activity_object.result, sort_keys=True, indent=4))
-
-                            # Complete the activity task if it was successful
-                            if type(activity_result) == str:
-                                if activity_result == Activity.ACTIVITY_SUCCESS:
-                                    message = activity_object.result
-                                    respond_completed(conn, logger, token, message)
-                                elif activity_result == Activity.ACTIVITY_TEMPORARY_FAILURE:
-                                    reason = ('error: activity failed with result '
-                                              + str(activity_object.result))
-                                    detail = ''
-                                    respond_failed(conn, logger, token, detail, reason)
-
-                                else:
-                                    # (Activity.ACTIVITY_PERMANENT_FAILURE or Activity.ACTIVITY_EXIT_WORKFLOW)
-                                    signal_fail_workflow(conn, logger, settings.domain,
-                                                         activity_task['workflowExecution']['workflowId'],
-                                                         activity_task['workflowExecution']['runId'])
-                            else:
-                                # for legacy actions
-
-                                # Complete the activity task if it was successful
-                                if activity_result:
-                                    message = activity_object.result
-                                    respond_completed(conn, logger, token, message)
-                                else:
-                                    reason = ('error: activity failed with result '
-                                              + str(activity_object.result))
-                                    detail = ''
-                                    respond_failed(conn, logger, token, detail, reason)
-
-                        else:
-                            reason = 'error: could not load object %s\n' % activity_name
-                            detail = ''
-                            respond_failed(conn, logger, token, detail, reason)
-                            logger.info('error: could not load object %s\n' % activity_name)
-
-        # Reset and loop
-        token = None
+        logger.info('polling for activity...')
+        activity_task = conn.poll_for_activity_task(settings.domain,
+                                                    settings.default_task_list, identity)
+
+        logger.info('got activity: \n%s' % json.dumps(activity_task, sort_keys=True, indent=4))
+
+        process_activity_task(settings, logger, conn, application, activity_task)
+
+        if time.time() - stats_logged >= stats_seconds:
+            log_stats(logger)
+            stats_logged = time.time()
 
     logger.info("graceful shutdown")
 
+
+def work_pool(settings, flag, pool_size=None, activity_limits=None):
+    """
+    Supervised worker mode, run pool_size poll-and-execute slots as threads in this
+    process, sharing the imported activity modules, and restart any slot which dies.
+    activity_limits is a dict of activityType to the maximum number of slots which
+    may run that activity type at the same time
+    """
+    identity = "worker_pool_%s" % os.getpid()
+    logger = log.logger("worker.log", settings.setLevel, identity)
+
+    if pool_size is None:
+        pool_size = getattr(settings, 'worker_pool_size', DEFAULT_POOL_SIZE)
+    if activity_limits is None:
+        activity_limits = getattr(settings, 'worker_activity_concurrency', {})
+    concurrency = ActivityConcurrency(activity_limits)
+    stats_seconds = getattr(settings, 'worker_stats_seconds', STATS_SECONDS)
+    stats_logged = time.time()
+
+    slots = {}
+    # one logger per slot, log.logger adds a handler each time it is called
+    slot_loggers = {}
+    logger.info('starting %s worker slots' % pool_size)
+    while flag.green():
+        for slot in range(pool_size):
+            if slot in slots and slots[slot].is_alive():
+                continue
+            if slot in slots:
+                logger.error('worker slot %s stopped, restarting it' % slot)
+            if slot not in slot_loggers:
+                slot_loggers[slot] = slot_logger(settings, slot)
+            slots[slot] = threading.Thread(
+                target=work_slot, args=(settings, flag, slot, concurrency, slot_loggers[slot]),
+                name="worker_slot_%s" % slot)
+            slots[slot].start()
+        if time.time() - stats_logged >= stats_seconds:
+            log_stats(logger)
+            stats_logged = time.time()
+        # sleep in the main thread so the SIGTERM handler can set the flag
+        time.sleep(SUPERVISOR_SLEEP_SECONDS)
+
+    logger.info('draining %s worker slots' % len(slots))
+    for thread in slots.values():
+        thread.join()
+    logger.info("graceful shutdown")
+
+
+def log_stats(logger):
+    "log the Lax cache stats of this process, once it has made requests to Lax"
+    lax_stats = lax_provider.client_stats()
+    if lax_stats:
+        logger.info('lax cache stats: %s' % lax_stats)
+
+
+def slot_identity(slot):
+    return "worker_%s_%s" % (os.getpid(), slot)
+
+
+def slot_logger(settings, slot):
+    return log.logger("worker.log", settings.setLevel, slot_identity(slot),
+                      loggerName="elife-bot-worker-slot-%s" % slot)
+
+
+def work_slot(settings, flag, slot, concurrency, logger=None):
+    """
+    One worker pool slot, poll for an activity task and execute it until the flag is red,
+    a slot has its own SWF connection and a New Relic background task per activity.
+    The activity type of a task is only known once it is polled, so a slot reserves a
+    slot of every limited activity type before it polls, and waits while one of them is
+    at its limit rather than poll for a task it could not run
+    """
+    identity = slot_identity(slot)
+    if logger is None:
+        logger = slot_logger(settings, slot)
+
+    conn = connect(settings)
+    application = newrelic.agent.application()
+
+    try:
+        while flag.green():
+            reserved = concurrency.reserve(SLOT_WAIT_SECONDS)
+            if reserved is None:
+                continue
+            try:
+                logger.info('polling for activity...')
+                activity_task = conn.poll_for_activity_task(settings.domain,
+                                                            settings.default_task_list, identity)
+                if get_taskToken(activity_task) is None:
+                    continue
+
+                logger.info('got activity: \n%s' % json.dumps(activity_task, sort_keys=True, indent=4))
+
+                # keep only the slot of the activity type being run
+                activity_type = get_activityType(activity_task)
+                concurrency.release([reserved_type for reserved_type in reserved
+                                     if reserved_type != activity_type])
+                reserved = [reserved_type for reserved_type in reserved
+                            if reserved_type == activity_type]
+                process_activity_task(settings, logger, conn, application, activity_task)
+            finally:
+                concurrency.release(reserved)
+    except Exception:
+        logger.exception('worker slot %s exception' % slot)
+        return
+
+    logger.info("slot %s graceful shutdown" % slot)
+
+
+class ActivityConcurrency(object):
+    """
+    Per activityType limit on how many worker slots can run the same activity at once
+    """
+
+    def __init__(self, activity_limits=None):
+        self.semaphores = {}
+        if activity_limits:
+            for activity_type, limit in activity_limits.items():
+                self.semaphores[activity_type] = threading.BoundedSemaphore(int(limit))
+
+    def reserve(self, timeout=None):
+        """
+        a slot of each limited activity type, taken in the same order by every worker slot,
+        the list of activity types reserved or None if one had no free slot within timeout
+        """
+        reserved = []
+        for activity_type in sorted(self.semaphores):
+            if not self.semaphores[activity_type].acquire(timeout=timeout):
+                self.release(reserved)
+                return None
+            reserved.append(activity_type)
+        return reserved
+
+    def release(self, activity_types):
+        for activity_type in activity_types:
+            self.semaphores[activity_type].release()
+
+
+def connect(settings):
+    return boto.swf.layer1.Layer1(settings.aws_access_key_id, settings.aws_secret_access_key)
+
+
+def process_activity_task(settings, logger, conn, application, activity_task):
+    """
+    Given an activity_task from polling SWF, run the activity and
+    respond to SWF with the outcome
+    """
+    token = get_taskToken(activity_task)
+
+    # Complete the activity based on data and activity type
+    activity_result = False
+    if token is None:
+        return
+
+    # Get the activityType and attempt to do the work
+    activityType = get_activityType(activity_task)
+    if activityType is None:
+        return
+
+    logger.info('activityType: %s' % activityType)
+
+    # Build a string for the object name
+    activity_name = get_activity_name(activityType)
+
+    with newrelic.agent.BackgroundTask(application, name=activity_name, group='worker.py'):
+        # Attempt to import the module for the activity
+        if import_activity_class(activity_name):
+            # Instantiate the activity object
+            activity_object = get_activity_object(activity_name, settings,
+                                                  logger, conn, token, activity_task)
+
+            # Get the data to pass
+            data = get_input(activity_task)
+
+            # Do the activity
+            try:
+                activity_result = activity_object.do_activity(data)
+            except Exception as e:
+                logger.error('error executing activity %s' %
+                             activity_name, exc_info=True)
+
+            # Print the result to the log
+            logger.info('got result: \n%s' %
+                        json.dumps(activity_object.result, sort_keys=True, indent=4))
+
+            # Complete the activity task if it was successful
+            if type(activity_result) == str:
+                if activity_result == Activity.ACTIVITY_SUCCESS:
+                    message = activity_object.result
+                    respond_completed(conn, logger, token, message)
+                elif activity_result == Activity.ACTIVITY_TEMPORARY_FAILURE:
+                    reason = ('error: activity failed with result '
+                              + str(activity_object.result))
+                    detail = ''
+                    respond_failed(conn, logger, token, detail, reason)
+
+                else:
+                    # (Activity.ACTIVITY_PERMANENT_FAILURE or Activity.ACTIVITY_EXIT_WORKFLOW)
+                    signal_fail_workflow(conn, logger, settings.domain,
+                                         activity_task['workflowExecution']['workflowId'],
+                                         activity_task['workflowExecution']['runId'])
+            else:
+                # for legacy actions
+
+                # Complete the activity task if it was successful
+                if activity_result:
+                    message = activity_object.result
+                    respond_completed(conn, logger, token, message)
+                else:
+                    reason = ('error: activity failed with result '
+                              + str(activity_object.result))
+                    detail = ''
+                    respond_failed(conn, logger, token, detail, reason)
+
+        else:
+            reason = 'error: could not load object %s\n' % activity_name
+            detail = ''
+            respond_failed(conn, logger, token, detail, reason)
+            logger.info('error: could not load object %s\n' % activity_name)
+
 def get_input(activity_task):
     """
     Given a response from polling for activity from SWF via boto,
@@ -218,4 +378,7 @@ if __name__ == "__main__":
     ENV = utils.console_start_env()
     SETTINGS = utils.get_settings(ENV)
 
-    process.monitor_interrupt(lambda flag: work(SETTINGS, flag))
+    if getattr(SETTINGS, 'worker_pool_size', DEFAULT_POOL_SIZE) > 1:
+        process.monitor_interrupt(lambda flag: work_pool(SETTINGS, flag))
+    else:
+        process.monitor_interrupt(lambda flag: work(SETTINGS, flag))
@@ -8,6 +8,9 @@ import time
 Amazon SWF workflow base class
 """
 
+# decision key of the HistoryIndex the decider built from the streamed history pages
+HISTORY_INDEX_KEY = "historyIndex"
+
 class Workflow(object):
     # Base class for extending
     def __init__(self, settings, logger, conn=None, token=None, decision=None,
@@ -117,7 +120,7 @@ class Workflow(object):
                     activityID = p_activity["activity_id"]
                     if self.activity_status(self.decision, activityType, activityID) is False:
                         all_completed = False
-                    if self.activity_status(self.decision, activityType, activityID) is True:
+                    else:
                         none_started = False
                 if all_completed == False and none_started is True:
                     # A fresh step not started yet, add the activities
@@ -181,6 +184,20 @@ class Workflow(object):
         """
         return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ')
 
+    def history_index(self, decision):
+        """
+        Return the HistoryIndex for the decision events, building it
+        only when the decision or its events have changed
+        """
+        index = getattr(self, '_history_index', None)
+        if index is None or not index.is_for(decision):
+            # the decider attaches the index it built while paging the history
+            index = decision.get(HISTORY_INDEX_KEY) if isinstance(decision, dict) else None
+            if index is None or not index.is_for(decision):
+                index = HistoryIndex(decision)
+            self._history_index = index
+        return index
+
     def activity_status(self, decision, activityType=None, activityID=None):
         """
         Given an activityType and/or activityID as the activity details, and
@@ -191,69 +208,14 @@ class Workflow(object):
         if activityType is None and activityID is None:
             return False
 
-        eventId_list = []
-
-        for event in decision["events"]:
-            eventId = None
-            # Find the all matching eventID for the activityType and/or activityID
-            if activityType is not None and activityID is not None:
-                try:
-                    if(event["activityTaskScheduledEventAttributes"]["activityType"]["name"]
-                       == activityType
-                       and event["activityTaskScheduledEventAttributes"]["activityId"]
-                       == activityID):
-                        eventId_list.append(event["eventId"])
-                except KeyError:
-                    pass
-            elif activityType is not None and activityID is None:
-                try:
-                    if(event["activityTaskScheduledEventAttributes"]["activityType"]["name"]
-                       == activityType):
-                        eventId_list.append(event["eventId"])
-                except KeyError:
-                    pass
-            elif activityID is not None and activityType is None:
-                try:
-                    if event["activityTaskScheduledEventAttributes"]["activityId"] == activityID:
-                        eventId_list.append(event["eventId"])
-                except KeyError:
-                    pass
-
-        # Now if we have an eventId, find if in the decision history is was
-        #  successfully completed
-        if len(eventId_list) <= 0:
-            return False
-        for event in decision["events"]:
-            for eventId in eventId_list:
-                # Find the first matching eventID for the activityType
-                try:
-                    if event["activityTaskCompletedEventAttributes"]["scheduledEventId"] == eventId:
-                        # Found matching data, now check completion
-                        if event["eventType"] == "ActivityTaskCompleted":
-                            # Good!
-                            return True
-                        break
-                except KeyError:
-                    pass
-        # Default
-        return False
+        return self.history_index(decision).activity_completed(activityType, activityID)
 
     def last_activity_status(self, decision):
         """
         Given a decision response from SWF, determine whether the
         last run activity Failed or Completed
         """
-        status = None
-        # Traverse the array in reverse order
-        for event in decision["events"][::-1]:
-            if event["eventType"] == "ActivityTaskCompleted":
-                status = "ActivityTaskCompleted"
-                break
-            elif event["eventType"] == "ActivityTaskFailed":
-                status = "ActivityTaskFailed"
-                break
-
-        return status
+        return self.history_index(decision).last_activity_status
 
     def handle_nextPageToken(self):
         # Quick test for nextPageToken
@@ -292,17 +254,12 @@ class Workflow(object):
 
     def check_for_failed_workflow_request(self, decision):
         try:
-
-            # Traverse the array in reverse order
-            # This is an optimisation since if there is a failure record it will
-            # always be at the end of the array
-            for event in decision["events"][::-1]:
-                if event["eventType"] == "WorkflowExecutionCancelRequested":
-                    # terminate
-                    d = Layer1Decisions()
-                    d.fail_workflow_execution()
-                    self.complete_decision(d)
-                    return
+            if self.history_index(decision).cancel_requested:
+                # terminate
+                d = Layer1Decisions()
+                d.fail_workflow_execution()
+                self.complete_decision(d)
+                return
         except TypeError:
             pass
 
@@ -379,3 +336,85 @@ class Workflow(object):
                 str(self.default_task_start_to_close_timeout),
                 str(self.description))
             return response
+
+
+class HistoryIndex(object):
+    """
+    One pass index of the decision events, for answering the workflow
+    questions about the activity history without rescanning the events
+    """
+
+    def __init__(self, decision, events=None):
+        """
+        Index decision["events"], or the events iterable, such as the history pages
+        streamed from SWF, in which case decision["events"] holds only the first event
+        """
+        self.decision = decision
+        self.streamed = events is not None
+        if events is None:
+            events = decision["events"]
+        self.event_count = 0
+        self.first_event = None
+        # scheduled eventId to (activityType name, activityId)
+        self.scheduled = {}
+        # completed activities by activityType and activityId, by either one alone
+        self.completed = set()
+        self.completed_types = set()
+        self.completed_ids = set()
+        self.last_activity_status = None
+        self.cancel_requested = False
+        self.build(events)
+
+    def is_for(self, decision):
+        "whether this index is for the decision and its current events"
+        try:
+            return (decision is self.decision
+                    and (self.streamed or len(decision["events"]) == self.event_count))
+        except TypeError:
+            return False
+
+    def build(self, events):
+        for event in events:
+            if self.event_count == 0:
+                self.first_event = event
+            self.event_count += 1
+            event_type = event.get("eventType")
+            if event_type == "ActivityTaskScheduled":
+                attributes = event.get("activityTaskScheduledEventAttributes", {})
+                try:
+                    self.scheduled[event["eventId"]] = (
+                        attributes["activityType"]["name"], attributes["activityId"])
+                except KeyError:
+                    pass
+            elif event_type == "ActivityTaskCompleted":
+                self.last_activity_status = "ActivityTaskCompleted"
+                activity = self.scheduled_activity(
+                    event.get("activityTaskCompletedEventAttributes"))
+                if activity:
+                    self.completed.add(activity)
+                    self.completed_types.add(activity[0])
+                    self.completed_ids.add(activity[1])
+            elif event_type == "ActivityTaskFailed":
+                self.last_activity_status = "ActivityTaskFailed"
+            elif event_type == "WorkflowExecutionCancelRequested":
+                self.cancel_requested = True
+
+    def scheduled_activity(self, attributes):
+        "(activityType name, activityId) of the scheduled event the attributes refer to"
+        try:
+            return self.scheduled.get(attributes["scheduledEventId"])
+        except (KeyError, TypeError):
+            return None
+
+    def activity_completed(self, activity_type=None, activity_id=None):
+        """
+        Given an activity_type and/or activity_id, whether a matching
+        scheduled activity was completed
+        """
+        if activity_type is not None and activity_id is not None:
+            return (activity_type, activity_id) in self.completed
+        if activity_type is not None:
+            return activity_type in self.completed_types
+        if activity_id is not None:
+            return activity_id in self.completed_ids
+        return False